@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from model_bundle import MANIFEST_KEY, content_hash, file_signature, write_manifest_npz
+
+
+# The active-region evolution classifier is separate from the flare peak-time model: its own
+# features, its own artifact and its own loader, so neither model's reloads affect the other.
+AR_FEATURES = ['magnetic_flux_change', 'area_change', 'gradient_value']
+LABEL_COLUMN = 'evolution'
+DEFAULT_AR_MODEL_FILENAME = 'ar_evolution_model.npz'
+# Bump when the layout of the artifact changes; loaders refuse artifacts newer than they understand.
+AR_FORMAT_VERSION = 1
+
+
+class ArEvolutionModel:
+    """
+    A multinomial logistic regression over the standardized AR_FEATURES, scored with NumPy from
+    the arrays of an ar_evolution_model.npz. classify() scores any number of regions in one
+    vectorized pass.
+    """
+
+    def __init__(self, path, manifest, mean, scale, coef, intercept):
+        self.path = path
+        self.manifest = manifest
+        self.classes = np.asarray(manifest["classes"])
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    def predict_proba(self, X):
+        """(n, n_classes) class probabilities for the (n, 3) feature rows X."""
+        logits = ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale) @ self.coef.T + self.intercept
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def classify(self, X):
+        """Returns (labels, probabilities) for the (n, 3) feature rows X."""
+        probabilities = self.predict_proba(X)
+        return self.classes[probabilities.argmax(axis=1)], probabilities
+
+
+def load_ar_dataset(data_path, label_column=LABEL_COLUMN):
+    """Reads the labelled regions: the AR_FEATURES and the label column, without rows missing any of them."""
+    try:
+        data = pd.read_csv(data_path, usecols=AR_FEATURES + [label_column])
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Dataset not found at {data_path}.")
+    except ValueError as e:
+        raise ValueError(f"{data_path} needs the columns {AR_FEATURES + [label_column]}: {e}")
+    data = data.dropna()
+    if data.empty:
+        raise ValueError(f"No labelled regions in {data_path}.")
+    return data[AR_FEATURES].to_numpy(dtype=np.float64), data[label_column].astype(str).to_numpy()
+
+
+def train_ar_model(X, labels, output_path=DEFAULT_AR_MODEL_FILENAME, test_size=0.2, random_state=42):
+    """
+    Fits the classifier on (X, labels), scores its accuracy on a held-out split and writes the
+    artifact to `output_path`. Returns the manifest.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    classes = np.unique(labels)
+    if len(classes) < 2:
+        raise ValueError(f"Need at least two evolution classes to train, got {list(classes)}.")
+    X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=test_size, random_state=random_state, stratify=labels)
+
+    scaler = StandardScaler().fit(X_train)
+    estimator = LogisticRegression(max_iter=1000).fit(scaler.transform(X_train), y_train)
+    coef, intercept = estimator.coef_, estimator.intercept_
+    if len(estimator.classes_) == 2:
+        # A binary fit has one logit for the second class; a zero logit for the first gives the same softmax.
+        coef, intercept = np.vstack([np.zeros_like(coef), coef]), np.r_[0.0, intercept]
+
+    arrays = {"mean": scaler.mean_, "scale": scaler.scale_, "coef": coef, "intercept": intercept}
+    manifest = {
+        "format_version": AR_FORMAT_VERSION,
+        "model": "logistic",
+        "features": AR_FEATURES,
+        "classes": [str(label) for label in estimator.classes_],
+        "created_at": datetime.now().isoformat(),
+        "metrics": {
+            "accuracy": float(estimator.score(scaler.transform(X_test), y_test)),
+            "n_train": int(len(X_train)),
+            "n_test": int(len(X_test))
+        }
+    }
+    return write_manifest_npz(output_path, manifest, arrays)
+
+
+def load_ar_model(path, verify=True):
+    """Loads an ar_evolution_model.npz without unpickling anything. With `verify`, the content hash is checked."""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    if MANIFEST_KEY not in arrays:
+        raise ValueError(f"{path} is not an AR evolution model (no manifest).")
+    manifest = json.loads(arrays.pop(MANIFEST_KEY).tobytes().decode('utf-8'))
+
+    if manifest.get("format_version", 0) > AR_FORMAT_VERSION:
+        raise ValueError(f"{path} uses AR model format {manifest['format_version']}; this code reads up to {AR_FORMAT_VERSION}.")
+    if manifest.get("features") != AR_FEATURES:
+        raise ValueError(f"{path} was trained on features {manifest.get('features')}, expected {AR_FEATURES}.")
+    if verify and content_hash(manifest, arrays) != manifest.get("content_hash"):
+        raise ValueError(f"Content hash mismatch for {path}; the model is corrupt or was modified.")
+    return ArEvolutionModel(path, manifest, arrays["mean"], arrays["scale"], arrays["coef"], arrays["intercept"])
+
+
+class ArModelLoader:
+    """
+    Loads the AR evolution model on first use and again whenever its file is replaced, checked by
+    file signature on each get(). A failed load keeps serving the previous model and is not
+    retried until the file changes again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.model = None
+        self.error = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current model, or None if none could be loaded (see `error`)."""
+        signature = file_signature(self.path)
+        if signature is not None and signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._signature = signature
+                    try:
+                        self.model = load_ar_model(self.path)
+                        self.error = None
+                        print(f"AR evolution model {self.model.version} loaded from {self.path}")
+                    except Exception as e:
+                        self.error = f"{type(e).__name__}: {e}"
+                        print(f"Error loading AR evolution model from {self.path}: {e}")
+        elif signature is None and self.model is None:
+            self.error = f"AR evolution model not found at {self.path}."
+        return self.model
+
+    def stats(self):
+        model = self.model
+        return {
+            "path": self.path,
+            "loaded": model is not None,
+            "version": model.version if model is not None else None,
+            "classes": [str(label) for label in model.classes] if model is not None else None,
+            "error": self.error
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the active-region evolution classifier on magnetic_flux_change, area_change and gradient_value.")
+    parser.add_argument('--data-path', required=True, help="CSV with the three feature columns and a label column.")
+    parser.add_argument('--label-column', default=LABEL_COLUMN, help="Column holding each region's evolution class (default: %(default)s).")
+    parser.add_argument('--output-path', default=DEFAULT_AR_MODEL_FILENAME)
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--random-state', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    try:
+        X, labels = load_ar_dataset(args.data_path, args.label_column)
+        manifest = train_ar_model(X, labels, args.output_path, args.test_size, args.random_state)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Wrote {os.path.abspath(args.output_path)} (version {manifest['version']}): classes {manifest['classes']}, "
+          f"held-out accuracy {manifest['metrics']['accuracy']:.3f} on {manifest['metrics']['n_test']} regions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
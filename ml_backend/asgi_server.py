@@ -0,0 +1,306 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# --- Configuration ---
+# Requests handled at once per worker process. The Flask handlers run on a thread pool of this
+# size; TensorFlow, NumPy and onnxruntime release the GIL during inference, and concurrent
+# single predictions still coalesce in the micro-batcher.
+ASGI_THREADS = int(os.environ.get('ML_ASGI_THREADS', '8'))
+# Requests allowed to wait for a free thread. Beyond this, requests are rejected immediately.
+ASGI_MAX_QUEUE = int(os.environ.get('ML_ASGI_MAX_QUEUE', '64'))
+# A queued request that has not started within this time is rejected instead of served late.
+ASGI_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ML_ASGI_QUEUE_TIMEOUT_MS', '2000')) / 1000.0
+# 503 by default; some load balancers and clients back off more sensibly on 429.
+ASGI_REJECT_STATUS = int(os.environ.get('ML_ASGI_REJECT_STATUS', '503'))
+ASGI_RETRY_AFTER_SECONDS = int(os.environ.get('ML_ASGI_RETRY_AFTER', '1'))
+
+# Probes, metrics and stats bypass admission control, so an overloaded worker still reports its state.
+EXEMPT_PATHS = ('/healthz', '/readyz', '/metrics', '/api/ml_predict/stats')
+# Request and response bodies on these paths are passed through as they arrive and as the app
+# produces them, instead of being read and sent whole, so bulk scoring runs in constant memory.
+STREAMING_PATHS = ('/api/ml_predict/stream',)
+
+class AdmissionController:
+    """
+    Bounds the work admitted by one event loop: at most `max_concurrency` requests run and at most
+    `max_queue` wait. `admit()` returns False straight away when the queue is full, or after
+    `queue_timeout` seconds if no slot frees up. Only used from the event loop thread.
+    """
+
+    def __init__(self, max_concurrency, max_queue, queue_timeout=None):
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}.")
+        if max_queue < 0:
+            raise ValueError(f"max_queue must not be negative, got {max_queue}.")
+
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = None
+        self.in_flight = 0
+        self.waiting = 0
+        self._stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "max_queue_depth": 0}
+
+    async def admit(self):
+        if self._semaphore is None:
+            # Created lazily so it binds to the loop that serves requests.
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self.in_flight >= self.max_concurrency and self.waiting >= self.max_queue:
+            self._stats["rejected_queue_full"] += 1
+            return False
+
+        self.waiting += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected_timeout"] += 1
+            return False
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self._stats["admitted"] += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats.update({
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        })
+        return stats
+
+
+def build_environ(scope, body):
+    """The WSGI environ for an ASGI HTTP scope and its fully read request body."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'wsgi.input_terminated': True
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'content-length':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """Runs a WSGI app to completion on the calling thread; returns (status code, headers, body)."""
+    response = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return chunks.append
+
+    iterable = wsgi_app(environ, start_response)
+    try:
+        chunks.extend(iterable)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return response['status'], response['headers'], b''.join(chunks)
+
+
+class StreamingInput(io.RawIOBase):
+    """
+    wsgi.input for a streamed request body. The worker thread that reads it receives the next
+    body message through the event loop, so the upload is read only as fast as the app consumes it.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = b''
+        self._position = 0
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._position == len(self._buffer) and not self._done:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                self._done = True
+                break
+            self._buffer, self._position = message.get('body', b''), 0
+            self._done = not message.get('more_body', False)
+
+        count = min(len(b), len(self._buffer) - self._position)
+        b[:count] = self._buffer[self._position:self._position + count]
+        self._position += count
+        return count
+
+
+def stream_wsgi(wsgi_app, environ, send, loop):
+    """
+    Runs a WSGI app on the calling thread and sends each piece of its response through the event
+    loop as it is produced; waiting for each send keeps a slow client from buffering the response.
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+    def send_message(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    iterable = wsgi_app(environ, start_response)
+    try:
+        send_message({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+        for chunk in iterable:
+            if chunk:
+                send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        send_message({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def send_response(send, status, headers, body):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class BoundedWSGIApp:
+    """
+    ASGI application serving a WSGI app (the Flask app) from a bounded thread pool, with
+    admission control in front of it so overload produces fast rejections instead of a backlog.
+    """
+
+    def __init__(self, wsgi_app, threads=ASGI_THREADS, max_queue=ASGI_MAX_QUEUE,
+                 queue_timeout=ASGI_QUEUE_TIMEOUT_SECONDS, reject_status=ASGI_REJECT_STATUS,
+                 retry_after=ASGI_RETRY_AFTER_SECONDS, exempt_paths=EXEMPT_PATHS, streaming_paths=STREAMING_PATHS):
+        self.wsgi_app = wsgi_app
+        self.admission = AdmissionController(threads, max_queue, queue_timeout)
+        self.reject_status = reject_status
+        self.retry_after = retry_after
+        self.exempt_paths = exempt_paths
+        self.streaming_paths = streaming_paths
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-worker')
+        self._exempt_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='asgi-probe')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'.")
+
+        loop = asyncio.get_running_loop()
+        if scope['path'] in self.exempt_paths:
+            body = await read_body(receive)
+            if body is not None:
+                await send_response(send, *await loop.run_in_executor(self._exempt_executor, call_wsgi, self.wsgi_app, build_environ(scope, body)))
+            return
+
+        started = time.perf_counter()
+        if not await self.admission.admit():
+            await self._reject(send, time.perf_counter() - started)
+            return
+        try:
+            if scope['path'] in self.streaming_paths:
+                environ = build_environ(scope, b'')
+                environ['wsgi.input'] = StreamingInput(receive, loop)
+                await loop.run_in_executor(self.executor, stream_wsgi, self.wsgi_app, environ, send, loop)
+                return
+            body = await read_body(receive)
+            if body is None:
+                return
+            status, headers, response_body = await loop.run_in_executor(self.executor, call_wsgi, self.wsgi_app, build_environ(scope, body))
+        finally:
+            self.admission.release()
+        await send_response(send, status, headers, response_body)
+
+    async def _reject(self, send, waited_seconds):
+        body = json.dumps({
+            "error": "ML server is at capacity. Retry shortly.",
+            "queue_depth": self.admission.waiting,
+            "waited_ms": round(waited_seconds * 1000.0, 1)
+        }).encode('utf-8')
+        headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            (b'retry-after', str(self.retry_after).encode('latin-1'))
+        ]
+        await send_response(send, self.reject_status, headers, body)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                self._exempt_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_app():
+    import ml_backend_server
+
+    asgi_app = BoundedWSGIApp(ml_backend_server.app)
+    ml_backend_server.admission_controller = asgi_app.admission
+    return asgi_app
+
+
+# Launch from the ml_backend directory, e.g.:
+#   uvicorn asgi_server:app --host 0.0.0.0 --port 5001 --workers 4
+#   ML_ASGI=1 gunicorn -c gunicorn.conf.py asgi_server:app
+app = create_app()
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('asgi_server:app', host=os.environ.get('ML_HOST', '0.0.0.0'), port=int(os.environ.get('ML_PORT', '5001')),
+                workers=int(os.environ.get('ML_WORKERS', '2')))
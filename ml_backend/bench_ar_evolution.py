@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def synthetic_regions(n, seed=0):
+    """
+    (X, labels) for `n` made-up regions: flux and area growth push a region towards 'growing',
+    shrinkage towards 'decaying', with noise. Only for benchmarking when no labelled data is given.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.normal(0, 1, n), rng.normal(0, 1, n), rng.gamma(2.0, 0.5, n)])
+    score = X[:, 0] + 0.5 * X[:, 1] + 0.3 * (X[:, 2] - 1.0) + rng.normal(0, 0.4, n)
+    labels = np.where(score > 0.6, 'growing', np.where(score < -0.6, 'decaying', 'stable'))
+    return X, labels
+
+
+def timed(function, repeats):
+    """Median wall-clock seconds of `repeats` calls, after one warm-up call."""
+    function()
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - started)
+    return float(np.median(seconds))
+
+
+def bench(model_path, n_regions, repeats):
+    # Imported here so ML_AR_MODEL_PATH is set first; the peak-time model is not needed.
+    os.environ['ML_AR_MODEL_PATH'] = model_path
+    os.environ.setdefault('ML_LOAD_MODE', 'lazy')
+    import ml_backend_server as server
+    from ar_evolution import AR_FEATURES
+
+    model = server.ar_model_loader.get()
+    X, _ = synthetic_regions(n_regions, seed=1)
+    records = [dict(zip(AR_FEATURES, row), active_region_id=13000 + index) for index, row in enumerate(X.tolist())]
+    client = server.app.test_client()
+    queries = [f"/api/classify_ar_evolution?magnetic_flux_change={r['magnetic_flux_change']}&area_change={r['area_change']}"
+               f"&gradient_value={r['gradient_value']}&active_region_id={r['active_region_id']}" for r in records]
+
+    def get_each():
+        for query in queries:
+            assert client.get(query).status_code == 200
+
+    def post_batch():
+        assert client.post('/api/classify_ar_evolution/batch', json=records).status_code == 200
+
+    rows = X[:, None, :]
+    timings = {
+        "model_per_region": timed(lambda: [model.classify(row) for row in rows], repeats),
+        "model_vectorized": timed(lambda: model.classify(X), repeats),
+        "http_get_per_region": timed(get_each, max(1, repeats // 10)),
+        "http_post_batch": timed(post_batch, repeats)
+    }
+    return [{"path": name, "regions": n_regions, "seconds": seconds, "regions_per_second": n_regions / seconds}
+            for name, seconds in timings.items()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how fast the AR evolution classifier scores a cadence of active regions.")
+    parser.add_argument('--model-path', help="An ar_evolution_model.npz; by default one is trained on synthetic regions.")
+    parser.add_argument('--regions', type=int, default=1000, help="Regions per cadence (default: %(default)s).")
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--output', help="Optional JSON file for the results.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_path = args.model_path
+        if model_path is None:
+            from ar_evolution import train_ar_model
+            model_path = os.path.join(work_dir, 'ar_evolution_model.npz')
+            manifest = train_ar_model(*synthetic_regions(20000), output_path=model_path)
+            print(f"Trained on synthetic regions: held-out accuracy {manifest['metrics']['accuracy']:.3f}")
+        results = bench(model_path, args.regions, args.repeats)
+
+    header = f"{'path':<22} {'ms / cadence':>13} {'regions/s':>12}"
+    print("\n" + header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['path']:<22} {result['seconds'] * 1000:>13.2f} {result['regions_per_second']:>12.0f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
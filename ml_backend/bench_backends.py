@@ -0,0 +1,75 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+MODEL_PATH = 'solar_flare_peak_time_predictor_lstm_model.h5'
+
+
+def run_child(backend, model_path, n_samples):
+    """Loads one backend in a fresh process and reports its startup time, peak RSS and predictions."""
+    started = time.perf_counter()
+
+    if backend == 'numpy':
+        from numpy_lstm import NumpyLSTMModel
+        model = NumpyLSTMModel.from_h5(model_path)
+    else:
+        from tensorflow.keras.models import load_model
+        from inference import CompiledPredictor
+        model = CompiledPredictor(load_model(model_path))
+
+    X = np.random.default_rng(0).uniform(0, 1, size=(n_samples, 1, 12)).astype(np.float32)
+    predictions = model.predict(X)
+    startup_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(200):
+        call_started = time.perf_counter()
+        model.predict(X[:1])
+        latencies.append((time.perf_counter() - call_started) * 1000.0)
+
+    print(json.dumps({
+        "backend": backend,
+        "startup_seconds": startup_seconds,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "predictions": np.asarray(predictions).ravel().tolist()
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare startup time, memory and outputs of the inference backends.")
+    parser.add_argument('--model-path', default=MODEL_PATH)
+    parser.add_argument('--samples', type=int, default=256)
+    parser.add_argument('--child', choices=['keras', 'numpy'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.model_path, args.samples)
+        return
+
+    results = {}
+    for backend in ('keras', 'numpy'):
+        completed = subprocess.run(
+            [sys.executable, __file__, '--child', backend, '--model-path', args.model_path, '--samples', str(args.samples)],
+            capture_output=True, text=True, check=True
+        )
+        results[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print("--- Inference backend comparison (fresh process per backend) ---")
+    for backend, result in results.items():
+        print(f"{backend:<6} startup {result['startup_seconds']:6.2f} s | max RSS {result['max_rss_mb']:8.1f} MB | "
+              f"single-row p50 {result['p50_ms']:.3f} ms | p99 {result['p99_ms']:.3f} ms")
+
+    max_diff = np.abs(np.array(results['keras']['predictions']) - np.array(results['numpy']['predictions'])).max()
+    print(f"Max absolute difference between backends over {args.samples} samples: {max_diff:.3e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from export_model import EXPORTED_MODEL_PATHS
+
+
+RUNTIMES = ('keras', 'numpy', 'onnx', 'tflite')
+BATCH_SIZES = (1, 64, 4096)
+BUNDLE_PATH = 'model_bundle.npz'
+
+
+def load_runtime(runtime, bundle_path):
+    """Returns predict(raw_features) -> seconds for one runtime; the Keras and NumPy paths scale outside the model."""
+    if runtime in EXPORTED_MODEL_PATHS:
+        from exported_runtime import load_exported_model
+        model = load_exported_model(EXPORTED_MODEL_PATHS[runtime], threads=1)
+        return lambda raw: model.predict(raw)
+
+    from model_bundle import load_bundle
+    bundle = load_bundle(bundle_path, runtime=runtime)
+    model = bundle.model
+    if runtime == 'keras':
+        from inference import CompiledPredictor
+        model = CompiledPredictor(model)
+
+    def predict(raw):
+        scaled = bundle.scaler_X.transform(raw).reshape(len(raw), 1, -1).astype(np.float32)
+        return bundle.scaler_y.inverse_transform(model.predict(scaled, batch_size=len(raw)))
+    return predict
+
+
+def run_child(runtime, bundle_path, iterations):
+    started = time.perf_counter()
+    predict = load_runtime(runtime, bundle_path)
+    predict(np.zeros((1, 12), dtype=np.float32))
+    startup_seconds = time.perf_counter() - started
+
+    from model_bundle import load_bundle
+    scaler_X = load_bundle(bundle_path, runtime='numpy').scaler_X
+    raw = scaler_X.inverse_transform(np.random.default_rng(0).uniform(0, 1, size=(max(BATCH_SIZES), 12))).astype(np.float32)
+
+    result = {
+        "runtime": runtime,
+        "startup_seconds": startup_seconds,
+        "predictions": np.asarray(predict(raw[:256])).ravel().tolist()
+    }
+    for batch_size in BATCH_SIZES:
+        batch = raw[:batch_size]
+        predict(batch)
+        latencies = []
+        for _ in range(max(5, iterations // max(1, batch_size // 64))):
+            call_started = time.perf_counter()
+            predict(batch)
+            latencies.append(time.perf_counter() - call_started)
+        latencies = np.array(latencies) * 1000.0
+        result[f"p50_ms_batch_{batch_size}"] = float(np.percentile(latencies, 50))
+        result[f"p99_ms_batch_{batch_size}"] = float(np.percentile(latencies, 99))
+        result[f"rows_per_second_batch_{batch_size}"] = batch_size / (np.median(latencies) / 1000.0)
+    result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare latency, throughput, memory and outputs of the Keras, NumPy, ONNX and TFLite runtimes.")
+    parser.add_argument('--bundle-path', default=BUNDLE_PATH)
+    parser.add_argument('--runtimes', default=','.join(RUNTIMES))
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--output', help="Optional JSON file for the results.")
+    parser.add_argument('--child', choices=RUNTIMES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.bundle_path, args.iterations)
+        return
+
+    results = {}
+    for runtime in args.runtimes.split(','):
+        completed = subprocess.run(
+            [sys.executable, __file__, '--child', runtime, '--bundle-path', args.bundle_path, '--iterations', str(args.iterations)],
+            capture_output=True, text=True, check=True
+        )
+        results[runtime] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print("--- Peak-time predictor runtimes (fresh process per runtime, raw features in, seconds out) ---")
+    reference = np.array(results[next(iter(results))]['predictions'])
+    for runtime, result in results.items():
+        max_diff = np.abs(np.array(result['predictions']) - reference).max()
+        print(f"{runtime:<7} startup {result['startup_seconds']:6.2f} s | max RSS {result['max_rss_mb']:7.1f} MB | "
+              + " | ".join(f"batch {b}: p50 {result[f'p50_ms_batch_{b}']:.3f} ms, p99 {result[f'p99_ms_batch_{b}']:.3f} ms"
+                           for b in BATCH_SIZES)
+              + f" | {result[f'rows_per_second_batch_{BATCH_SIZES[-1]}']:,.0f} rows/s | max diff {max_diff:.4f} s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import time
+
+import numpy as np
+from tensorflow.keras.models import load_model
+
+from inference import CompiledPredictor
+
+
+MODEL_PATH = 'solar_flare_peak_time_predictor_lstm_model.h5'
+
+
+def time_calls(predict, X, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        predict(X)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return np.array(latencies)
+
+
+def report(name, first_call_ms, latencies):
+    print(f"{name:<22} first call {first_call_ms:9.2f} ms | "
+          f"p50 {np.percentile(latencies, 50):7.3f} ms | "
+          f"p99 {np.percentile(latencies, 99):7.3f} ms | "
+          f"mean {latencies.mean():7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model.predict with the compiled inference path.")
+    parser.add_argument('--model-path', default=MODEL_PATH)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=1)
+    args = parser.parse_args()
+
+    model = load_model(args.model_path)
+    X = np.random.default_rng(0).uniform(0, 1, size=(args.batch_size,) + tuple(model.input_shape[1:])).astype(np.float32)
+
+    print(f"--- Inference latency: batch size {args.batch_size}, {args.iterations} iterations ---")
+
+    keras_predict = lambda batch: model.predict(batch, batch_size=len(batch), verbose=0)
+    started = time.perf_counter()
+    keras_predict(X)
+    report("model.predict", (time.perf_counter() - started) * 1000.0, time_calls(keras_predict, X, args.iterations))
+
+    compiled = CompiledPredictor(model)
+    started = time.perf_counter()
+    compiled.predict(X)
+    report("compiled tf.function", (time.perf_counter() - started) * 1000.0, time_calls(compiled.predict, X, args.iterations))
+
+    max_diff = np.abs(keras_predict(X) - compiled.predict(X)).max()
+    print(f"Max absolute difference between paths: {max_diff:.3e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,424 @@
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+
+ML_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_MODES = ('flask', 'gunicorn', 'asgi')
+MODEL_CHOICES = ('stub', 'real')
+SCENARIOS = ('predict', 'predict_batch', 'classify_ar', 'classify_ar_batch', 'plots')
+# Scenarios served by the separate AR evolution model (ar_evolution.py).
+AR_SCENARIOS = ('classify_ar', 'classify_ar_batch')
+PERCENTILES = (50, 95, 99)
+
+
+# --- Synthetic payloads ---
+def synthetic_flare_records(count, seed=0):
+    """Valid /api/ml_predict payloads with flares of 1 minute to 2 hours that end on their start day."""
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, 86400 - 7200, size=count)
+    ends = starts + rng.integers(60, 7200, size=count)
+    records = []
+    for start, end, counts, x_pos, y_pos in zip(starts, ends, rng.integers(100, 1000000, size=count),
+                                                rng.uniform(-1000, 1000, size=count), rng.uniform(-1000, 1000, size=count)):
+        records.append({
+            'total_counts': int(counts), 'x_pos_asec': round(float(x_pos), 1), 'y_pos_asec': round(float(y_pos), 1),
+            'start_hour': int(start // 3600), 'start_minute': int(start % 3600 // 60), 'start_second': int(start % 60),
+            'end_hour': int(end // 3600), 'end_minute': int(end % 3600 // 60), 'end_second': int(end % 60)
+        })
+    return records
+
+
+def scenario_requests(scenario, records, batch_size, plot_name, seed=0):
+    """An endless iterator of (method, path, body) tuples for one scenario."""
+    rng = np.random.default_rng(seed)
+    for i in itertools.count():
+        if scenario == 'predict':
+            yield 'POST', '/api/ml_predict', json.dumps(records[i % len(records)]).encode('utf-8')
+        elif scenario == 'predict_batch':
+            batch = [records[(i * batch_size + j) % len(records)] for j in range(batch_size)]
+            yield 'POST', '/api/ml_predict/batch', json.dumps(batch).encode('utf-8')
+        elif scenario == 'classify_ar':
+            flux, area, gradient = rng.uniform(-1, 1, size=3)
+            yield 'GET', f'/api/classify_ar_evolution?magnetic_flux_change={flux:.4f}&area_change={area:.4f}&gradient_value={gradient:.4f}', None
+        elif scenario == 'classify_ar_batch':
+            regions = [{"active_region_id": 13000 + j, "magnetic_flux_change": round(float(flux), 4), "area_change": round(float(area), 4),
+                        "gradient_value": round(float(gradient), 4)} for j, (flux, area, gradient) in enumerate(rng.uniform(-1, 1, size=(batch_size, 3)))]
+            yield 'POST', '/api/classify_ar_evolution/batch', json.dumps(regions).encode('utf-8')
+        elif scenario == 'plots':
+            yield 'GET', f'/plots/{plot_name}', None
+        else:
+            raise ValueError(f"Unknown scenario '{scenario}'. Expected one of {SCENARIOS}.")
+
+
+# --- Results ---
+def summarize(latencies_ms, statuses, elapsed_seconds):
+    """Throughput, error rate and latency percentiles for one run. Status 0 means the request failed to complete."""
+    latencies_ms = np.asarray(latencies_ms, dtype=np.float64)
+    errors = sum(count for status, count in statuses.items() if status == 0 or status >= 400)
+    total = sum(statuses.values())
+    summary = {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+        "elapsed_seconds": elapsed_seconds,
+        "throughput_rps": total / elapsed_seconds if elapsed_seconds > 0 else 0.0
+    }
+    if len(latencies_ms):
+        for percentile in PERCENTILES:
+            summary[f"p{percentile}_ms"] = float(np.percentile(latencies_ms, percentile))
+        summary["mean_ms"] = float(latencies_ms.mean())
+        summary["max_ms"] = float(latencies_ms.max())
+    return summary
+
+
+def format_summary(name, summary):
+    percentiles = " | ".join(f"p{p} {summary.get(f'p{p}_ms', float('nan')):8.2f} ms" for p in PERCENTILES)
+    throughput = f"{summary['throughput_rps']:9.1f} req/s" if "throughput_rps" in summary else f"{summary['calls_per_second']:9.1f} calls/s"
+    line = f"{name:<26} {throughput} | {percentiles}"
+    if "error_rate" in summary:
+        line += f" | errors {summary['error_rate']:6.1%} {summary['status_counts']}"
+    return line
+
+
+# --- Load generation ---
+def run_load(host, port, requests, concurrency, duration_seconds, rate=None, timeout=30.0):
+    """
+    Sends requests from `concurrency` threads, each with its own keep-alive connection, for
+    `duration_seconds`. Without `rate` every thread sends back to back (closed loop). With `rate`
+    (requests per second across all threads), request i is due at i / rate seconds and its latency
+    is measured from that due time, so a slow server is not hidden by a backed-off load generator.
+    """
+    request_lock = threading.Lock()
+    result_lock = threading.Lock()
+    latencies_ms = []
+    statuses = Counter()
+    sequence = itertools.count()
+    started = time.perf_counter()
+    deadline = started + duration_seconds
+
+    def next_request():
+        with request_lock:
+            return next(sequence), next(requests)
+
+    def worker():
+        connection = None
+        local_latencies, local_statuses = [], Counter()
+        while True:
+            index, (method, path, body) = next_request()
+            if rate:
+                due = started + index / rate
+                if due >= deadline:
+                    break
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                request_started = due
+            else:
+                request_started = time.perf_counter()
+                if request_started >= deadline:
+                    break
+
+            status = 0
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+                headers = {'Content-Type': 'application/json'} if body is not None else {}
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    connection.close()
+                    connection = None
+            except (OSError, http.client.HTTPException):
+                if connection is not None:
+                    connection.close()
+                connection = None
+            local_latencies.append((time.perf_counter() - request_started) * 1000.0)
+            local_statuses[status] += 1
+
+        if connection is not None:
+            connection.close()
+        with result_lock:
+            latencies_ms.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies_ms, statuses, time.perf_counter() - started)
+
+
+# --- Server under test ---
+def write_stub_bundle(path):
+    """
+    A ridge bundle fitted to random data. It answers like the real model at almost no cost, so
+    load results with it show the HTTP and framework overhead.
+    """
+    from sklearn.linear_model import Ridge
+    from sklearn.preprocessing import MinMaxScaler
+
+    from features import X_COLUMNS, build_features
+    from model_bundle import write_bundle
+    from regressors import RegressorModel
+
+    features = build_features(synthetic_flare_records(500, seed=1))
+    scaler_X = MinMaxScaler().fit(features)
+    y = np.random.default_rng(0).uniform(0, 3600, size=(len(features), 1))
+    scaler_y = MinMaxScaler().fit(y)
+    joblib_path = os.path.splitext(path)[0] + '.joblib'
+    RegressorModel(Ridge(), 'ridge').fit(scaler_X.transform(features).reshape(-1, 1, len(X_COLUMNS)), scaler_y.transform(y)).save(joblib_path)
+    write_bundle(path, joblib_path, scaler_X, scaler_y)
+    return path
+
+
+def write_stub_ar_model(path):
+    """An AR evolution model trained on synthetic regions, as the stub for the classify_ar scenarios."""
+    from ar_evolution import train_ar_model
+    from bench_ar_evolution import synthetic_regions
+
+    train_ar_model(*synthetic_regions(5000), output_path=path)
+    return path
+
+
+def real_ar_model_path():
+    """The AR evolution model the server would load with --model real, or None if none has been trained."""
+    from ar_evolution import DEFAULT_AR_MODEL_FILENAME
+
+    path = os.environ.get('ML_AR_MODEL_PATH', DEFAULT_AR_MODEL_FILENAME)
+    return path if os.path.exists(os.path.join(ML_BACKEND_DIR, path)) else None
+
+
+def server_environment(args, stub_bundle_path, stub_ar_model_path=None):
+    env = dict(os.environ)
+    env.update({'ML_INFERENCE_BACKEND': args.backend, 'ML_WORKERS': str(args.workers), 'PYTHONUNBUFFERED': '1'})
+    if stub_bundle_path:
+        env['ML_MODEL_BUNDLE'] = stub_bundle_path
+    if stub_ar_model_path:
+        env['ML_AR_MODEL_PATH'] = stub_ar_model_path
+    if not args.cache:
+        env['ML_CACHE_ENABLED'] = '0'
+    return env
+
+
+def server_command(mode, port, workers):
+    if mode == 'flask':
+        return [sys.executable, '-m', 'flask', '--app', 'ml_backend_server', 'run', '--port', str(port), '--with-threads']
+    if mode == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'ml_backend_server:app']
+    if mode == 'asgi':
+        return [sys.executable, '-m', 'uvicorn', 'asgi_server:app', '--host', '127.0.0.1', '--port', str(port),
+                '--workers', str(workers), '--log-level', 'warning']
+    raise ValueError(f"Unknown server mode '{mode}'. Expected one of {SERVER_MODES}.")
+
+
+def wait_until_ready(host, port, process, timeout_seconds):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout_seconds:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before becoming ready.")
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=2)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return time.perf_counter() - started
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server was not ready within {timeout_seconds} seconds.")
+
+
+# --- make_prediction micro-benchmarks ---
+def time_calls(function, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    latencies = np.array(latencies)
+    summary = {f"p{p}_ms": float(np.percentile(latencies, p)) for p in PERCENTILES}
+    summary.update({"mean_ms": float(latencies.mean()), "calls_per_second": 1000.0 / latencies.mean()})
+    return summary
+
+
+def run_micro_benchmarks(iterations, batch_size):
+    """
+    Times the prediction path in-process, layer by layer: feature building, the model call alone,
+    make_prediction, make_batch_prediction and the Flask handler without a network. The
+    micro-batcher and cache are disabled by the parent, so every call does the full work.
+    """
+    import ml_backend_server as server
+    from features import build_features
+
+    model_lifecycle = server.model_lifecycle
+    if not model_lifecycle.ensure_loaded():
+        raise RuntimeError(f"Model failed to load: {model_lifecycle.status()['error']}")
+    components = server.ml_components
+    records = synthetic_flare_records(max(batch_size, 1000))
+    record = records[0]
+    features = build_features([record])
+    batch = records[:batch_size]
+    client = server.app.test_client()
+
+    benchmarks = {
+        "build_features": lambda: build_features([record]),
+        "predict_offsets": lambda: server.predict_offsets(components.model, components.scaler_X, components.scaler_y, features),
+        "make_prediction": lambda: server.make_prediction(components.model, components.scaler_X, components.scaler_y, record),
+        f"make_batch_prediction_{batch_size}": lambda: server.make_batch_prediction(components.model, components.scaler_X, components.scaler_y, batch),
+        "flask_handler": lambda: client.post('/api/ml_predict', json=record)
+    }
+    results = {}
+    for name, function in benchmarks.items():
+        function()
+        results[name] = time_calls(function, iterations)
+    results[f"make_batch_prediction_{batch_size}"]["rows_per_second"] = batch_size * results[f"make_batch_prediction_{batch_size}"]["calls_per_second"]
+    return results
+
+
+def run_micro_in_child(args, stub_bundle_path):
+    env = server_environment(args, stub_bundle_path)
+    env.update({'ML_MICRO_BATCHING': '0', 'ML_CACHE_ENABLED': '0', 'ML_BUNDLE_WATCH_SECONDS': '0'})
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child-micro', '--iterations', str(args.iterations), '--batch-size', str(args.batch_size)],
+        cwd=ML_BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# --- Comparison between runs ---
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ML_BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current):
+    """Prints p50/p99 and throughput of every load scenario and micro-benchmark against a baseline run."""
+    print(f"--- Compared with {baseline['metadata'].get('commit')} ({baseline['metadata'].get('timestamp')}) ---")
+    for section, rate_key in (('load', 'throughput_rps'), ('micro', 'calls_per_second')):
+        for name, result in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            changes = []
+            for key in ('p50_ms', 'p99_ms', rate_key):
+                if result.get(key) and old.get(key):
+                    changes.append(f"{key} {old[key]:.2f} -> {result[key]:.2f} ({(result[key] / old[key] - 1):+.0%})")
+            print(f"{section}/{name:<26} " + " | ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the ML endpoints and micro-benchmark make_prediction, saving results as JSON.")
+    parser.add_argument('--mode', choices=SERVER_MODES, default='gunicorn', help="How to start the server under test.")
+    parser.add_argument('--url', help="Load-test an already running server (host:port) instead of starting one.")
+    parser.add_argument('--model', choices=MODEL_CHOICES, default='stub',
+                        help="stub: a tiny ridge bundle, to measure HTTP overhead; real: the trained model in ml_backend/.")
+    parser.add_argument('--backend', default=os.environ.get('ML_INFERENCE_BACKEND', 'numpy'), help="ML_INFERENCE_BACKEND for the real model.")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--scenarios', help=f"Comma-separated scenarios (default: {','.join(SCENARIOS)}, without the "
+                                            f"classify_ar ones when the real model has no trained AR evolution model).")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, help="Target requests per second (open loop). Default: as fast as possible.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per scenario.")
+    parser.add_argument('--batch-size', type=int, default=64, help="Records per batch request and batch micro-benchmark.")
+    parser.add_argument('--unique-payloads', type=int, default=1000, help="Distinct flare records cycled through.")
+    parser.add_argument('--cache', action='store_true', help="Keep the prediction cache enabled in the server.")
+    parser.add_argument('--iterations', type=int, default=500, help="Calls per micro-benchmark.")
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help="JSON file for the results.")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="Results of an earlier run to compare against.")
+    parser.add_argument('--child-micro', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_micro:
+        print(json.dumps(run_micro_benchmarks(args.iterations, args.batch_size)))
+        return
+
+    results = {
+        "metadata": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "config": vars(args)
+        }
+    }
+
+    with tempfile.TemporaryDirectory(prefix='bench-load-') as tmp_dir:
+        stub_bundle_path = write_stub_bundle(os.path.join(tmp_dir, 'stub_bundle.npz')) if args.model == 'stub' else None
+        stub_ar_model_path = write_stub_ar_model(os.path.join(tmp_dir, 'stub_ar_evolution_model.npz')) if args.model == 'stub' else None
+        scenarios = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+        if not args.scenarios and args.model == 'real' and not args.url and real_ar_model_path() is None:
+            # Every request would fail with 503 until an AR evolution model is trained.
+            scenarios = [scenario for scenario in scenarios if scenario not in AR_SCENARIOS]
+            print(f"Note: no AR evolution model in {ML_BACKEND_DIR}; skipping {', '.join(AR_SCENARIOS)}.")
+
+        if not args.skip_micro:
+            results["micro"] = run_micro_in_child(args, stub_bundle_path)
+            print(f"--- make_prediction micro-benchmarks ({args.model} model, {args.iterations} calls each) ---")
+            for name, summary in results["micro"].items():
+                print(format_summary(name, summary))
+
+        if not args.skip_load:
+            process = None
+            if args.url:
+                host, port = args.url.rsplit(':', 1)
+                port = int(port)
+            else:
+                host, port = '127.0.0.1', args.port
+                log = open(os.path.join(tmp_dir, 'server.log'), 'w')
+                process = subprocess.Popen(server_command(args.mode, port, args.workers), cwd=ML_BACKEND_DIR,
+                                           env=server_environment(args, stub_bundle_path, stub_ar_model_path), stdout=log, stderr=subprocess.STDOUT)
+            try:
+                if process is not None:
+                    results["server"] = {"mode": args.mode, "startup_seconds": wait_until_ready(host, port, process, args.startup_timeout)}
+
+                records = synthetic_flare_records(args.unique_payloads)
+                plots = sorted(os.listdir(os.path.join(ML_BACKEND_DIR, 'public', 'plots'))) if os.path.isdir(os.path.join(ML_BACKEND_DIR, 'public', 'plots')) else []
+                plot_name = plots[0] if plots else 'missing.png'
+                load_mode = f"{args.rate:.0f} req/s target" if args.rate else "closed loop"
+                print(f"--- Load test: {args.mode if process else host + ':' + str(port)}, {args.concurrency} connections, {load_mode}, {args.duration:.0f} s per scenario ---")
+
+                results["load"] = {}
+                for scenario in scenarios:
+                    requests = scenario_requests(scenario, records, args.batch_size, plot_name)
+                    results["load"][scenario] = run_load(host, port, requests, args.concurrency, args.duration, rate=args.rate)
+                    print(format_summary(scenario, results["load"][scenario]))
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=30)
+                    log.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from shared_weights import DEFAULT_SHARED_WEIGHTS_DIR, process_memory
+
+
+ML_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ('private', 'shared')
+
+
+def process_tree(pid):
+    """The pid and all its descendants, from /proc/<pid>/task/*/children."""
+    pids = [pid]
+    for tid in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{tid}/children') as f:
+                for child in f.read().split():
+                    pids.extend(process_tree(int(child)))
+        except OSError:
+            continue
+    return pids
+
+
+def write_synthetic_bundle(path, lstm_units):
+    """A bundle for an LSTM with the given layer sizes and untrained weights, to measure a model larger than the shipped one."""
+    from sklearn.preprocessing import MinMaxScaler
+
+    from features import X_COLUMNS
+    from ml_model import build_lstm_model
+    from model_bundle import write_bundle
+
+    h5_path = os.path.splitext(path)[0] + '.h5'
+    build_lstm_model((1, len(X_COLUMNS)), lstm1_units=lstm_units[0], lstm2_units=lstm_units[1]).save(h5_path)
+    rng = np.random.default_rng(0)
+    write_bundle(path, h5_path, MinMaxScaler().fit(rng.random((10, len(X_COLUMNS)))), MinMaxScaler().fit(rng.random((10, 1))))
+    return path
+
+
+def send_predictions(port, batches=20, batch_size=256):
+    record = {'total_counts': 50000, 'x_pos_asec': 100, 'y_pos_asec': -200, 'start_hour': 21, 'start_minute': 29,
+              'start_second': 56, 'end_hour': 21, 'end_minute': 41, 'end_second': 48}
+    body = json.dumps([record] * batch_size)
+    for _ in range(batches):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        connection.request('POST', '/api/ml_predict/batch', body=body, headers={'Content-Type': 'application/json'})
+        connection.getresponse().read()
+        connection.close()
+
+
+def measure(mode, workers, bundle_path, shared_dir, port, preload, startup_timeout):
+    """Starts gunicorn with `workers` workers, waits until every worker has loaded the model, serves some traffic and sums memory."""
+    env = dict(os.environ)
+    env.update({
+        'ML_INFERENCE_BACKEND': 'numpy', 'ML_WORKERS': str(workers), 'ML_PRELOAD': '1' if preload else '0',
+        'ML_MODEL_BUNDLE': bundle_path, 'ML_SHARED_WEIGHTS': '1' if mode == 'shared' else '0',
+        'ML_SHARED_WEIGHTS_DIR': shared_dir, 'ML_CACHE_ENABLED': '0', 'PYTHONUNBUFFERED': '1'
+    })
+    with tempfile.NamedTemporaryFile('w+', suffix='.log') as log:
+        process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'ml_backend_server:app'],
+                                   cwd=ML_BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            expected_loads = 1 if preload else workers
+            started = time.perf_counter()
+            while True:
+                log.seek(0)
+                if log.read().count('loaded successfully') >= expected_loads:
+                    break
+                if process.poll() is not None or time.perf_counter() - started > startup_timeout:
+                    log.seek(0)
+                    raise RuntimeError(f"gunicorn did not load {expected_loads} model(s):\n{log.read()[-2000:]}")
+                time.sleep(0.2)
+            time.sleep(0.5)
+            send_predictions(port)
+            time.sleep(0.5)
+
+            pids = process_tree(process.pid)
+            memory = [process_memory(pid) for pid in pids]
+            memory = [entry for entry in memory if entry is not None]
+            return {
+                "mode": mode,
+                "workers": workers,
+                "processes": len(memory),
+                "total_pss_mb": sum(entry["pss"] for entry in memory) / 2 ** 20,
+                "total_rss_mb": sum(entry["rss"] for entry in memory) / 2 ** 20,
+                "worker_uss_mb": sum(entry["uss"] for entry in memory[1:]) / max(1, len(memory) - 1) / 2 ** 20
+            }
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure gunicorn memory per extra worker with private and shared (memory-mapped) model weights.")
+    parser.add_argument('--bundle-path', default=os.path.join(ML_BACKEND_DIR, 'model_bundle.npz'))
+    parser.add_argument('--lstm-units', help="e.g. 1024,512: measure an untrained LSTM of that size instead of --bundle-path.")
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--preload', action='store_true', help="Use gunicorn --preload (fork after loading) for both modes.")
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help="Optional JSON file for the results.")
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(',')]
+    tmp_dir = tempfile.mkdtemp(prefix='bench-memory-')
+    shared_dir = tempfile.mkdtemp(prefix='bench-memory-', dir=DEFAULT_SHARED_WEIGHTS_DIR)
+    try:
+        bundle_path = args.bundle_path
+        if args.lstm_units:
+            bundle_path = write_synthetic_bundle(os.path.join(tmp_dir, 'model_bundle.npz'), [int(units) for units in args.lstm_units.split(',')])
+        print(f"--- gunicorn memory, NumPy backend, bundle {bundle_path} ({os.path.getsize(bundle_path) / 2 ** 20:.1f} MB), "
+              f"{'with' if args.preload else 'without'} --preload ---")
+
+        results = []
+        for mode in args.modes.split(','):
+            by_workers = {}
+            for workers in worker_counts:
+                result = measure(mode, workers, bundle_path, shared_dir, args.port, args.preload, args.startup_timeout)
+                by_workers[workers] = result
+                print(f"{mode:<8} {workers} worker(s): total PSS {result['total_pss_mb']:7.1f} MB | "
+                      f"total RSS {result['total_rss_mb']:7.1f} MB | private (USS) per worker {result['worker_uss_mb']:6.1f} MB")
+                results.append(result)
+
+            if len(worker_counts) > 1:
+                fewest, most = min(worker_counts), max(worker_counts)
+                per_worker = (by_workers[most]["total_pss_mb"] - by_workers[fewest]["total_pss_mb"]) / (most - fewest)
+                print(f"{mode:<8} memory per extra worker: {per_worker:.1f} MB (PSS, {fewest} -> {most} workers)")
+                for result in results[-len(worker_counts):]:
+                    result["pss_mb_per_extra_worker"] = per_worker
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+
+from ml_model import MODELS, TrainConfig, prepare_data, train_model
+
+
+BATCH_SIZES = (1, 64, 4096)
+
+
+def serving_predictor(backend, model):
+    """The object the server would call: the compiled tf.function path for the LSTM, the model itself otherwise."""
+    if backend != 'lstm':
+        return model
+    from inference import CompiledPredictor
+    return CompiledPredictor(model)
+
+
+def latency_ms(predict, X, iterations):
+    predict(X)
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        predict(X)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def bench_backend(backend, data, output_dir, epochs, iterations):
+    config = TrainConfig(model=backend, output_dir=os.path.join(output_dir, backend), epochs=epochs, loader='memory')
+
+    started = time.perf_counter()
+    model, _ = train_model(config, data)
+    train_seconds = time.perf_counter() - started
+
+    predictor = serving_predictor(backend, model)
+    scaler_y = data["scaler_y"]
+    y_pred = predictor.predict(data["X_test"].astype(np.float32), batch_size=4096)
+    mae_seconds = mean_absolute_error(scaler_y.inverse_transform(data["y_test"]), scaler_y.inverse_transform(y_pred))
+
+    result = {
+        "backend": backend,
+        "test_mae_seconds": float(mae_seconds),
+        "train_seconds": train_seconds,
+        "model_bytes": os.path.getsize(config.artifact_path(config.model_filename))
+    }
+    X_pool = data["X_test"].astype(np.float32)
+    for batch_size in BATCH_SIZES:
+        X = X_pool[np.arange(batch_size) % len(X_pool)]
+        p50, p99 = latency_ms(lambda batch: predictor.predict(batch, batch_size=len(batch)), X, iterations)
+        result[f"p50_ms_batch_{batch_size}"] = p50
+        result[f"p99_ms_batch_{batch_size}"] = p99
+    return result
+
+
+def print_table(results):
+    header = f"{'backend':<8} {'MAE (s)':>9} {'train (s)':>10} {'size (KB)':>10}" + ''.join(f" {f'p50 @{b} (ms)':>15}" for b in BATCH_SIZES)
+    print("\n" + header)
+    print('-' * len(header))
+    for result in sorted(results, key=lambda r: r["test_mae_seconds"]):
+        print(f"{result['backend']:<8} {result['test_mae_seconds']:>9.2f} {result['train_seconds']:>10.2f} "
+              f"{result['model_bytes'] / 1024:>10.1f}" + ''.join(f" {result[f'p50_ms_batch_{b}']:>15.3f}" for b in BATCH_SIZES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare accuracy, training time, latency and size of the peak-time model backends.")
+    parser.add_argument('--data-path', default='solar_flare_dataset.csv')
+    parser.add_argument('--loader', choices=('memory', 'feature_store'), default='memory')
+    parser.add_argument('--backends', default=','.join(MODELS), help="Comma-separated backends (default: %(default)s).")
+    parser.add_argument('--epochs', type=int, default=200, help="Epochs for the LSTM (early stopping still applies).")
+    parser.add_argument('--iterations', type=int, default=50, help="Timed calls per batch size.")
+    parser.add_argument('--output', help="Optional JSON file for the results.")
+    args = parser.parse_args()
+
+    data = prepare_data(TrainConfig(data_path=args.data_path, loader=args.loader))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = [bench_backend(backend, data, output_dir, args.epochs, args.iterations) for backend in args.backends.split(',')]
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
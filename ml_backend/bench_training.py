@@ -0,0 +1,105 @@
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+
+
+# Training setups compared against the default one; each is a set of TrainConfig overrides.
+VARIANTS = {
+    'baseline': {},
+    'tf.data': {"pipeline": 'tf.data'},
+    'throughput': {"throughput": True},
+    'throughput+xla': {"throughput": True, "jit_compile": True},
+    'batch256+lr': {"throughput": True, "batch_size": 256, "scale_learning_rate": True},
+}
+
+
+def run_variant(name, overrides, data_path, loader, epochs, patience):
+    """
+    Trains the LSTM once with `overrides` in this (fresh) process, so the thread-pool settings
+    take effect, and reports its throughput and time to the early-stopping point.
+    """
+    from ml_model import TrainConfig, configure_tensorflow, prepare_data, train_lstm
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        config = TrainConfig(data_path=data_path, loader=loader, output_dir=output_dir, epochs=epochs, patience=patience, **overrides)
+        configure_tensorflow(config)
+        data = prepare_data(config)
+
+        started = time.perf_counter()
+        model, history = train_lstm(config, data)
+        fit_seconds = time.perf_counter() - started
+
+    scaler_y = data["scaler_y"]
+    y_pred = model.predict(data["X_test"].astype(np.float32), batch_size=4096, verbose=0)
+    epoch_seconds = np.array(history["epoch_seconds"])
+    best_epoch = int(np.argmin(history["val_loss"]))
+    n_fit = int(len(data["X_train"]) * (1 - config.validation_split))
+    # The first epoch also traces the graph (and fills caches); the rest show the steady state.
+    steady = epoch_seconds[1:] if len(epoch_seconds) > 1 else epoch_seconds
+    return {
+        "variant": name,
+        "batch_size": config.batch_size,
+        "learning_rate": config.learning_rate,
+        "samples_per_second": n_fit / float(np.median(steady)),
+        "first_epoch_seconds": float(epoch_seconds[0]),
+        "epochs_trained": len(epoch_seconds),
+        "best_epoch": best_epoch + 1,
+        "seconds_to_best": float(epoch_seconds[:best_epoch + 1].sum()),
+        "fit_seconds": fit_seconds,
+        "best_val_loss": float(history["val_loss"][best_epoch]),
+        "test_mae_seconds": float(mean_absolute_error(scaler_y.inverse_transform(data["y_test"]), scaler_y.inverse_transform(y_pred)))
+    }
+
+
+def print_table(results):
+    header = (f"{'variant':<15} {'batch':>6} {'samples/s':>10} {'epochs':>7} {'best':>5} "
+              f"{'to best (s)':>12} {'fit (s)':>9} {'MAE (s)':>9}")
+    print("\n" + header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['variant']:<15} {result['batch_size']:>6} {result['samples_per_second']:>10.0f} {result['epochs_trained']:>7} "
+              f"{result['best_epoch']:>5} {result['seconds_to_best']:>12.1f} {result['fit_seconds']:>9.1f} {result['test_mae_seconds']:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare LSTM training throughput and time to early stopping across training setups.")
+    parser.add_argument('--data-path', default='solar_flare_dataset.csv')
+    parser.add_argument('--loader', choices=('memory', 'feature_store'), default='memory')
+    parser.add_argument('--variants', default=','.join(VARIANTS), help="Comma-separated variants (default: %(default)s).")
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--patience', type=int, default=15)
+    parser.add_argument('--output', help="Optional JSON file for the results.")
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.variants.split(',') if name]
+    unknown = [name for name in names if name not in VARIANTS]
+    if unknown:
+        parser.error(f"Unknown variants {unknown}. Expected a subset of {tuple(VARIANTS)}.")
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        # A new process per variant: TensorFlow's thread pools cannot be resized once it has started.
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_variant, name, VARIANTS[name], args.data_path, args.loader, args.epochs, args.patience).result()
+        print(f"{name}: {result['samples_per_second']:.0f} samples/s, best epoch {result['best_epoch']} "
+              f"after {result['seconds_to_best']:.1f}s")
+        results.append(result)
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    main()
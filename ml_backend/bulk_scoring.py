@@ -0,0 +1,257 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CSV_DTYPES, DATETIME_FORMAT, DEFAULT_CHUNK_SIZE, REGION_COLUMN, TARGET_COLUMN, IngestStats, engineer_chunk
+from features import X_COLUMNS
+from model_bundle import DEFAULT_BUNDLE_FILENAME
+from sequences import SequenceHistory
+
+
+OUTPUT_FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# A catalog needs every training column except the peak, which is what gets predicted. When a
+# peak is present, its offset is reported next to the prediction.
+REQUIRED_COLUMNS = [column for column in CSV_DTYPES if column != 'peak']
+# The active region is optional; sequence models grouped by region use it.
+INPUT_DTYPES = {**CSV_DTYPES, REGION_COLUMN: 'float64'}
+NUMERIC_COLUMNS = [column for column, dtype in INPUT_DTYPES.items() if dtype == 'float64']
+OUTPUT_COLUMNS = ['row', 'start_datetime', 'predicted_offset_seconds', 'predicted_peak_time', 'actual_offset_seconds', 'error']
+# Rows per model forward pass within a chunk. The model's activations grow with the batch, so a
+# chunk is scored in slices of this size; throughput is flat above a few thousand rows.
+MODEL_BATCH_SIZE = 8192
+# Bytes read from an upload at a time when splitting it into NDJSON lines.
+READ_BLOCK_SIZE = 1 << 16
+
+
+def read_csv_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields (raw chunk, row errors) from a catalog CSV path or file-like object. The chunk index is
+    the data row number, counted across chunks. Only the columns scoring needs are parsed.
+    """
+    reader = pd.read_csv(source, usecols=lambda column: column in INPUT_DTYPES, dtype=INPUT_DTYPES, chunksize=chunk_size)
+    for chunk in reader:
+        yield chunk, []
+
+
+def iter_stream_lines(stream, block_size=READ_BLOCK_SIZE):
+    """Splits a byte stream that only offers read(size) into lines, holding at most one block and one partial line."""
+    pending = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _records_frame(records, rows):
+    chunk = pd.DataFrame.from_records(records, index=pd.Index(rows, dtype=np.int64), columns=list(INPUT_DTYPES))
+    for column in INPUT_DTYPES:
+        if column in NUMERIC_COLUMNS:
+            chunk[column] = pd.to_numeric(chunk[column], errors='coerce').astype('float64')
+        else:
+            # Missing values become 'nan'/'None', which fail to parse as times like a bad CSV cell.
+            chunk[column] = chunk[column].astype(str)
+    return chunk
+
+
+def read_ndjson_chunks(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields (raw chunk, row errors) from NDJSON lines (bytes or str), one catalog row per line with
+    the CSV's column names. Blank lines are skipped and do not count as rows; a line that is not
+    a JSON object becomes a row error instead of ending the stream.
+    """
+    records, rows, errors = [], [], []
+    row = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            records.append(record)
+            rows.append(row)
+        else:
+            errors.append((row, "Line is not a JSON object."))
+        row += 1
+        if len(rows) + len(errors) >= chunk_size:
+            yield _records_frame(records, rows), errors
+            records, rows, errors = [], [], []
+    if rows or errors:
+        yield _records_frame(records, rows), errors
+
+
+def offset_predictor(model, scaler_X, scaler_y, batch_size=MODEL_BATCH_SIZE):
+    """
+    Wraps a model and its scalers into a function from a feature matrix to peak offsets in seconds
+    (clipped at zero), running the model on slices of at most `batch_size` rows. Windows of
+    flares (n, window, n_features) are scaled row by row.
+    """
+    def predict(features):
+        n_features = features.shape[-1]
+        scaled_features = scaler_X.transform(features.reshape(-1, n_features))
+        X_reshaped = scaled_features.reshape(len(features), -1, n_features)
+        predicted_scaled_offsets = np.concatenate([
+            model.predict(X_reshaped[start:start + batch_size], batch_size=batch_size, verbose=0)
+            for start in range(0, len(X_reshaped), batch_size)
+        ])
+        return np.maximum(scaler_y.inverse_transform(predicted_scaled_offsets)[:, 0], 0)
+    return predict
+
+
+def score_chunks(chunks, predict, stats=None, datetime_format=DATETIME_FORMAT, history=None):
+    """
+    Scores (raw chunk, row errors) pairs and yields one DataFrame with OUTPUT_COLUMNS per chunk,
+    ordered by row. `predict` maps a (rows, X_COLUMNS) feature matrix to offsets in seconds and
+    is called once per chunk. Rows with unparsable times or missing features get an error
+    instead of a prediction. With a SequenceHistory (sequence models), each row is scored with the
+    rows before it in the file, per active region if the catalog has that column.
+    """
+    for chunk, errors in chunks:
+        missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Catalog is missing required columns: {missing}")
+
+        engineered = engineer_chunk(chunk, datetime_format, require_target=False)
+        features = engineered[X_COLUMNS].to_numpy(dtype=np.float64)
+        if history is not None and len(engineered):
+            features = history.windows(features, engineered['region'].to_numpy() if 'region' in engineered else None)
+        offsets = predict(features) if len(engineered) else np.empty(0)
+        start_datetime = pd.Series(engineered['start_datetime'])
+        peak_datetime = (start_datetime + pd.to_timedelta(np.round(offsets), unit='s'))
+
+        results = pd.DataFrame({
+            'row': engineered.index.to_numpy(dtype=np.int64),
+            'start_datetime': start_datetime.dt.strftime(datetime_format).to_numpy(),
+            'predicted_offset_seconds': offsets,
+            'predicted_peak_time': peak_datetime.dt.strftime(datetime_format).to_numpy(),
+            'actual_offset_seconds': engineered[TARGET_COLUMN].to_numpy(),
+            'error': None
+        })
+
+        skipped = chunk.index.difference(engineered.index)
+        error_rows = [(row, "Unparsable times or missing features.") for row in skipped] + errors
+        if error_rows:
+            failed = pd.DataFrame(error_rows, columns=['row', 'error'])
+            results = pd.concat([results, failed.reindex(columns=OUTPUT_COLUMNS)], ignore_index=True).sort_values('row', kind='stable')
+
+        if stats is not None:
+            stats.rows_read += len(chunk) + len(errors)
+            stats.rows_kept += len(engineered)
+            stats.chunks += 1
+        yield results
+
+
+def format_results(results_stream, output_format):
+    """Yields the text of each results chunk; CSV output starts with a header line."""
+    if output_format == 'csv':
+        yield ','.join(OUTPUT_COLUMNS) + '\n'
+    for results in results_stream:
+        if results.empty:
+            continue
+        if output_format == 'csv':
+            yield results.to_csv(index=False, header=False)
+        else:
+            text = results.to_json(orient='records', lines=True)
+            yield text if text.endswith('\n') else text + '\n'
+
+
+def summary_line(stats, output_format):
+    """The last line of a streamed response: row counts and throughput. In CSV it is a '#' comment line."""
+    summary = {
+        "rows": stats.rows_read,
+        "scored": stats.rows_kept,
+        "errors": stats.rows_read - stats.rows_kept,
+        "seconds": round(stats.seconds, 3),
+        "rows_per_second": round(stats.rows_per_second, 1)
+    }
+    if output_format == 'csv':
+        return '# ' + ' '.join(f"{key}={value}" for key, value in summary.items()) + '\n'
+    return json.dumps({"summary": summary}) + '\n'
+
+
+def error_line(message, output_format):
+    """Reports an error that ends a stream after the response status has already been sent."""
+    if output_format == 'csv':
+        return f"# error={message}\n"
+    return json.dumps({"error": message}) + '\n'
+
+
+def load_predictor(bundle_path=DEFAULT_BUNDLE_FILENAME, runtime='numpy', exported_model=None, threads=0):
+    """
+    The predict function, model version and sequence settings (None for single-flare models) for
+    the CLI: an exported ONNX/TFLite model if given, else a model bundle.
+    """
+    if exported_model:
+        from exported_runtime import IdentityScaler, exported_model_version, load_exported_model
+
+        return offset_predictor(load_exported_model(exported_model, threads), IdentityScaler(), IdentityScaler()), exported_model_version(exported_model), None
+
+    from model_bundle import load_bundle
+
+    bundle = load_bundle(bundle_path, runtime=runtime)
+    return offset_predictor(bundle.model, bundle.scaler_X, bundle.scaler_y), bundle.version, bundle.manifest.get("sequence")
+
+
+def track_absolute_errors(results_stream, totals):
+    """Passes results through, adding the absolute error and count of rows with a known peak offset to `totals`."""
+    for results in results_stream:
+        known = (results['actual_offset_seconds'].notna() & results['error'].isna()).to_numpy()
+        if known.any():
+            difference = results['predicted_offset_seconds'].to_numpy()[known] - results['actual_offset_seconds'].to_numpy()[known]
+            totals[0] += float(np.abs(difference).sum())
+            totals[1] += int(known.sum())
+        yield results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a flare catalog CSV (the columns of solar_flare_dataset.csv) in chunks with bounded memory.")
+    parser.add_argument('input', help="Catalog CSV to score.")
+    parser.add_argument('--output', help="Output file; defaults to <input>_scored.<format>. Use - for stdout.")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk and per model call; bounds memory.")
+    parser.add_argument('--bundle-path', default=DEFAULT_BUNDLE_FILENAME)
+    parser.add_argument('--runtime', choices=('numpy', 'keras'), default='numpy')
+    parser.add_argument('--exported-model', help="Score with an ONNX/TFLite model from export_model.py instead of the bundle.")
+    parser.add_argument('--threads', type=int, default=0, help="Intra-op threads for an exported model; 0 keeps the runtime's default.")
+    args = parser.parse_args()
+
+    predict, version, sequence = load_predictor(args.bundle_path, args.runtime, args.exported_model, args.threads)
+    history = SequenceHistory(sequence["length"], sequence["group_by"], max_keys=sys.maxsize) if sequence else None
+    output_path = args.output or f"{os.path.splitext(args.input)[0]}_scored.{args.format}"
+    # The report goes to stderr so the scores can be written to stdout.
+    with contextlib.redirect_stdout(sys.stderr):
+        print(f"Scoring {args.input} with model {version} in chunks of {args.chunk_size} rows -> {output_path}")
+
+    stats = IngestStats('bulk-score')
+    totals = [0.0, 0]
+    results_stream = track_absolute_errors(score_chunks(read_csv_chunks(args.input, args.chunk_size), predict, stats, history=history), totals)
+    output = sys.stdout if output_path == '-' else open(output_path, 'w', newline='')
+    try:
+        for text in format_results(results_stream, args.format):
+            output.write(text)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        stats.finish()
+        if totals[1]:
+            print(f"MAE against the catalog's peak times: {totals[0] / totals[1]:.2f} s over {totals[1]} rows")
+        print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from features import X_COLUMNS, cyclical_encode
+
+
+# Only the columns training needs, with explicit dtypes so pandas never has to infer them.
+CSV_DTYPES = {
+    'start.date': str,
+    'start.time': str,
+    'peak': str,
+    'end': str,
+    'duration.s': 'float64',
+    'total.counts': 'float64',
+    'x.pos.asec': 'float64',
+    'y.pos.asec': 'float64'
+}
+
+# Active region number; read only when flares are grouped into per-region sequences.
+REGION_COLUMN = 'active.region.nb'
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+TARGET_COLUMN = 'peak_offset_seconds'
+DEFAULT_CHUNK_SIZE = 100_000
+
+TRAIN, VALIDATION, TEST = 0, 1, 2
+
+
+class IngestStats:
+    """Row and timing counters for one pass over the CSV."""
+
+    def __init__(self, label="ingest"):
+        self.label = label
+        self.rows_read = 0
+        self.rows_kept = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds > 0 else 0.0
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        print(f"[{self.label}] {self.rows_read} rows read, {self.rows_kept} kept, {self.chunks} chunks "
+              f"in {self.seconds:.2f} s ({self.rows_per_second:,.0f} rows/s)")
+
+
+def _parse_datetimes(dates, times, datetime_format):
+    return pd.to_datetime(dates + ' ' + times, format=datetime_format, errors='coerce')
+
+
+def engineer_chunk(chunk, datetime_format=DATETIME_FORMAT, require_target=True):
+    """
+    Feature engineering for one raw CSV chunk. Returns a DataFrame with start_datetime,
+    X_COLUMNS and peak_offset_seconds, keeping the chunk's row index; rows with unparsable
+    times, negative peak offsets or missing features are dropped. With `require_target=False`
+    (scoring) the peak column is optional and only the features have to be valid; the
+    target is NaN where it is unknown. If the chunk has the active region column, it is kept as
+    'region', with -1 for flares without one.
+    """
+    start_datetime = _parse_datetimes(chunk['start.date'], chunk['start.time'], datetime_format)
+    end_datetime = _parse_datetimes(chunk['start.date'], chunk['end'], datetime_format)
+    if require_target or 'peak' in chunk:
+        peak_datetime = _parse_datetimes(chunk['start.date'], chunk['peak'], datetime_format)
+        peak_offset_seconds = (peak_datetime - start_datetime).dt.total_seconds()
+    else:
+        peak_offset_seconds = pd.Series(np.nan, index=chunk.index)
+
+    keep = start_datetime.notna() & end_datetime.notna()
+    if require_target:
+        keep &= peak_datetime.notna() & (peak_offset_seconds >= 0)
+    keep = keep.to_numpy()
+    start_datetime = start_datetime[keep]
+    end_datetime = end_datetime[keep]
+
+    columns = {
+        'start_datetime': start_datetime.to_numpy(),
+        'duration.s': chunk['duration.s'].to_numpy()[keep],
+        'total.counts': chunk['total.counts'].to_numpy()[keep],
+        'x.pos.asec': chunk['x.pos.asec'].to_numpy()[keep],
+        'y.pos.asec': chunk['y.pos.asec'].to_numpy()[keep]
+    }
+    for prefix, datetimes in (('start_', start_datetime), ('end_', end_datetime)):
+        for time_unit in ('hour', 'minute'):
+            values = getattr(datetimes.dt, time_unit).to_numpy()
+            columns[f'{prefix}{time_unit}_sin'], columns[f'{prefix}{time_unit}_cos'] = cyclical_encode(values, time_unit)
+    columns[TARGET_COLUMN] = peak_offset_seconds.to_numpy()[keep]
+    if REGION_COLUMN in chunk:
+        columns['region'] = np.nan_to_num(chunk[REGION_COLUMN].to_numpy(dtype=np.float64)[keep], nan=-1).astype(np.int64)
+
+    engineered = pd.DataFrame(columns, index=chunk.index[keep])
+    complete = np.isfinite(engineered[X_COLUMNS + [TARGET_COLUMN] if require_target else X_COLUMNS].to_numpy(dtype=np.float64)).all(axis=1)
+    return engineered[complete] if not complete.all() else engineered
+
+
+def iter_engineered_chunks(data_path, chunksize=DEFAULT_CHUNK_SIZE, stats=None, datetime_format=DATETIME_FORMAT, with_region=False):
+    """
+    Reads the CSV in chunks and yields engineered DataFrames; memory is bounded by `chunksize`.
+    With `with_region`, the active region column is read too and kept as 'region'.
+    """
+    dtypes = {**CSV_DTYPES, REGION_COLUMN: 'float64'} if with_region else CSV_DTYPES
+    reader = pd.read_csv(data_path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+    for chunk in reader:
+        engineered = engineer_chunk(chunk, datetime_format)
+        if stats is not None:
+            stats.rows_read += len(chunk)
+            stats.rows_kept += len(engineered)
+            stats.chunks += 1
+        yield engineered
+    if stats is not None:
+        stats.finish()
+
+
+def row_uniforms(row_ids, seed=42):
+    """A uniform [0, 1) value per row from a hash of its position in the file; the same row always gets the same value."""
+    x = np.asarray(row_ids, dtype=np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+    # splitmix64 finalizer
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def assign_splits(row_ids, test_size=0.2, validation_size=0.2, seed=42):
+    """
+    Deterministic train/validation/test assignment from a hash of each row's position in the file,
+    so the split does not depend on the chunk size and needs no global shuffle. `validation_size`
+    is a fraction of the non-test rows, matching validation_split in model.fit.
+    """
+    uniform = row_uniforms(row_ids, seed)
+
+    splits = np.full(len(uniform), TRAIN, dtype=np.int8)
+    splits[uniform < test_size + (1 - test_size) * validation_size] = VALIDATION
+    splits[uniform < test_size] = TEST
+    return splits
+
+
+def fit_scalers_streaming(data_path, chunksize=DEFAULT_CHUNK_SIZE, datetime_format=DATETIME_FORMAT):
+    """One pass over the CSV that fits MinMaxScalers for X and y with partial_fit."""
+    scaler_X = MinMaxScaler()
+    scaler_y = MinMaxScaler()
+    stats = IngestStats("fit scalers")
+    for engineered in iter_engineered_chunks(data_path, chunksize, stats, datetime_format):
+        if len(engineered):
+            scaler_X.partial_fit(engineered[X_COLUMNS].to_numpy())
+            scaler_y.partial_fit(engineered[[TARGET_COLUMN]].to_numpy())
+
+    if stats.rows_kept == 0:
+        raise ValueError(f"No usable rows in {data_path} after feature engineering.")
+    return scaler_X, scaler_y, stats
+
+
+def iter_training_batches(data_path, scaler_X, scaler_y, split, batch_size=64, chunksize=DEFAULT_CHUNK_SIZE,
+                          shuffle=False, seed=42, test_size=0.2, validation_size=0.2, datetime_format=DATETIME_FORMAT):
+    """
+    Yields scaled (X, y) batches for one split, shaped (n, 1, n_features) and (n, 1), reading
+    the CSV chunk by chunk. With `shuffle`, rows are shuffled within each chunk.
+    """
+    rng = np.random.default_rng(seed)
+    stats = IngestStats(f"split {split}")
+    for engineered in iter_engineered_chunks(data_path, chunksize, stats, datetime_format):
+        selected = assign_splits(engineered.index.to_numpy(), test_size, validation_size, seed) == split
+        if not selected.any():
+            continue
+
+        X = scaler_X.transform(engineered[X_COLUMNS].to_numpy()[selected]).astype(np.float32)
+        y = scaler_y.transform(engineered[[TARGET_COLUMN]].to_numpy()[selected]).astype(np.float32)
+        if shuffle:
+            order = rng.permutation(len(X))
+            X, y = X[order], y[order]
+
+        X = X.reshape(-1, 1, X.shape[1])
+        for start in range(0, len(X), batch_size):
+            yield X[start:start + batch_size], y[start:start + batch_size]
+
+
+def make_tf_dataset(data_path, scaler_X, scaler_y, split, batch_size=64, chunksize=DEFAULT_CHUNK_SIZE, shuffle=False, **kwargs):
+    """
+    Wraps iter_training_batches in a tf.data.Dataset for model.fit. The generator is re-run on
+    every epoch, so only one chunk is held in memory at a time.
+    """
+    import tensorflow as tf
+
+    n_features = len(X_COLUMNS)
+    return tf.data.Dataset.from_generator(
+        lambda: iter_training_batches(data_path, scaler_X, scaler_y, split, batch_size, chunksize, shuffle, **kwargs),
+        output_signature=(
+            tf.TensorSpec(shape=(None, 1, n_features), dtype=tf.float32),
+            tf.TensorSpec(shape=(None, 1), dtype=tf.float32)
+        )
+    ).prefetch(tf.data.AUTOTUNE)
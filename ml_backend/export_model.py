@@ -0,0 +1,147 @@
+import argparse
+import os
+
+import numpy as np
+
+from features import X_COLUMNS
+
+
+EXPORT_FORMATS = ('onnx', 'tflite')
+EXPORTED_MODEL_PATHS = {
+    'onnx': 'solar_flare_peak_time_predictor.onnx',
+    'tflite': 'solar_flare_peak_time_predictor.tflite'
+}
+ONNX_OPSET = 17
+
+
+def unrolled_copy(keras_model):
+    """
+    Copy of a Sequential model with its LSTM layers unrolled. The model always sees one timestep,
+    so unrolling removes the while loop (which TFLite builtins cannot express) and leaves plain
+    matmuls; the weights are unchanged.
+    """
+    import tensorflow as tf
+
+    config = keras_model.get_config()
+    for layer_config in config['layers']:
+        if layer_config['class_name'] == 'LSTM':
+            layer_config['config']['unroll'] = True
+    unrolled = tf.keras.Sequential.from_config(config)
+    unrolled.set_weights(keras_model.get_weights())
+    return unrolled
+
+
+def folded_inference_function(keras_model, scaler_X, scaler_y):
+    """
+    A tf.function from raw features (n, len(X_COLUMNS)) in X_COLUMNS order to the predicted peak
+    offset in seconds (n, 1), with both MinMaxScalers folded into the graph as constants. Clipping
+    negative offsets is left to the caller, as with the Keras path.
+    """
+    import tensorflow as tf
+
+    unrolled = unrolled_copy(keras_model)
+    x_scale, x_min = np.asarray(scaler_X.scale_, dtype=np.float32), np.asarray(scaler_X.min_, dtype=np.float32)
+    y_scale, y_min = np.asarray(scaler_y.scale_, dtype=np.float32), np.asarray(scaler_y.min_, dtype=np.float32)
+
+    # The constants are created inside the function so they become graph constants, not captured inputs.
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, len(X_COLUMNS)), dtype=tf.float32, name='features')])
+    def predict_seconds(features):
+        scaled = features * tf.constant(x_scale) + tf.constant(x_min)
+        scaled_offset = unrolled(tf.expand_dims(scaled, axis=1), training=False)
+        return tf.identity((scaled_offset - tf.constant(y_min)) / tf.constant(y_scale), name='peak_offset_seconds')
+
+    return predict_seconds
+
+
+def export_tflite(keras_model, scaler_X, scaler_y, path=EXPORTED_MODEL_PATHS['tflite']):
+    import tensorflow as tf
+
+    function = folded_inference_function(keras_model, scaler_X, scaler_y)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([function.get_concrete_function()], keras_model)
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+def export_onnx(keras_model, scaler_X, scaler_y, path=EXPORTED_MODEL_PATHS['onnx'], opset=ONNX_OPSET):
+    """Requires the optional tf2onnx package."""
+    import tensorflow as tf
+    import tf2onnx
+
+    function = folded_inference_function(keras_model, scaler_X, scaler_y)
+    model_proto, _ = tf2onnx.convert.from_function(
+        function,
+        input_signature=[tf.TensorSpec(shape=(None, len(X_COLUMNS)), dtype=tf.float32, name='features')],
+        opset=opset
+    )
+    metadata = {"x_columns": ','.join(X_COLUMNS), "scaling": "folded", "output": "peak_offset_seconds"}
+    for key, value in metadata.items():
+        entry = model_proto.metadata_props.add()
+        entry.key, entry.value = key, value
+    with open(path, 'wb') as f:
+        f.write(model_proto.SerializeToString())
+    return path
+
+
+def load_keras_components(bundle_path=None, model_path=None, scaler_x_path=None, scaler_y_path=None):
+    """The Keras model and scalers to export, from a model bundle or from the .h5 and scaler pickles."""
+    if bundle_path:
+        from model_bundle import load_bundle
+        bundle = load_bundle(bundle_path, runtime='keras')
+        if bundle.backend != 'lstm':
+            raise ValueError(f"Only the LSTM can be exported; {bundle_path} holds a '{bundle.backend}' model.")
+        model, scaler_X, scaler_y = bundle.model, bundle.scaler_X, bundle.scaler_y
+    else:
+        import joblib
+        from tensorflow.keras.models import load_model
+        model, scaler_X, scaler_y = load_model(model_path, compile=False), joblib.load(scaler_x_path), joblib.load(scaler_y_path)
+
+    # The exported graph takes one flare per row; models trained on windows of flares need the history the server keeps.
+    if model.input_shape[1] != 1:
+        raise ValueError(f"Only single-flare models can be exported; this model takes windows of {model.input_shape[1]} flares.")
+    return model, scaler_X, scaler_y
+
+
+def check_parity(exported_model, keras_model, scaler_X, scaler_y, raw_features):
+    """Max absolute difference, in seconds, between the exported model and the Keras path on raw features."""
+    scaled = scaler_X.transform(raw_features).reshape(-1, 1, len(X_COLUMNS)).astype(np.float32)
+    expected = scaler_y.inverse_transform(keras_model.predict(scaled, batch_size=4096, verbose=0))
+    return float(np.abs(exported_model.predict(raw_features) - expected).max())
+
+
+def main():
+    from exported_runtime import load_exported_model
+
+    parser = argparse.ArgumentParser(description="Export the peak-time LSTM, with its scalers folded in, to ONNX and/or TFLite.")
+    parser.add_argument('--format', choices=EXPORT_FORMATS + ('all',), default='all')
+    parser.add_argument('--bundle-path', default='model_bundle.npz', help="Model bundle to export (used if it exists).")
+    parser.add_argument('--model-path', default='solar_flare_peak_time_predictor_lstm_model.h5')
+    parser.add_argument('--scaler-x-path', default='scaler_X.pkl')
+    parser.add_argument('--scaler-y-path', default='scaler_y.pkl')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--parity-data', help="Flare CSV; checks parity with Keras on its held-out test split.")
+    args = parser.parse_args()
+
+    bundle_path = args.bundle_path if os.path.exists(args.bundle_path) else None
+    keras_model, scaler_X, scaler_y = load_keras_components(bundle_path, args.model_path, args.scaler_x_path, args.scaler_y_path)
+
+    if args.parity_data:
+        from ml_model import TrainConfig, prepare_data
+        data = prepare_data(TrainConfig(data_path=args.parity_data, loader='memory'))
+        # prepare_data scales with scalers fitted on that CSV; undo them to get the raw held-out features.
+        raw_features = data["scaler_X"].inverse_transform(data["X_test"][:, 0, :])
+    else:
+        raw_features = scaler_X.inverse_transform(np.random.default_rng(0).uniform(0, 1, size=(1024, len(X_COLUMNS))))
+
+    formats = EXPORT_FORMATS if args.format == 'all' else (args.format,)
+    for export_format in formats:
+        path = os.path.join(args.output_dir, EXPORTED_MODEL_PATHS[export_format])
+        exporter = export_onnx if export_format == 'onnx' else export_tflite
+        exporter(keras_model, scaler_X, scaler_y, path)
+        max_diff = check_parity(load_exported_model(path), keras_model, scaler_X, scaler_y, raw_features)
+        print(f"Exported {export_format} model to {path} ({os.path.getsize(path) / 1024:.1f} KB); "
+              f"max difference from Keras over {len(raw_features)} rows: {max_diff:.4f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+
+class IdentityScaler:
+    """Stands in for scaler_X / scaler_y when the scaling is already folded into the exported graph."""
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64)
+
+    def inverse_transform(self, X):
+        return np.asarray(X, dtype=np.float64)
+
+
+class _ExportedPredictor:
+    """
+    Common predict / warmup interface for the exported models. They take raw features, so inputs
+    shaped (n, 1, n_features) like the LSTM's are flattened to (n, n_features); outputs are
+    (n, 1) offsets in seconds.
+    """
+
+    backend = None
+    n_features = None
+
+    @property
+    def input_shape(self):
+        return (None, 1, self.n_features)
+
+    def _run(self, features):
+        raise NotImplementedError
+
+    def predict(self, X, batch_size=None, verbose=None):
+        features = np.ascontiguousarray(np.asarray(X, dtype=np.float32).reshape(len(X), -1))
+        return self._run(features).reshape(-1, 1)
+
+    def warmup(self, batch_sizes=(1, 32)):
+        started = time.perf_counter()
+        for size in batch_sizes:
+            self.predict(np.zeros((size, self.n_features), dtype=np.float32))
+        self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
+
+
+class OnnxPredictor(_ExportedPredictor):
+    """Runs an exported .onnx model in onnxruntime (CPU). InferenceSession.run is thread-safe."""
+
+    backend = 'onnx'
+
+    def __init__(self, path, threads=0):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.n_features = model_input.shape[-1]
+        self.warmup_seconds = None
+
+    def _run(self, features):
+        return self.session.run(None, {self.input_name: features})[0]
+
+
+def _tflite_interpreter_class():
+    # The standalone LiteRT / tflite_runtime interpreters avoid importing all of TensorFlow.
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLitePredictor(_ExportedPredictor):
+    """
+    Runs an exported .tflite model. The interpreter is not thread-safe and must be resized for
+    each new batch size, so calls are serialised with a lock.
+    """
+
+    backend = 'tflite'
+
+    def __init__(self, path, threads=0):
+        Interpreter = _tflite_interpreter_class()
+        self.interpreter = Interpreter(model_path=path, num_threads=threads or None)
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.n_features = int(self.interpreter.get_input_details()[0]['shape'][-1])
+        self.warmup_seconds = None
+        self._batch_size = 1
+        self._lock = threading.Lock()
+
+    def _run(self, features):
+        with self._lock:
+            if len(features) != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, features.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(features)
+            self.interpreter.set_tensor(self.input_index, features)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+def load_exported_model(path, threads=0):
+    """Loads a model written by export_model.py; the runtime is chosen by file extension."""
+    if path.endswith('.onnx'):
+        return OnnxPredictor(path, threads)
+    if path.endswith('.tflite'):
+        return TFLitePredictor(path, threads)
+    raise ValueError(f"Unknown exported model type for {path}. Expected a .onnx or .tflite file.")
+
+
+def exported_model_version(path):
+    """First 12 hex digits of the SHA-256 of the exported file, reported as the model version."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
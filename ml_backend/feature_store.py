@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from data_loader import DEFAULT_CHUNK_SIZE, TARGET_COLUMN, IngestStats, iter_engineered_chunks
+from features import X_COLUMNS
+
+
+# Bump when feature engineering changes so cached matrices built by older code are not reused.
+FEATURE_VERSION = 1
+
+DEFAULT_STORE_DIR = 'feature_store'
+
+# name -> (dtype, columns per row); X has one column per feature, the rest are 1-D.
+ARRAYS = {
+    'X': (np.float64, len(X_COLUMNS)),
+    'y': (np.float64, 1),
+    'row_id': (np.int64, None),
+    'start_ns': (np.int64, None)
+}
+
+
+def source_hash(data_path, block_size=1 << 20):
+    """SHA-256 of the source file contents plus the feature version, used as the cache key."""
+    digest = hashlib.sha256(f"features-v{FEATURE_VERSION}:{','.join(X_COLUMNS)};".encode('utf-8'))
+    with open(data_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def entry_dir(store_dir, key):
+    return os.path.join(store_dir, key[:32])
+
+
+def _chunk_arrays(engineered):
+    return {
+        'X': engineered[X_COLUMNS].to_numpy(dtype=np.float64),
+        'y': engineered[TARGET_COLUMN].to_numpy(dtype=np.float64).reshape(-1, 1),
+        'row_id': engineered.index.to_numpy(dtype=np.int64),
+        'start_ns': engineered['start_datetime'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    }
+
+
+def build_feature_store(data_path, store_dir=DEFAULT_STORE_DIR, chunksize=DEFAULT_CHUNK_SIZE, key=None):
+    """
+    Streams the CSV through the chunked feature engineering and writes the engineered matrix
+    (X in X_COLUMNS order, y = peak_offset_seconds, original row ids and start times) as .npy files
+    under store_dir/<hash>/. Chunks are spooled to raw files first, so memory stays bounded by
+    the chunk size; the entry directory is moved into place atomically once complete.
+    """
+    key = key or source_hash(data_path)
+    final_dir = entry_dir(store_dir, key)
+    os.makedirs(store_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.building-', dir=store_dir)
+
+    try:
+        spools = {name: open(os.path.join(work_dir, f'{name}.raw'), 'wb') for name in ARRAYS}
+        stats = IngestStats("feature store")
+        n_rows = 0
+        try:
+            for engineered in iter_engineered_chunks(data_path, chunksize, stats):
+                for name, values in _chunk_arrays(engineered).items():
+                    spools[name].write(np.ascontiguousarray(values, dtype=ARRAYS[name][0]).tobytes())
+                n_rows += len(engineered)
+        finally:
+            for spool in spools.values():
+                spool.close()
+
+        for name, (dtype, width) in ARRAYS.items():
+            shape = (n_rows, width) if width else (n_rows,)
+            raw_path = os.path.join(work_dir, f'{name}.raw')
+            target = np.lib.format.open_memmap(os.path.join(work_dir, f'{name}.npy'), mode='w+', dtype=dtype, shape=shape)
+            if n_rows:
+                target[:] = np.memmap(raw_path, dtype=dtype, mode='r', shape=shape)
+            target.flush()
+            del target
+            os.remove(raw_path)
+
+        meta = {
+            "source_path": os.path.abspath(data_path),
+            "source_hash": key,
+            "feature_version": FEATURE_VERSION,
+            "x_columns": X_COLUMNS,
+            "target_column": TARGET_COLUMN,
+            "rows": n_rows,
+            "rows_read": stats.rows_read,
+            "build_seconds": stats.seconds,
+            "created_at": time.time()
+        }
+        with open(os.path.join(work_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        if os.path.exists(final_dir):
+            shutil.rmtree(final_dir)
+        os.replace(work_dir, final_dir)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    print(f"Feature store entry written to {final_dir} ({n_rows} rows).")
+    return final_dir
+
+
+class FeatureStoreEntry:
+    """Memory-mapped view of one cached feature matrix."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.X = np.load(os.path.join(path, 'X.npy'), mmap_mode='r')
+        self.y = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+        self.row_id = np.load(os.path.join(path, 'row_id.npy'), mmap_mode='r')
+        self.start_ns = np.load(os.path.join(path, 'start_ns.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return self.meta["rows"]
+
+
+def load_feature_store(data_path, store_dir=DEFAULT_STORE_DIR, key=None):
+    """Returns the cached entry for data_path's current contents, or None if there is none."""
+    key = key or source_hash(data_path)
+    path = entry_dir(store_dir, key)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+
+    entry = FeatureStoreEntry(path)
+    if entry.meta.get("source_hash") != key or entry.meta.get("x_columns") != X_COLUMNS:
+        return None
+    return entry
+
+
+def get_or_build(data_path, store_dir=DEFAULT_STORE_DIR, chunksize=DEFAULT_CHUNK_SIZE):
+    """Memory-maps the cached feature matrix for data_path, building it first on a cache miss."""
+    started = time.perf_counter()
+    key = source_hash(data_path)
+    entry = load_feature_store(data_path, store_dir, key)
+    if entry is not None:
+        print(f"Feature store hit: {entry.path} ({len(entry)} rows, opened in {time.perf_counter() - started:.2f} s).")
+        return entry
+
+    print(f"Feature store miss for {data_path}; building it.")
+    build_feature_store(data_path, store_dir, chunksize, key)
+    return FeatureStoreEntry(entry_dir(store_dir, key))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build (or reuse) the cached feature matrix for a flare catalog.")
+    parser.add_argument('data_path', nargs='?', default='solar_flare_dataset.csv')
+    parser.add_argument('--store-dir', default=DEFAULT_STORE_DIR)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild even if a cached entry exists.")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        build_feature_store(args.data_path, args.store_dir, args.chunk_size)
+    else:
+        get_or_build(args.data_path, args.store_dir, args.chunk_size)
@@ -0,0 +1,159 @@
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+# Feature order expected by scaler_X and the model; must match training.
+X_COLUMNS = [
+    'duration.s', 'total.counts', 'x.pos.asec', 'y.pos.asec',
+    'start_hour_sin', 'start_hour_cos',
+    'start_minute_sin', 'start_minute_cos',
+    'end_hour_sin', 'end_hour_cos',
+    'end_minute_sin', 'end_minute_cos'
+]
+
+SECONDS_PER_DAY = 24 * 3600
+
+CYCLE_LENGTHS = {'hour': 24, 'minute': 60, 'second': 60}
+
+# The sin/cos encodings only ever take 24 (hours) or 60 (minutes/seconds) distinct values, so they
+# are precomputed once as time_unit -> (sin table, cos table), indexed by the integer value,
+# instead of calling np.sin/np.cos for every row.
+CYCLICAL_TABLES = {
+    unit: (np.sin(2 * np.pi * np.arange(length) / length), np.cos(2 * np.pi * np.arange(length) / length))
+    for unit, length in CYCLE_LENGTHS.items()
+}
+
+# Dataset-style column names (as in solar_flare_dataset.csv) accepted as aliases of the request fields.
+FIELD_ALIASES = {
+    'total.counts': 'total_counts',
+    'x.pos.asec': 'x_pos_asec',
+    'y.pos.asec': 'y_pos_asec',
+    'duration.s': 'duration_s'
+}
+
+TIME_FIELDS = ['start_hour', 'start_minute', 'start_second', 'end_hour', 'end_minute', 'end_second']
+VALUE_FIELDS = ['total_counts', 'x_pos_asec', 'y_pos_asec']
+
+
+def cyclical_encode(values, time_unit):
+    """
+    Returns (sin, cos) arrays for integer hour/minute/second values via the lookup tables.
+    NaN inputs produce NaN outputs.
+    """
+    if time_unit not in CYCLICAL_TABLES:
+        raise ValueError(f"Unsupported time_unit: {time_unit}. Must be 'hour', 'minute', or 'second'.")
+    sin_table, cos_table = CYCLICAL_TABLES[time_unit]
+
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        indices = values % CYCLE_LENGTHS[time_unit]
+        return sin_table[indices], cos_table[indices]
+
+    values = values.astype(np.float64)
+    valid = ~np.isnan(values)
+    sin_values = np.full(values.shape, np.nan)
+    cos_values = np.full(values.shape, np.nan)
+    indices = values[valid].astype(np.intp) % CYCLE_LENGTHS[time_unit]
+    sin_values[valid] = sin_table[indices]
+    cos_values[valid] = cos_table[indices]
+    return sin_values, cos_values
+
+
+def compute_duration_seconds(start_hour, start_minute, start_second, end_hour, end_minute, end_second):
+    """Flare duration in seconds from time-of-day fields; an end before the start rolled over midnight."""
+    start_seconds = np.asarray(start_hour) * 3600 + np.asarray(start_minute) * 60 + np.asarray(start_second)
+    end_seconds = np.asarray(end_hour) * 3600 + np.asarray(end_minute) * 60 + np.asarray(end_second)
+    return (np.where(end_seconds < start_seconds, end_seconds + SECONDS_PER_DAY, end_seconds) - start_seconds).astype(np.float64)
+
+
+def _as_columns(batch, fields):
+    if isinstance(batch, Mapping):
+        columns = {FIELD_ALIASES.get(key, key): value for key, value in batch.items()}
+        return {field: np.asarray(columns[field]) for field in fields if field in columns}
+
+    columns = {}
+    for field in fields:
+        alias = next((key for key, value in FIELD_ALIASES.items() if value == field), None)
+        try:
+            columns[field] = np.array([record[field] if field in record else record[alias] for record in batch])
+        except KeyError:
+            continue
+    return columns
+
+
+def build_features(batch):
+    """
+    Builds the (n_rows, 12) feature matrix, in X_COLUMNS order, for a batch of flares.
+
+    `batch` is either a list of input records (dicts) or a mapping of field -> array. Fields use
+    the request names (total_counts, x_pos_asec, ..., start_hour, ..., end_second); the dataset
+    names (total.counts, x.pos.asec, y.pos.asec, duration.s) are accepted too. If a duration is
+    given it is used as is, otherwise it is computed from the start/end times. Time fields must
+    be integer-valued and in range.
+    """
+    columns = _as_columns(batch, VALUE_FIELDS + TIME_FIELDS + ['duration_s'])
+    missing = [field for field in VALUE_FIELDS + ['start_hour', 'start_minute', 'end_hour', 'end_minute'] if field not in columns]
+    if missing:
+        raise ValueError(f"Missing required input features: {missing}")
+
+    hours_and_minutes = {field: columns[field].astype(np.intp) for field in ['start_hour', 'start_minute', 'end_hour', 'end_minute']}
+
+    if 'duration_s' in columns:
+        duration_seconds = columns['duration_s'].astype(np.float64)
+    else:
+        duration_seconds = compute_duration_seconds(
+            hours_and_minutes['start_hour'], hours_and_minutes['start_minute'], columns['start_second'].astype(np.intp),
+            hours_and_minutes['end_hour'], hours_and_minutes['end_minute'], columns['end_second'].astype(np.intp)
+        )
+
+    features = np.empty((len(duration_seconds), len(X_COLUMNS)), dtype=np.float64)
+    features[:, 0] = duration_seconds
+    features[:, 1] = columns['total_counts']
+    features[:, 2] = columns['x_pos_asec']
+    features[:, 3] = columns['y_pos_asec']
+    features[:, 4], features[:, 5] = cyclical_encode(hours_and_minutes['start_hour'], 'hour')
+    features[:, 6], features[:, 7] = cyclical_encode(hours_and_minutes['start_minute'], 'minute')
+    features[:, 8], features[:, 9] = cyclical_encode(hours_and_minutes['end_hour'], 'hour')
+    features[:, 10], features[:, 11] = cyclical_encode(hours_and_minutes['end_minute'], 'minute')
+    return features
+
+
+def add_cyclical_features(df, dt_col_name, time_unit, max_val, prefix=""):
+    """
+    Adds `{prefix}{time_unit}_sin` and `_cos` columns for a datetime column of the training DataFrame.
+    """
+    if dt_col_name not in df.columns:
+        print(f"Warning: Datetime column '{dt_col_name}' not found in DataFrame.")
+        return df
+
+    if not pd.api.types.is_datetime64_any_dtype(df[dt_col_name]):
+        print(f"Warning: Column '{dt_col_name}' is not datetime type. Attempting conversion.")
+        df[dt_col_name] = pd.to_datetime(df[dt_col_name], errors='coerce')
+        df.dropna(subset=[dt_col_name], inplace=True)
+        if df.empty:
+            print(f"Error: DataFrame became empty after re-coercing '{dt_col_name}' to datetime. Returning empty df.")
+            return pd.DataFrame()
+
+    if time_unit == 'hour':
+        value_series = df[dt_col_name].dt.hour
+    elif time_unit == 'minute':
+        value_series = df[dt_col_name].dt.minute
+    elif time_unit == 'second':
+        value_series = df[dt_col_name].dt.second
+    else:
+        raise ValueError(f"Unsupported time_unit: {time_unit}. Must be 'hour', 'minute', or 'second'.")
+
+    if value_series.isnull().any():
+        print(f"Warning: NaNs found in '{dt_col_name}.dt.{time_unit}'. These rows will result in NaNs for cyclical features.")
+
+    if max_val == CYCLE_LENGTHS[time_unit]:
+        sin_values, cos_values = cyclical_encode(value_series.to_numpy(), time_unit)
+    else:
+        sin_values = np.sin(2 * np.pi * value_series.to_numpy(dtype=np.float64) / max_val)
+        cos_values = np.cos(2 * np.pi * value_series.to_numpy(dtype=np.float64) / max_val)
+
+    df[f'{prefix}{time_unit}_sin'] = sin_values
+    df[f'{prefix}{time_unit}_cos'] = cos_values
+    return df
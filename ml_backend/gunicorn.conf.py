@@ -0,0 +1,25 @@
+import os
+
+# Launch from the ml_backend directory:
+#   gunicorn -c gunicorn.conf.py ml_backend_server:app
+
+bind = os.environ.get('ML_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('ML_WORKERS', '2'))
+
+# Threaded workers, so the micro-batcher can coalesce concurrent requests within a worker.
+worker_class = 'gthread'
+threads = int(os.environ.get('ML_THREADS', '8'))
+
+# ML_ASGI=1 runs asgi_server:app in uvicorn workers instead; each worker bounds its own thread
+# pool and queue (ML_ASGI_THREADS, ML_ASGI_MAX_QUEUE) and rejects requests beyond them.
+#   ML_ASGI=1 gunicorn -c gunicorn.conf.py asgi_server:app
+if os.environ.get('ML_ASGI', '0') == '1':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+timeout = 120
+
+# With --preload the master imports the app (and, in eager mode, loads the model) once and
+# the workers share those pages copy-on-write. TensorFlow's thread pools do not survive
+# fork(), so this is only on by default for the NumPy inference backend; with the Keras
+# backend use ML_LOAD_MODE=background so each worker loads its own copy without blocking bind.
+_numpy_backend = os.environ.get('ML_INFERENCE_BACKEND', 'keras') == 'numpy'
+preload_app = os.environ.get('ML_PRELOAD', '1' if _numpy_backend else '0') == '1'
@@ -0,0 +1,315 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+
+import ml_model
+from data_loader import DEFAULT_CHUNK_SIZE, TARGET_COLUMN, TEST, IngestStats, assign_splits, iter_engineered_chunks, row_uniforms
+from features import X_COLUMNS
+from model_bundle import DEFAULT_BUNDLE_FILENAME, load_bundle, read_bundle_manifest
+
+
+# Files kept next to the model artifacts, relative to the output directory.
+STATE_FILENAME = 'training_state.json'
+HOLDOUT_FILENAME = 'holdout.npz'
+
+# Outcomes of one run.
+UP_TO_DATE, INITIALIZED, PUBLISHED, REJECTED, FULL_REFIT = 'up_to_date', 'initialized', 'published', 'rejected', 'full_refit'
+
+
+@dataclass
+class IncrementalConfig:
+    """
+    Settings for one incremental run over the growing catalog at `data_path`. Rows whose
+    start_datetime is after the watermark in training_state.json are new. The model in
+    `output_dir` is fine-tuned on them (plus a `replay_fraction` sample of older rows, so it does
+    not forget them) and published only if its MAE on the fixed holdout is no more than
+    `max_mae_increase` (a fraction) worse than before. The holdout and the replay sample come from
+    the same hash split as the streaming loader (`test_size`, `random_state`), so the holdout
+    is never trained on. New values outside the scalers' fitted range, by more than
+    `range_tolerance` of that range, trigger a full refit instead.
+    """
+    data_path: str = 'solar_flare_dataset.csv'
+    output_dir: str = '.'
+    epochs: int = 5
+    batch_size: int = 64
+    learning_rate: float = 1e-4
+    replay_fraction: float = 0.1
+    max_mae_increase: float = 0.02
+    range_tolerance: float = 0.0
+    test_size: float = 0.2
+    random_state: int = 42
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    full_epochs: int = 200
+    patience: int = 15
+
+    def artifact_path(self, filename):
+        return os.path.join(self.output_dir, filename)
+
+
+def read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_state(path, state):
+    """Writes the state file through a rename, so an interrupted run leaves the previous watermark intact."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.training-state-', suffix='.json', dir=directory)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def scan_catalog(config, watermark=None, collect_holdout=False):
+    """
+    One chunked pass over the catalog. Splits rows at the watermark (a pandas Timestamp, or None
+    when every row is history) into new training rows, new holdout-split rows and a replay sample
+    of older training rows, and collects the older holdout-split rows if asked. Memory is bounded by
+    the new rows plus the replay sample, not by the catalog.
+    """
+    parts = {name: [] for name in ('new', 'new_holdout', 'replay', 'holdout')}
+    latest = watermark
+    stats = IngestStats("incremental scan")
+    for engineered in iter_engineered_chunks(config.data_path, config.chunk_size, stats):
+        if not len(engineered):
+            continue
+        row_ids = engineered.index.to_numpy()
+        in_holdout = assign_splits(row_ids, config.test_size, 0.0, config.random_state) == TEST
+        start = engineered['start_datetime']
+        is_new = (start > watermark).to_numpy() if watermark is not None else np.zeros(len(engineered), dtype=bool)
+        # A second hash (another seed) picks the replay sample independently of the split.
+        in_replay = row_uniforms(row_ids, config.random_state + 1) < config.replay_fraction
+
+        selections = {
+            'new': is_new & ~in_holdout,
+            'new_holdout': is_new & in_holdout,
+            'replay': ~is_new & ~in_holdout & in_replay,
+            'holdout': ~is_new & in_holdout if collect_holdout else np.zeros(len(engineered), dtype=bool)
+        }
+        for name, selected in selections.items():
+            if selected.any():
+                parts[name].append((engineered[X_COLUMNS].to_numpy()[selected], engineered[[TARGET_COLUMN]].to_numpy()[selected]))
+        chunk_latest = start.max()
+        latest = chunk_latest if latest is None or chunk_latest > latest else latest
+
+    arrays = {}
+    for name, chunks in parts.items():
+        X = np.concatenate([X for X, _ in chunks]) if chunks else np.empty((0, len(X_COLUMNS)))
+        y = np.concatenate([y for _, y in chunks]) if chunks else np.empty((0, 1))
+        arrays[name] = (X, y)
+    arrays['latest'] = latest
+    return arrays
+
+
+def range_violations(scaler_X, scaler_y, X, y, tolerance=0.0):
+    """
+    Columns with values outside the range the scalers were fitted on. MinMaxScaler maps that
+    range to [0, 1], so this is checked on scaled values, which works for the bundle's scalers too.
+    """
+    if not len(X):
+        return []
+    violations = []
+    for columns, scaler, values in ((X_COLUMNS, scaler_X, X), ([TARGET_COLUMN], scaler_y, y)):
+        scaled = scaler.transform(values)
+        outside = (scaled.min(axis=0) < -tolerance) | (scaled.max(axis=0) > 1 + tolerance)
+        violations.extend(column for column, is_outside in zip(columns, outside) if is_outside)
+    return violations
+
+
+def holdout_mae(model, scaler_X, scaler_y, X, y):
+    """MAE in seconds on raw holdout features and targets."""
+    scaled = scaler_X.transform(X).reshape(-1, 1, X.shape[1])
+    predicted = scaler_y.inverse_transform(model.predict(scaled, batch_size=4096, verbose=0))
+    return float(mean_absolute_error(y, np.maximum(predicted, 0)))
+
+
+def save_holdout(path, X, y):
+    np.savez(path, X=X, y=y)
+
+
+def load_holdout(path):
+    with np.load(path) as data:
+        return data['X'], data['y']
+
+
+def full_refit(config, reason):
+    """
+    Retrains from scratch with ml_model's streaming loader, which splits rows with the same hash as
+    the holdout, then resets the watermark. Used when new data is outside the fitted scaler range.
+    """
+    print(f"\n--- Full refit: {reason} ---")
+    train_config = ml_model.TrainConfig(
+        data_path=config.data_path, output_dir=config.output_dir, model='lstm', loader='streaming',
+        epochs=config.full_epochs, batch_size=config.batch_size, patience=config.patience,
+        test_size=config.test_size, random_state=config.random_state, chunk_size=config.chunk_size,
+        stages=('data', 'train')
+    )
+    ml_model.train(train_config)
+    return initialize(config, FULL_REFIT, reason)
+
+
+def initialize(config, mode=INITIALIZED, reason=None):
+    """Records the catalog's latest start time as the watermark for the model in output_dir and (re)builds the holdout."""
+    scanned = scan_catalog(config, collect_holdout=True)
+    X_holdout, y_holdout = scanned['holdout']
+    save_holdout(config.artifact_path(HOLDOUT_FILENAME), X_holdout, y_holdout)
+
+    bundle = load_bundle(config.artifact_path(DEFAULT_BUNDLE_FILENAME))
+    mae = holdout_mae(bundle.model, bundle.scaler_X, bundle.scaler_y, X_holdout, y_holdout) if len(X_holdout) else None
+    state = {
+        "watermark": scanned['latest'].isoformat(),
+        "holdout_rows": len(X_holdout),
+        "holdout_mae_seconds": mae,
+        "bundle_version": bundle.version,
+        "mode": mode,
+        "reason": reason,
+        "updated_at": datetime.now().isoformat()
+    }
+    write_state(config.artifact_path(STATE_FILENAME), state)
+    print(f"Watermark set to {state['watermark']}; holdout of {len(X_holdout)} rows, MAE {mae} s.")
+    return dict(state)
+
+
+def fine_tune(config, model, X, y):
+    from tensorflow.keras.optimizers import Adam
+
+    # A smaller learning rate than training from scratch, so a few epochs adjust the weights instead of overwriting them.
+    model.compile(optimizer=Adam(learning_rate=config.learning_rate), loss='mse', metrics=['mae'])
+    order = np.random.default_rng(config.random_state).permutation(len(X))
+    history = model.fit(X[order], y[order], epochs=config.epochs, batch_size=config.batch_size, verbose=2)
+    return {key: [float(value) for value in values] for key, values in history.history.items()}
+
+
+def run_incremental(config):
+    """
+    One incremental run: scan for rows after the watermark, fine-tune the bundled model on them and
+    publish it if the holdout MAE holds. Returns a summary dict whose "mode" is one of
+    up_to_date, initialized, published, rejected or full_refit.
+    """
+    started = time.perf_counter()
+    state_path = config.artifact_path(STATE_FILENAME)
+    bundle_path = config.artifact_path(DEFAULT_BUNDLE_FILENAME)
+    state = read_state(state_path)
+
+    if not os.path.exists(bundle_path):
+        return full_refit(config, f"no model bundle at {bundle_path}")
+    if read_bundle_manifest(bundle_path).get("sequence"):
+        raise ValueError("Incremental training fine-tunes single-flare models; retrain sequence models with ml_model.py.")
+    if state is None or not os.path.exists(config.artifact_path(HOLDOUT_FILENAME)):
+        # The existing model is assumed to cover the whole current catalog.
+        return initialize(config)
+
+    bundle = load_bundle(bundle_path, runtime='keras')
+    if bundle.backend != 'lstm':
+        raise ValueError(f"Incremental training fine-tunes the LSTM; the bundle holds a '{bundle.backend}' model.")
+
+    scan_started = time.perf_counter()
+    scanned = scan_catalog(config, pd.Timestamp(state["watermark"]))
+    X_new, y_new = scanned['new']
+    scan_seconds = time.perf_counter() - scan_started
+    summary = {"previous_watermark": state["watermark"], "new_rows": len(X_new), "new_holdout_rows": len(scanned['new_holdout'][0]),
+               "replay_rows": len(scanned['replay'][0]), "scan_seconds": scan_seconds}
+    if not len(X_new):
+        print(f"No new rows after {state['watermark']}; nothing to do.")
+        return dict(summary, mode=UP_TO_DATE)
+
+    violations = range_violations(bundle.scaler_X, bundle.scaler_y, np.concatenate([X_new, scanned['new_holdout'][0]]),
+                                  np.concatenate([y_new, scanned['new_holdout'][1]]), config.range_tolerance)
+    if violations:
+        return dict(summary, **full_refit(config, f"new rows outside the fitted scaler range in {violations}"))
+
+    X_holdout, y_holdout = load_holdout(config.artifact_path(HOLDOUT_FILENAME))
+    model, scaler_X, scaler_y = bundle.model, bundle.scaler_X, bundle.scaler_y
+    baseline_mae = holdout_mae(model, scaler_X, scaler_y, X_holdout, y_holdout)
+
+    X_train = np.concatenate([X_new, scanned['replay'][0]])
+    y_train = np.concatenate([y_new, scanned['replay'][1]])
+    print(f"\n--- Fine-tuning on {len(X_new)} new and {len(scanned['replay'][0])} replayed rows for {config.epochs} epochs ---")
+    fit_started = time.perf_counter()
+    history = fine_tune(config, model, scaler_X.transform(X_train).reshape(-1, 1, len(X_COLUMNS)), scaler_y.transform(y_train))
+    summary["fine_tune_seconds"] = time.perf_counter() - fit_started
+
+    new_mae = holdout_mae(model, scaler_X, scaler_y, X_holdout, y_holdout)
+    summary.update({"baseline_holdout_mae_seconds": baseline_mae, "holdout_mae_seconds": new_mae})
+    if len(scanned['new_holdout'][0]):
+        summary["new_holdout_mae_seconds"] = holdout_mae(model, scaler_X, scaler_y, *scanned['new_holdout'])
+    print(f"Holdout MAE: {baseline_mae:.2f} s before, {new_mae:.2f} s after fine-tuning.")
+
+    if new_mae > baseline_mae * (1 + config.max_mae_increase):
+        # The watermark stays put, so the next run fine-tunes on these rows again together with newer ones.
+        print(f"Rejected: holdout MAE rose by more than {config.max_mae_increase:.0%}; the current model stays published.")
+        state.update({"last_rejected_at": datetime.now().isoformat(), "last_rejected_mae_seconds": new_mae})
+        write_state(state_path, state)
+        return dict(summary, mode=REJECTED, total_seconds=time.perf_counter() - started)
+
+    train_config = ml_model.TrainConfig(data_path=config.data_path, output_dir=config.output_dir, model='lstm', loader='streaming')
+    model.save(train_config.artifact_path(ml_model.MODEL_FILENAME))
+    with open(train_config.artifact_path(ml_model.HISTORY_FILENAME), 'w') as f:
+        json.dump(history, f)
+    new_watermark = scanned['latest'].isoformat()
+    bundle_version = ml_model.publish_model(train_config, scaler_X, scaler_y,
+                                            extra_info={"training_mode": "incremental", "watermark": new_watermark})
+
+    state.update({
+        "watermark": new_watermark,
+        "holdout_mae_seconds": new_mae,
+        "bundle_version": bundle_version,
+        "mode": PUBLISHED,
+        "reason": None,
+        "updated_at": datetime.now().isoformat()
+    })
+    write_state(state_path, state)
+    summary.update({"mode": PUBLISHED, "watermark": new_watermark, "bundle_version": bundle_version, "total_seconds": time.perf_counter() - started})
+    print(f"Published bundle {bundle_version}; watermark advanced to {new_watermark} in {summary['total_seconds']:.1f} s.")
+    return summary
+
+
+def parse_args(argv=None):
+    defaults = IncrementalConfig()
+    parser = argparse.ArgumentParser(description="Fine-tune the published LSTM on catalog rows added since the last run.")
+    parser.add_argument('--data-path', default=defaults.data_path)
+    parser.add_argument('--output-dir', default=defaults.output_dir, help="Where the model bundle, holdout and training_state.json live.")
+    parser.add_argument('--epochs', type=int, default=defaults.epochs)
+    parser.add_argument('--batch-size', type=int, default=defaults.batch_size)
+    parser.add_argument('--learning-rate', type=float, default=defaults.learning_rate)
+    parser.add_argument('--replay-fraction', type=float, default=defaults.replay_fraction, help="Fraction of older training rows mixed into fine-tuning.")
+    parser.add_argument('--max-mae-increase', type=float, default=defaults.max_mae_increase, help="Largest relative holdout MAE increase that still publishes.")
+    parser.add_argument('--range-tolerance', type=float, default=defaults.range_tolerance, help="Allowed excursion outside the scaler range, as a fraction of it.")
+    parser.add_argument('--chunk-size', type=int, default=defaults.chunk_size)
+    parser.add_argument('--full-epochs', type=int, default=defaults.full_epochs, help="Epochs for a full refit.")
+    parser.add_argument('--full-refit', action='store_true', help="Refit from scratch regardless of the data.")
+    args = parser.parse_args(argv)
+
+    config = IncrementalConfig(
+        data_path=args.data_path, output_dir=args.output_dir, epochs=args.epochs, batch_size=args.batch_size,
+        learning_rate=args.learning_rate, replay_fraction=args.replay_fraction, max_mae_increase=args.max_mae_increase,
+        range_tolerance=args.range_tolerance, chunk_size=args.chunk_size, full_epochs=args.full_epochs
+    )
+    return config, args.full_refit
+
+
+def main(argv=None):
+    try:
+        config, force_full_refit = parse_args(argv)
+        summary = full_refit(config, "requested with --full-refit") if force_full_refit else run_incremental(config)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    print(json.dumps(summary, indent=2, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+import tensorflow as tf
+
+
+class CompiledPredictor:
+    """
+    Inference wrapper around a loaded Keras model.
+
+    `model.predict` sets up a data adapter, callbacks and a fresh step function on every call,
+    which dominates the cost of one-row inputs. This wrapper instead calls the model through a
+    `tf.function` with a fixed input signature (any batch size, fixed timesteps/features), so
+    the graph is traced once and reused. It exposes the same `predict(X, batch_size, verbose)`
+    signature as Keras so it can be dropped in wherever the model was used.
+
+    Set `use_keras_predict=True` to route every call through `model.predict` instead.
+    """
+
+    def __init__(self, model, use_keras_predict=False):
+        self.model = model
+        self.use_keras_predict = use_keras_predict
+        self.input_shape = tuple(model.input_shape)
+        self.warmup_seconds = None
+
+        self._forward = tf.function(
+            self._call_model,
+            input_signature=[tf.TensorSpec(shape=(None,) + self.input_shape[1:], dtype=tf.float32)]
+        )
+
+    def _call_model(self, inputs):
+        return self.model(inputs, training=False)
+
+    def predict(self, X, batch_size=None, verbose=None):
+        """Runs a forward pass over X (n_samples, timesteps, n_features) and returns a NumPy array."""
+        if self.use_keras_predict:
+            return self.model.predict(X, batch_size=batch_size, verbose=0 if verbose is None else verbose)
+
+        inputs = tf.convert_to_tensor(np.asarray(X, dtype=np.float32))
+        return self._forward(inputs).numpy()
+
+    def warmup(self, batch_sizes=(1, 32)):
+        """
+        Runs dummy batches through the inference path so graph tracing and kernel
+        initialisation happen at startup instead of on the first request.
+        Returns the time spent, in seconds.
+        """
+        started = time.perf_counter()
+        for size in batch_sizes:
+            self.predict(np.zeros((size,) + self.input_shape[1:], dtype=np.float32), batch_size=size)
+        self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
@@ -0,0 +1,171 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+_STOP = object()
+
+# Upper bounds of the batch-size histogram buckets; larger batches land in the "+inf" bucket.
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batched calls of `batch_fn`.
+
+    `batch_fn` receives a list of items and must return a list of results in the same order.
+    A batch is flushed as soon as it holds `max_batch_size` items or the oldest queued item
+    has waited `max_wait_ms` milliseconds, whichever comes first.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}.")
+        if max_wait_ms < 0:
+            raise ValueError(f"max_wait_ms must not be negative, got {max_wait_ms}.")
+
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {
+            "batches": 0,
+            "items": 0,
+            "errors": 0,
+            "max_queue_depth": 0,
+            "max_batch_size_seen": 0,
+            "flushes_by_size": 0,
+            "flushes_by_timeout": 0,
+            "total_queue_wait_ms": 0.0,
+            "total_batch_time_ms": 0.0,
+            "batch_size_histogram": {str(bucket): 0 for bucket in BATCH_SIZE_BUCKETS + ["+inf"]}
+        }
+
+    def _ensure_worker(self):
+        with self._lock:
+            pid = os.getpid()
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+                return
+            if self._worker_pid is not None and self._worker_pid != pid:
+                # Forked child (e.g. gunicorn --preload): the parent's thread and queue locks don't carry over.
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def submit(self, item, timeout=None):
+        """
+        Queues one item and blocks until its batch has been processed. Returns that item's result,
+        or re-raises the exception raised by `batch_fn` for its batch.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._stats["max_queue_depth"]:
+                self._stats["max_queue_depth"] = depth
+
+        return future.result(timeout=timeout)
+
+    def stop(self, timeout=None):
+        """Stops the worker thread after it has flushed everything queued before the call."""
+        with self._lock:
+            worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        self._queue.put(_STOP)
+        worker.join(timeout)
+
+    def _run(self):
+        max_wait_seconds = self.max_wait_ms / 1000.0
+        stopping = False
+
+        while not stopping:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+
+            batch = [entry]
+            deadline = entry[2] + max_wait_seconds
+            flushed_by_size = False
+
+            while True:
+                if len(batch) >= self.max_batch_size:
+                    flushed_by_size = True
+                    break
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._flush(batch, flushed_by_size)
+
+    def _flush(self, batch, flushed_by_size):
+        items = [entry[0] for entry in batch]
+        futures = [entry[1] for entry in batch]
+        started = time.perf_counter()
+
+        failed = False
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items.")
+        except Exception as e:
+            failed = True
+            for future in futures:
+                future.set_exception(e)
+        else:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+        finished = time.perf_counter()
+        self._record_batch(batch, started, finished, flushed_by_size, failed)
+
+    def _record_batch(self, batch, started, finished, flushed_by_size, failed):
+        size = len(batch)
+        bucket = next((str(bound) for bound in BATCH_SIZE_BUCKETS if size <= bound), "+inf")
+
+        with self._lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["items"] += size
+            stats["errors"] += 1 if failed else 0
+            stats["max_batch_size_seen"] = max(stats["max_batch_size_seen"], size)
+            stats["flushes_by_size" if flushed_by_size else "flushes_by_timeout"] += 1
+            stats["total_queue_wait_ms"] += sum(started - entry[2] for entry in batch) * 1000.0
+            stats["total_batch_time_ms"] += (finished - started) * 1000.0
+            stats["batch_size_histogram"][bucket] += 1
+
+    def stats(self):
+        """Returns a snapshot of queue-depth, batch-size and latency counters for tuning."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["batch_size_histogram"] = dict(self._stats["batch_size_histogram"])
+
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait_ms
+        stats["avg_batch_size"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_queue_wait_ms"] = stats["total_queue_wait_ms"] / stats["items"] if stats["items"] else 0.0
+        stats["avg_batch_time_ms"] = stats["total_batch_time_ms"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._reset_stats()
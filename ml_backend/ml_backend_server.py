@@ -1,115 +1,412 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 import numpy as np
 from flask_cors import CORS
 import datetime
 import joblib   
-from tensorflow.keras.models import load_model 
 import os 
+import hashlib
+import json
+import time
+from collections import namedtuple
+from micro_batcher import MicroBatcher
+from model_lifecycle import ModelLifecycle, LOADING, NOT_LOADED
+from prediction_cache import PredictionCache, create_cache_backend
+from features import build_features
+from model_bundle import DEFAULT_BUNDLE_FILENAME, BundleWatcher, file_signature, load_bundle
+from export_model import EXPORTED_MODEL_PATHS
+from metrics import BATCH_SIZE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from profiler import SamplingProfiler
+import bulk_scoring
+from data_loader import IngestStats
+from sequences import SequenceHistory
+from plots import DEFAULT_PLOTS_DIR, PlotStore
+from ar_evolution import AR_FEATURES, DEFAULT_AR_MODEL_FILENAME, ArModelLoader
+from shared_weights import DEFAULT_SHARED_WEIGHTS_DIR, load_shared_bundle, process_memory, remove_weight_file
 
 app = Flask(__name__)
 CORS(app) 
 
 
-MODEL_PATH = 'solar_flare_peak_time_predictor_lstm_model.h5'
+# A model bundle (weights, scaler arrays, column order and content hash in one file, see
+# model_bundle.py) is preferred when present; otherwise the model file and the two scaler pickles are used.
+MODEL_BUNDLE_PATH = os.environ.get('ML_MODEL_BUNDLE', DEFAULT_BUNDLE_FILENAME)
+# Seconds between checks for a replaced bundle, which is then hot-swapped in; 0 disables the check.
+BUNDLE_WATCH_SECONDS = float(os.environ.get('ML_BUNDLE_WATCH_SECONDS', '5'))
+
+MODEL_INFO_PATH = 'model_info.json'
+DEFAULT_MODEL_PATH = 'solar_flare_peak_time_predictor_lstm_model.h5'
+
+
+def resolve_model_path():
+    """ML_MODEL_PATH if set, else the model file recorded in model_info.json by training, else the LSTM .h5."""
+    if os.environ.get('ML_MODEL_PATH'):
+        return os.environ['ML_MODEL_PATH']
+    try:
+        with open(MODEL_INFO_PATH) as f:
+            return json.load(f)["model_file"]
+    except (OSError, ValueError, KeyError):
+        return DEFAULT_MODEL_PATH
+
+
+MODEL_PATH = resolve_model_path()
 SCALER_X_PATH = 'scaler_X.pkl'
 SCALER_Y_PATH = 'scaler_y.pkl'
 
+# Micro-batching: concurrent /api/ml_predict calls are coalesced into one model call.
+MICRO_BATCHING_ENABLED = os.environ.get('ML_MICRO_BATCHING', '1') == '1'
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('ML_BATCH_MAX_SIZE', '32'))
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('ML_BATCH_MAX_WAIT_MS', '5'))
+
+# Inference backend: 'keras' (TensorFlow), 'numpy' (pure-NumPy LSTM, no TensorFlow import), or
+# 'onnx' / 'tflite' (a model exported by export_model.py, with the scalers folded into the graph).
+INFERENCE_BACKEND = os.environ.get('ML_INFERENCE_BACKEND', 'keras')
+USE_EXPORTED_MODEL = INFERENCE_BACKEND in EXPORTED_MODEL_PATHS
+EXPORTED_MODEL_PATH = os.environ.get('ML_EXPORTED_MODEL_PATH', EXPORTED_MODEL_PATHS.get(INFERENCE_BACKEND, ''))
+# Intra-op threads for onnxruntime / the TFLite interpreter; 0 keeps the runtime's default.
+RUNTIME_THREADS = int(os.environ.get('ML_RUNTIME_THREADS', '0'))
+
+# ML_SHARED_WEIGHTS=1 maps the bundle's weights from one read-only file in ML_SHARED_WEIGHTS_DIR
+# (default /dev/shm) that every worker shares, instead of each worker holding a private copy.
+# Only the NumPy runtime can compute on mapped weights.
+SHARED_WEIGHTS = os.environ.get('ML_SHARED_WEIGHTS', '0') == '1'
+SHARED_WEIGHTS_DIR = os.environ.get('ML_SHARED_WEIGHTS_DIR', DEFAULT_SHARED_WEIGHTS_DIR)
+if SHARED_WEIGHTS and INFERENCE_BACKEND == 'keras':
+    print("ML_SHARED_WEIGHTS=1 needs ML_INFERENCE_BACKEND=numpy; the Keras backend loads a private copy of the weights.")
+
+# Keras backend: compiled tf.function forward pass by default, model.predict as a fallback.
+USE_KERAS_PREDICT = os.environ.get('ML_USE_KERAS_PREDICT', '0') == '1'
+WARMUP_ON_STARTUP = os.environ.get('ML_WARMUP', '1') == '1'
+
+# When to load the model and scalers: 'eager' (at import), 'background' (thread at import) or 'lazy' (first request).
+LOAD_MODE = os.environ.get('ML_LOAD_MODE', 'eager')
+
+# Prediction cache keyed on the normalized input; invalidated when the model or scaler files change.
+CACHE_ENABLED = os.environ.get('ML_CACHE_ENABLED', '1') == '1'
+CACHE_BACKEND = os.environ.get('ML_CACHE_BACKEND', 'memory')
+CACHE_MAX_ENTRIES = int(os.environ.get('ML_CACHE_MAX_ENTRIES', '10000'))
+CACHE_TTL_SECONDS = float(os.environ.get('ML_CACHE_TTL_SECONDS', '0')) or None
+CACHE_REDIS_URL = os.environ.get('ML_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Per-stage timing histograms and error counters, served at /metrics in Prometheus text format.
+METRICS_ENABLED = os.environ.get('ML_METRICS_ENABLED', '1') == '1'
+# The sampling profiler can be started and stopped at runtime through /debug/profiler/* when enabled.
+PROFILER_ENABLED = os.environ.get('ML_PROFILER_ENABLED', '0') == '1'
+PROFILE_DIR = os.environ.get('ML_PROFILE_DIR', 'profiles')
+# Rendered training plots (ml_model.py's plot stage, or plots.py). They are served from memory with ETags.
+PLOTS_DIR = os.environ.get('ML_PLOTS_DIR', DEFAULT_PLOTS_DIR)
+# How long browsers may reuse a content-hashed plot URL without asking again; plain names are always revalidated.
+PLOT_MAX_AGE_SECONDS = int(os.environ.get('ML_PLOT_MAX_AGE_SECONDS', str(365 * 24 * 3600)))
+
+# Models trained on windows of preceding flares (ml_model.py --sequence-length) are served from a
+# rolling history of the flares each region has sent; this caps how many regions are remembered.
+SEQUENCE_MAX_REGIONS = int(os.environ.get('ML_SEQUENCE_MAX_REGIONS', '10000'))
+# The active-region evolution classifier (ar_evolution.py). It is loaded on its first request and
+# reloaded when the file changes, independently of the peak-time model.
+AR_MODEL_PATH = os.environ.get('ML_AR_MODEL_PATH', DEFAULT_AR_MODEL_FILENAME)
+
+
+# The loaded model and scalers, published together as one tuple so a request never mixes a new
+# model with old scalers. Request handlers read it once and use that snapshot throughout.
+# `sequence` is the bundle's {"length", "group_by"} for models that score windows of flares.
+ModelComponents = namedtuple('ModelComponents', ['model', 'scaler_X', 'scaler_y', 'version', 'source', 'sequence'], defaults=(None, None))
+ml_components = None
+# Recent flares per active region for sequence models; None while a single-flare model is served.
+sequence_history = None
+
+# Metrics are per process; with several workers each one reports its own.
+metrics_registry = MetricsRegistry()
+stage_seconds = metrics_registry.histogram('ml_prediction_stage_seconds', "Time spent in each stage of a prediction.", ['stage'])
+inference_batch_size = metrics_registry.histogram('ml_inference_batch_size', "Rows per model forward pass.", buckets=BATCH_SIZE_BUCKETS)
+request_seconds = metrics_registry.histogram('ml_request_duration_seconds', "Request handling time by endpoint.", ['endpoint'])
+requests_total = metrics_registry.counter('ml_requests', "Requests by endpoint and status code.", ['endpoint', 'status'])
+errors_total = metrics_registry.counter('ml_errors', "Errors by endpoint and type.", ['endpoint', 'type'])
+bulk_rows_total = metrics_registry.counter('ml_bulk_rows', "Catalog rows streamed through /api/ml_predict/stream, scored or failed.", ['result'])
+
+profiler = SamplingProfiler() if PROFILER_ENABLED else None
+plot_store = PlotStore(PLOTS_DIR)
+ar_model_loader = ArModelLoader(AR_MODEL_PATH)
+
+prediction_cache = None
+if CACHE_ENABLED:
+    # Entries are keyed on the version of the model snapshot that computed them (ModelComponents.version).
+    prediction_cache = PredictionCache(
+        create_cache_backend(CACHE_BACKEND, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS, redis_url=CACHE_REDIS_URL)
+    )
 
-lstm_model = None
-scaler_X = None
-scaler_y = None
-
-try:
-    
-    lstm_model = load_model(MODEL_PATH) 
-    print(f"LSTM Model loaded successfully from {MODEL_PATH}.")
 
-    
-    scaler_X = joblib.load(SCALER_X_PATH)
-    scaler_y = joblib.load(SCALER_Y_PATH)
+def load_peak_time_model(model_path, backend=INFERENCE_BACKEND):
+    """
+    Loads the peak-time predictor with the configured inference backend.
+    TensorFlow is only imported for the 'keras' backend. Non-recurrent models (.joblib, see
+    regressors.py) are always loaded with scikit-learn.
+    """
+    if model_path.endswith('.joblib'):
+        from regressors import RegressorModel
+        return RegressorModel.load(model_path)
+
+    if backend == 'numpy':
+        from numpy_lstm import NumpyLSTMModel
+        return NumpyLSTMModel.from_h5(model_path)
+
+    if backend == 'keras':
+        from tensorflow.keras.models import load_model
+        from inference import CompiledPredictor
+        return CompiledPredictor(load_model(model_path), use_keras_predict=USE_KERAS_PREDICT)
+
+    raise ValueError(f"Unknown inference backend '{backend}'. Expected 'keras', 'numpy', 'onnx' or 'tflite'.")
+
+
+# The shared weight file this worker maps, with ML_SHARED_WEIGHTS=1.
+shared_weights_path = None
+
+
+def load_components_from_bundle(bundle_path):
+    """Loads the model and scalers from a verified bundle; no pickles are read."""
+    global shared_weights_path
+
+    runtime = 'keras' if INFERENCE_BACKEND == 'keras' else 'numpy'
+    if SHARED_WEIGHTS and runtime == 'numpy':
+        bundle = load_shared_bundle(bundle_path, SHARED_WEIGHTS_DIR)
+        if shared_weights_path not in (None, bundle.weights_path):
+            # A new bundle version replaced it. Workers still serving the old version keep their mapping.
+            remove_weight_file(shared_weights_path)
+        shared_weights_path = bundle.weights_path
+    else:
+        bundle = load_bundle(bundle_path, runtime=runtime)
+    model = bundle.model
+    if bundle.backend == 'lstm' and runtime == 'keras':
+        from inference import CompiledPredictor
+        model = CompiledPredictor(model, use_keras_predict=USE_KERAS_PREDICT)
+    mapped = f", weights mapped from {bundle.weights_path}" if bundle.weights_path else ""
+    print(f"Model bundle {bundle.version} ({bundle.backend}) loaded successfully from {bundle_path} ({runtime} runtime{mapped}).")
+    return model, bundle.scaler_X, bundle.scaler_y, bundle.version, bundle_path, bundle.manifest.get("sequence")
+
+
+def load_components_from_export(exported_path):
+    """Loads an ONNX / TFLite export; its graph takes raw features and returns seconds, so both scalers are identities."""
+    from exported_runtime import IdentityScaler, exported_model_version, load_exported_model
+
+    model = load_exported_model(exported_path, threads=RUNTIME_THREADS)
+    version = exported_model_version(exported_path)
+    print(f"Exported model {version} loaded successfully from {exported_path} ({model.backend} runtime).")
+    return model, IdentityScaler(), IdentityScaler(), version, exported_path
+
+
+def files_version(paths):
+    """Content hash of the model and scaler files, as the version of models loaded from them (12 characters, like a bundle's)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_components_from_files():
+    # Hashed before loading, so a file replaced meanwhile gets a new version on its next load.
+    version = files_version([MODEL_PATH, SCALER_X_PATH, SCALER_Y_PATH])
+    model = load_peak_time_model(MODEL_PATH)
+    backend = getattr(model, 'backend', INFERENCE_BACKEND)
+    print(f"Peak-time model loaded successfully from {MODEL_PATH} ({backend} backend).")
+
+    loaded_scaler_X = joblib.load(SCALER_X_PATH)
+    loaded_scaler_y = joblib.load(SCALER_Y_PATH)
     print(f"Scalers loaded successfully from {SCALER_X_PATH} and {SCALER_Y_PATH}.")
 
-except Exception as e:
-    print(f"Error loading ML components: {e}")
-    print(f"Please ensure '{MODEL_PATH}', '{SCALER_X_PATH}', and '{SCALER_Y_PATH}' exist in the same directory as this script.")
-    print("The ML prediction endpoint will not function until valid components are loaded.")
+    sequence = None
+    if os.path.exists(MODEL_INFO_PATH):
+        with open(MODEL_INFO_PATH) as f:
+            sequence = json.load(f).get("sequence")
+    return model, loaded_scaler_X, loaded_scaler_y, version, MODEL_PATH, sequence
 
 
-def make_prediction(model, scaler_X, scaler_y, user_input_raw):
+def update_sequence_history(sequence):
     """
-    Predicts the peak offset in seconds from flare start, given raw user input features.
-    Adapted from the predict_peak_time_offset function in ml_model.py.
+    Keeps the rolling per-region history in line with the served model. The history holds raw
+    features, so it carries over a hot swap to a model with the same window and grouping.
     """
-    if model is None or scaler_X is None or scaler_y is None:
-        raise ValueError("ML model or scalers are not loaded. Cannot make prediction.")
+    global sequence_history
 
-    
-    dummy_date = datetime.datetime(2000, 1, 1)
-    start_dt_user = dummy_date.replace(
-        hour=user_input_raw['start_hour'],
-        minute=user_input_raw['start_minute'],
-        second=user_input_raw['start_second']
-    )
-    end_dt_user = dummy_date.replace(
-        hour=user_input_raw['end_hour'],
-        minute=user_input_raw['end_minute'],
-        second=user_input_raw['end_second']
-    )
-    
-    if end_dt_user < start_dt_user:
-        end_dt_user += datetime.timedelta(days=1)
-        
-    duration_seconds = (end_dt_user - start_dt_user).total_seconds()
-    
-    
-    start_hour_sin = np.sin(2 * np.pi * user_input_raw['start_hour'] / 24)
-    start_hour_cos = np.cos(2 * np.pi * user_input_raw['start_hour'] / 24)
-    start_minute_sin = np.sin(2 * np.pi * user_input_raw['start_minute'] / 60)
-    start_minute_cos = np.cos(2 * np.pi * user_input_raw['start_minute'] / 60)
-    
-    end_hour_sin = np.sin(2 * np.pi * user_input_raw['end_hour'] / 24)
-    end_hour_cos = np.cos(2 * np.pi * user_input_raw['end_hour'] / 24)
-    end_minute_sin = np.sin(2 * np.pi * user_input_raw['end_minute'] / 60)
-    end_minute_cos = np.cos(2 * np.pi * user_input_raw['end_minute'] / 60)
-
-    
-    user_features_array = np.array([[
-        duration_seconds, 
-        user_input_raw['total_counts'], 
-        user_input_raw['x_pos_asec'],   
-        user_input_raw['y_pos_asec'],   
-        start_hour_sin,
-        start_hour_cos,
-        start_minute_sin,
-        start_minute_cos,
-        end_hour_sin,
-        end_hour_cos,
-        end_minute_sin,
-        end_minute_cos
-    ]])
-
-   
-    scaled_user_features = scaler_X.transform(user_features_array)
-
-    
-    X_user_reshaped = scaled_user_features.reshape(1, 1, scaled_user_features.shape[1])
-
-    
-    predicted_scaled_offset = model.predict(X_user_reshaped)
-
-    
-    predicted_seconds_offset_raw = scaler_y.inverse_transform(predicted_scaled_offset)[0][0]
-
-    
-    predicted_seconds_offset_raw = max(0, predicted_seconds_offset_raw)
-
-    
+    if not sequence:
+        sequence_history = None
+    elif sequence_history is None or (sequence_history.window, sequence_history.group_by) != (sequence["length"], sequence["group_by"]):
+        sequence_history = SequenceHistory(sequence["length"], sequence["group_by"], max_keys=SEQUENCE_MAX_REGIONS)
+        print(f"Serving windows of {sequence['length']} flares, grouped by {sequence['group_by']}.")
+
+
+def load_ml_components():
+    """
+    Loads the model and both scalers and publishes them together, so requests never
+    see a half-loaded set of components. Also used to hot-swap a replaced bundle: the
+    previous components keep serving until the new ones are loaded and warmed up.
+    """
+    global ml_components
+
+    try:
+        if USE_EXPORTED_MODEL:
+            watched_signature = file_signature(EXPORTED_MODEL_PATH)
+            components = load_components_from_export(EXPORTED_MODEL_PATH)
+        else:
+            watched_signature = file_signature(MODEL_BUNDLE_PATH)
+            if watched_signature is not None:
+                components = load_components_from_bundle(MODEL_BUNDLE_PATH)
+            else:
+                components = load_components_from_files()
+        model = components[0]
+
+        if WARMUP_ON_STARTUP:
+            warmup_seconds = model.warmup()
+            print(f"Inference path warmed up in {warmup_seconds:.2f} seconds.")
+
+    except Exception as e:
+        print(f"Error loading ML components: {e}")
+        print(f"Please ensure '{MODEL_BUNDLE_PATH}', or '{MODEL_PATH}', '{SCALER_X_PATH}' and '{SCALER_Y_PATH}', exist in the same directory as this script.")
+        print("The ML prediction endpoint will not function until valid components are loaded.")
+        raise
+
+    ml_components = ModelComponents(*components)
+    update_sequence_history(ml_components.sequence)
+    if bundle_watcher is not None:
+        bundle_watcher.mark_loaded(watched_signature)
+
+    if prediction_cache is not None:
+        prediction_cache.invalidate()
+
+
+bundle_watcher = None
+if BUNDLE_WATCH_SECONDS > 0:
+    # With an ONNX / TFLite backend the exported file is watched instead of the bundle.
+    bundle_watcher = BundleWatcher(EXPORTED_MODEL_PATH if USE_EXPORTED_MODEL else MODEL_BUNDLE_PATH, lambda: model_lifecycle.load(reload=True), BUNDLE_WATCH_SECONDS)
+
+
+model_lifecycle = ModelLifecycle(load_ml_components, mode=LOAD_MODE)
+model_lifecycle.start()
+
+
+def ml_components_unavailable_response():
+    """
+    Returns an error response if the model and scalers cannot serve requests yet, or None if they can.
+    In lazy mode the first call loads them.
+    """
+    if bundle_watcher is not None:
+        bundle_watcher.ensure_running()
+
+    if ml_components is not None:
+        return None
+
+    if model_lifecycle.ensure_loaded():
+        return None
+
+    if model_lifecycle.state in (LOADING, NOT_LOADED):
+        record_error('model_loading')
+        return jsonify({"error": "ML model is still loading. Retry shortly.", "status": model_lifecycle.status()}), 503
+
+    record_error('model_not_loaded')
+    return jsonify({"error": "ML model or scalers not loaded. Server is not ready for predictions."}), 500
+
+
+REQUIRED_FIELDS = [
+    'total_counts', 'x_pos_asec', 'y_pos_asec',
+    'start_hour', 'start_minute', 'start_second',
+    'end_hour', 'end_minute', 'end_second'
+]
+
+TIME_FIELD_LIMITS = {
+    'start_hour': 24, 'start_minute': 60, 'start_second': 60,
+    'end_hour': 24, 'end_minute': 60, 'end_second': 60
+}
+
+# Optional field naming the flare's active region; sequence models grouped by region use it to
+# pick the history a flare is scored against.
+REGION_FIELD = 'active_region'
+
+MAX_BATCH_SIZE = 10000
+# Catalog rows per chunk on /api/ml_predict/stream. Each chunk is one model call and one piece of
+# the streamed response, so memory per upload is bounded by this, not by the upload's size.
+BULK_CHUNK_SIZE = int(os.environ.get('ML_BULK_CHUNK_SIZE', str(MAX_BATCH_SIZE)))
+
+
+def validate_input_record(user_input_raw):
+    """
+    Returns an error message for a malformed input record, or None if the record can be scored.
+    """
+    if not isinstance(user_input_raw, dict):
+        return "Input record must be a JSON object."
+
+    missing = [field for field in REQUIRED_FIELDS if field not in user_input_raw]
+    if missing:
+        return f"Missing required input features: {missing}"
+
+    for field in REQUIRED_FIELDS:
+        value = user_input_raw[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+            return f"Feature '{field}' must be a finite number."
+        if field in TIME_FIELD_LIMITS:
+            if not isinstance(value, int) and not float(value).is_integer():
+                return f"Feature '{field}' must be an integer."
+            if not 0 <= value < TIME_FIELD_LIMITS[field]:
+                return f"Feature '{field}' must be in range 0..{TIME_FIELD_LIMITS[field] - 1}."
+
+    region = user_input_raw.get(REGION_FIELD)
+    if region is not None and (isinstance(region, bool) or not isinstance(region, (int, str))):
+        return f"Field '{REGION_FIELD}' must be an integer or a string."
+
+    return None
+
+
+def record_stage(stage, started):
+    """Records the time since `started` (a time.perf_counter() value) for one prediction stage and returns the current time."""
+    now = time.perf_counter()
+    if METRICS_ENABLED:
+        stage_seconds.observe(now - started, stage)
+    return now
+
+
+def record_error(error_type, amount=1):
+    """Counts an error of `error_type` against the endpoint of the current request."""
+    if METRICS_ENABLED:
+        errors_total.inc(request.url_rule.rule if request.url_rule else 'unmatched', error_type, amount=amount)
+
+
+def predict_offsets(model, scaler_X, scaler_y, features):
+    """
+    Scales a feature matrix, runs one batched forward pass and returns the
+    predicted peak offsets in seconds (clipped at zero) as a 1-D array. `features` is
+    (n, n_features), or (n, window, n_features) for a sequence model.
+    """
+    started = time.perf_counter()
+    n_features = features.shape[-1]
+    scaled_features = scaler_X.transform(features.reshape(-1, n_features))
+
+    X_reshaped = scaled_features.reshape(len(features), -1, n_features)
+    started = record_stage('scale', started)
+
+    predicted_scaled_offsets = model.predict(X_reshaped, batch_size=len(X_reshaped), verbose=0)
+    started = record_stage('model', started)
+
+    predicted_offsets = scaler_y.inverse_transform(predicted_scaled_offsets)[:, 0]
+    record_stage('inverse_transform', started)
+    if METRICS_ENABLED:
+        inference_batch_size.observe(len(X_reshaped))
+
+    return np.maximum(predicted_offsets, 0)
+
+
+def format_prediction(user_input_raw, predicted_seconds_offset_raw):
+    """
+    Converts a raw offset in seconds into the response fields shared by the single and batch endpoints.
+    """
     offset_td = datetime.timedelta(seconds=int(round(predicted_seconds_offset_raw)))
     hours_offset, remainder_offset = divmod(offset_td.total_seconds(), 3600)
     minutes_offset, seconds_offset = divmod(remainder_offset, 60)
     predicted_time_str_offset = f"{int(hours_offset):02d}:{int(minutes_offset):02d}:{int(seconds_offset):02d}"
 
-    
+    start_dt_user = datetime.datetime(
+        2000, 1, 1,
+        int(user_input_raw['start_hour']),
+        int(user_input_raw['start_minute']),
+        int(user_input_raw['start_second'])
+    )
     predicted_actual_peak_datetime = start_dt_user + offset_td
     actual_peak_time_str = predicted_actual_peak_datetime.strftime('%H:%M:%S')
 
@@ -120,30 +417,190 @@ def make_prediction(model, scaler_X, scaler_y, user_input_raw):
     }
 
 
+def make_prediction(model, scaler_X, scaler_y, user_input_raw, batcher=None, history=None):
+    """
+    Predicts the peak offset in seconds from flare start, given raw user input features.
+    Adapted from the predict_peak_time_offset function in ml_model.py.
+    If a MicroBatcher is given, the forward pass is queued together with this model and scalers,
+    and shared with concurrent requests for the same ones.
+    With a SequenceHistory, the flare is scored together with the flares before it and recorded.
+    """
+    if model is None or scaler_X is None or scaler_y is None:
+        raise ValueError("ML model or scalers are not loaded. Cannot make prediction.")
+
+    started = time.perf_counter()
+    error = validate_input_record(user_input_raw)
+    if error is not None:
+        raise ValueError(error)
+    started = record_stage('validate', started)
+
+    features = build_features([user_input_raw])
+    if history is not None:
+        features = history.windows(features, [user_input_raw.get(REGION_FIELD)])
+    started = record_stage('features', started)
+    if batcher is not None:
+        predicted_seconds_offset_raw = batcher.submit(((model, scaler_X, scaler_y), features[0]))
+        started = record_stage('batch_wait', started)
+    else:
+        predicted_seconds_offset_raw = predict_offsets(model, scaler_X, scaler_y, features)[0]
+        started = time.perf_counter()
+
+    prediction_results = format_prediction(user_input_raw, predicted_seconds_offset_raw)
+    record_stage('format', started)
+    return prediction_results
+
+
+def make_batch_prediction(model, scaler_X, scaler_y, records, cache=None, history=None, model_version=None):
+    """
+    Predicts peak offsets for a list of raw input records with a single batched inference call.
+    Returns one result per record, in input order; invalid records get an "error" entry
+    instead of failing the whole batch. With a PredictionCache, only cache misses are scored;
+    entries are keyed on `model_version`, and nothing is cached without one.
+    With a SequenceHistory, records are taken as flares in time order (per region) and each is
+    scored against the ones before it; a cache cannot be used then.
+    """
+    if model is None or scaler_X is None or scaler_y is None:
+        raise ValueError("ML model or scalers are not loaded. Cannot make prediction.")
+
+    started = time.perf_counter()
+    results = [None] * len(records)
+    pending_indices = []
+    pending_keys = []
+    for index, record in enumerate(records):
+        error = validate_input_record(record)
+        if error is not None:
+            results[index] = {"index": index, "success": False, "error": error}
+            continue
+
+        cache_key = None
+        if cache is not None:
+            cache_key, cached_results = cache.get(record, model_version)
+            if cached_results is not None:
+                results[index] = _batch_result(index, cached_results)
+                continue
+        pending_indices.append(index)
+        pending_keys.append(cache_key)
+
+    started = record_stage('validate', started)
+
+    if pending_indices:
+        pending_records = [records[index] for index in pending_indices]
+        features = build_features(pending_records)
+        if history is not None:
+            features = history.windows(features, [record.get(REGION_FIELD) for record in pending_records])
+        record_stage('features', started)
+        predicted_offsets = predict_offsets(model, scaler_X, scaler_y, features)
+        started = time.perf_counter()
+
+        for index, cache_key, record, offset in zip(pending_indices, pending_keys, pending_records, predicted_offsets):
+            if not np.isfinite(offset):
+                results[index] = {"index": index, "success": False, "error": "Model returned a non-finite prediction."}
+                continue
+            prediction_results = format_prediction(record, offset)
+            if cache is not None:
+                cache.set(cache_key, prediction_results)
+            results[index] = _batch_result(index, prediction_results)
+        record_stage('format', started)
+
+    return results
+
+
+def _batch_result(index, prediction_results):
+    return {
+        "index": index,
+        "success": True,
+        "prediction": prediction_results["predicted_offset_seconds"],
+        "prediction_formatted_offset": prediction_results["predicted_offset_formatted"],
+        "predicted_peak_time": prediction_results["predicted_peak_time"]
+    }
+
+
+def make_cached_prediction(user_input_raw):
+    """
+    make_prediction with the loaded components, served from the prediction cache when possible.
+    Inputs are validated before the lookup, so invalid records are never answered from the cache.
+    Sequence models depend on the flares seen before, so their predictions are never cached.
+    """
+    components = ml_components
+    history = sequence_history if components.sequence else None
+
+    def compute():
+        return make_prediction(components.model, components.scaler_X, components.scaler_y, user_input_raw,
+                               batcher=prediction_batcher, history=history)
+
+    if prediction_cache is None or history is not None or validate_input_record(user_input_raw) is not None:
+        return compute()
+    return prediction_cache.get_or_compute(user_input_raw, compute, components.version)
+
+
+def _predict_feature_rows(items):
+    """
+    Batch function for the micro-batcher. Each item is ((model, scaler_X, scaler_y), features) from
+    the request's own snapshot, so a batch that straddles a reload is split into one forward pass
+    per snapshot instead of scoring older requests with the new model.
+    """
+    groups = {}
+    for index, (snapshot, features) in enumerate(items):
+        key = tuple(id(part) for part in snapshot)
+        groups.setdefault(key, (snapshot, []))[1].append(index)
+
+    results = [None] * len(items)
+    for (model, scaler_X, scaler_y), indices in groups.values():
+        offsets = predict_offsets(model, scaler_X, scaler_y, np.stack([items[index][1] for index in indices]))
+        for index, offset in zip(indices, offsets):
+            results[index] = offset
+    return results
+
+
+# Set by asgi_server.py when the app is served through its bounded thread pool.
+admission_controller = None
+
+prediction_batcher = None
+if MICRO_BATCHING_ENABLED:
+    prediction_batcher = MicroBatcher(
+        _predict_feature_rows,
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        max_wait_ms=MICRO_BATCH_MAX_WAIT_MS
+    )
+
+
+def _model_info():
+    components = ml_components
+    if components is None:
+        return None
+    return {(getattr(components.model, 'backend', INFERENCE_BACKEND), components.version or '', components.source or ''): 1}
+
+
+# Read at scrape time from the state the server already keeps.
+metrics_registry.gauge('ml_model_info', "The model being served; the value is always 1.", _model_info, ['backend', 'version', 'source'])
+metrics_registry.gauge('ml_micro_batcher_queue_depth', "Items waiting in the micro-batcher.",
+                       lambda: prediction_batcher.stats()["queue_depth"] if prediction_batcher is not None else None)
+metrics_registry.gauge('ml_process_memory_bytes', "Memory of this worker: rss, pss (shared pages split between processes) and uss (private).",
+                       lambda: {(kind,): value for kind, value in (process_memory() or {}).items()} or None, ['kind'])
+metrics_registry.gauge('ml_admission_in_flight', "Requests running in the ASGI thread pool.",
+                       lambda: admission_controller.in_flight if admission_controller is not None else None)
+metrics_registry.gauge('ml_admission_queue_depth', "Requests waiting for the ASGI thread pool.",
+                       lambda: admission_controller.waiting if admission_controller is not None else None)
+
+
 # Endpoint for general ML prediction.
 @app.route('/api/ml_predict', methods=['POST']) 
 def ml_predict():
-    if lstm_model is None or scaler_X is None or scaler_y is None:
-        return jsonify({"error": "ML model or scalers not loaded. Server is not ready for predictions."}), 500
+    unavailable_response = ml_components_unavailable_response()
+    if unavailable_response is not None:
+        return unavailable_response
 
     try:
-      
-        data = request.get_json()
-        
-        
-        required_fields = [
-            'total_counts', 'x_pos_asec', 'y_pos_asec',
-            'start_hour', 'start_minute', 'start_second',
-            'end_hour', 'end_minute', 'end_second'
-        ]
-        if not all(field in data for field in required_fields):
-            return jsonify({
-                "error": "Missing required input features.",
-                "required": required_fields,
-                "received": list(data.keys())
-            }), 400
-
-        prediction_results = make_prediction(lstm_model, scaler_X, scaler_y, data)
+        started = time.perf_counter()
+        data = request.get_json(silent=True)
+        started = record_stage('parse', started)
+
+        error = validate_input_record(data)
+        if error is not None:
+            record_error('invalid_record')
+            return jsonify({"error": error, "required": REQUIRED_FIELDS}), 400
+
+        prediction_results = make_cached_prediction(data)
 
         response_data = {
             "prediction": prediction_results["predicted_offset_seconds"],
@@ -153,49 +610,349 @@ def ml_predict():
             "timestamp": datetime.datetime.now().isoformat() + 'Z'
         }
 
-        return jsonify(response_data)
+        started = time.perf_counter()
+        response = jsonify(response_data)
+        record_stage('serialize', started)
+        return response
 
     except Exception as e:
+        record_error(type(e).__name__)
         print(f"Error during ML prediction: {e}")
         return jsonify({"error": f"Failed to perform ML prediction: {e}. Check server logs for details."}), 500
 
 
+# Endpoint for scoring many flares in one request.
+@app.route('/api/ml_predict/batch', methods=['POST'])
+def ml_predict_batch():
+    unavailable_response = ml_components_unavailable_response()
+    if unavailable_response is not None:
+        return unavailable_response
+
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    record_stage('parse', started)
+    if not isinstance(data, list):
+        record_error('invalid_body')
+        return jsonify({"error": "Request body must be a JSON array of input records."}), 400
+
+    if len(data) > MAX_BATCH_SIZE:
+        record_error('batch_too_large')
+        return jsonify({"error": f"Batch too large: {len(data)} records (maximum is {MAX_BATCH_SIZE})."}), 413
+
+    try:
+        components = ml_components
+        if components.sequence:
+            results = make_batch_prediction(components.model, components.scaler_X, components.scaler_y, data, history=sequence_history)
+        else:
+            results = make_batch_prediction(components.model, components.scaler_X, components.scaler_y, data, cache=prediction_cache,
+                                            model_version=components.version)
+        error_count = sum(1 for result in results if not result["success"])
+        if error_count:
+            record_error('invalid_record', amount=error_count)
+
+        started = time.perf_counter()
+        response = jsonify({
+            "results": results,
+            "count": len(results),
+            "error_count": error_count,
+            "timestamp": datetime.datetime.now().isoformat() + 'Z'
+        })
+        record_stage('serialize', started)
+        return response
+
+    except Exception as e:
+        record_error(type(e).__name__)
+        print(f"Error during batch ML prediction: {e}")
+        return jsonify({"error": f"Failed to perform batch ML prediction: {e}. Check server logs for details."}), 500
+
+
+# Endpoint for scoring whole catalogs: an NDJSON or CSV upload (the columns of solar_flare_dataset.csv)
+# is read and scored chunk by chunk, and the predictions are streamed back as each chunk finishes.
+@app.route('/api/ml_predict/stream', methods=['POST'])
+def ml_predict_stream():
+    unavailable_response = ml_components_unavailable_response()
+    if unavailable_response is not None:
+        return unavailable_response
+
+    input_format = request.args.get('format') or ('csv' if request.mimetype in ('text/csv', 'application/csv') else 'ndjson')
+    output_format = request.args.get('output', input_format)
+    if input_format not in bulk_scoring.OUTPUT_FORMATS or output_format not in bulk_scoring.OUTPUT_FORMATS:
+        record_error('invalid_format')
+        return jsonify({"error": f"Unknown format; expected one of {list(bulk_scoring.OUTPUT_FORMATS)}."}), 400
+
+    components = ml_components
+    if input_format == 'csv':
+        chunks = bulk_scoring.read_csv_chunks(request.stream, BULK_CHUNK_SIZE)
+    else:
+        chunks = bulk_scoring.read_ndjson_chunks(bulk_scoring.iter_stream_lines(request.stream), BULK_CHUNK_SIZE)
+
+    def predict(features):
+        return predict_offsets(components.model, components.scaler_X, components.scaler_y, features)
+
+    # A catalog is scored in file order against its own earlier flares, not the live request history.
+    history = SequenceHistory(components.sequence["length"], components.sequence["group_by"], max_keys=SEQUENCE_MAX_REGIONS) if components.sequence else None
+
+    def generate():
+        stats = IngestStats('bulk-score')
+        try:
+            yield from bulk_scoring.format_results(bulk_scoring.score_chunks(chunks, predict, stats, history=history), output_format)
+        except Exception as e:
+            # The status line is already sent, so the error ends the stream in the body instead.
+            record_error(type(e).__name__)
+            print(f"Error during bulk ML prediction: {e}")
+            yield bulk_scoring.error_line(f"Failed to score the upload: {e}", output_format)
+        stats.finish()
+        if METRICS_ENABLED:
+            bulk_rows_total.inc('scored', amount=stats.rows_kept)
+            bulk_rows_total.inc('error', amount=stats.rows_read - stats.rows_kept)
+        yield bulk_scoring.summary_line(stats, output_format)
+
+    return Response(stream_with_context(generate()), content_type=bulk_scoring.CONTENT_TYPES[output_format])
+
+
+@app.route('/api/ml_predict/stats', methods=['GET'])
+def ml_predict_stats():
+    stats = {"micro_batching": prediction_batcher is not None}
+    if prediction_batcher is not None:
+        stats.update(prediction_batcher.stats())
+
+    stats["cache"] = prediction_cache.stats() if prediction_cache is not None else None
+    stats["admission"] = admission_controller.stats() if admission_controller is not None else None
+    stats["sequence_history"] = sequence_history.stats() if sequence_history is not None else None
+    stats["plots"] = plot_store.stats()
+    stats["ar_evolution"] = ar_model_loader.stats()
+    return jsonify(stats)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    if METRICS_ENABLED and 'request_started' in g:
+        # The route pattern, not the path, so /plots/<filename> is one series.
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(time.perf_counter() - g.request_started, endpoint)
+        requests_total.inc(endpoint, str(response.status_code))
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (ML_METRICS_ENABLED=0)."}), 404
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/debug/profiler', methods=['GET'])
+def profiler_status():
+    if profiler is None:
+        return jsonify({"error": "The sampling profiler is disabled (ML_PROFILER_ENABLED=0)."}), 404
+    return jsonify(profiler.status())
+
+
+@app.route('/debug/profiler/start', methods=['POST'])
+def start_profiler():
+    if profiler is None:
+        return jsonify({"error": "The sampling profiler is disabled (ML_PROFILER_ENABLED=0)."}), 404
+
+    interval_ms = request.args.get('interval_ms', default=5.0, type=float)
+    seconds = request.args.get('seconds', type=float)
+    if interval_ms <= 0:
+        return jsonify({"error": "interval_ms must be positive."}), 400
+    if profiler.running:
+        return jsonify({"error": "The profiler is already running.", "status": profiler.status()}), 409
+
+    profiler.interval_seconds = interval_ms / 1000.0
+    profiler.start(seconds)
+    return jsonify(profiler.status())
+
+
+@app.route('/debug/profiler/stop', methods=['POST'])
+def stop_profiler():
+    # Returns the folded stacks (for flamegraph.pl or speedscope) and also writes them to ML_PROFILE_DIR.
+    if profiler is None:
+        return jsonify({"error": "The sampling profiler is disabled (ML_PROFILER_ENABLED=0)."}), 404
+
+    folded = profiler.stop()
+    path = profiler.dump(PROFILE_DIR)
+    print(f"Profile with {profiler.sample_count} samples written to {path}.")
+    return Response(folded, content_type='text/plain; charset=utf-8', headers={"X-Profile-Path": path})
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the process is up and serving HTTP, whatever the model state.
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # Readiness: only route traffic here once the model and scalers are loaded.
+    status = model_lifecycle.status()
+    components = ml_components
+    status["inference_backend"] = getattr(components.model if components else None, 'backend', INFERENCE_BACKEND)
+    status["model_path"] = components.source if components else None
+    status["model_version"] = components.version if components else None
+    return jsonify(status), 200 if status["ready"] else 503
+
+
 @app.route('/plots/<filename>')
 def serve_plot(filename):
-   
-    return app.send_from_directory('public/plots', filename)
+    plot = plot_store.get(filename)
+    if plot is None:
+        record_error('not_found')
+        return jsonify({"error": f"Plot '{filename}' not found."}), 404
+
+    response = Response(plot.data, mimetype=plot.mimetype)
+    response.set_etag(plot.etag)
+    response.cache_control.public = True
+    if plot.immutable:
+        # A content-hashed name always holds the same bytes.
+        response.cache_control.max_age = PLOT_MAX_AGE_SECONDS
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    # Answers If-None-Match with 304 and no body.
+    return response.make_conditional(request)
+
+# Optional field naming the region a record describes; it is echoed back in the result.
+AR_REGION_FIELD = 'active_region_id'
+
+
+def validate_ar_record(record):
+    """Returns an error message for a malformed AR evolution record, or None if it can be scored."""
+    if not isinstance(record, dict):
+        return "Input record must be a JSON object."
+    missing = [field for field in AR_FEATURES if record.get(field) is None]
+    if missing:
+        return f"Missing required features: {missing}"
+    for field in AR_FEATURES:
+        value = record[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+            return f"Feature '{field}' must be a finite number."
+    region = record.get(AR_REGION_FIELD)
+    if region is not None and (isinstance(region, bool) or not isinstance(region, (int, str))):
+        return f"Field '{AR_REGION_FIELD}' must be an integer or a string."
+    return None
+
+
+def classify_ar_records(model, records):
+    """
+    Classifies a list of AR evolution records with one vectorized model call. Returns one result
+    per record, in input order; invalid records get an "error" entry instead of failing the batch.
+    """
+    results = [None] * len(records)
+    valid = []
+    for index, record in enumerate(records):
+        error = validate_ar_record(record)
+        if error is not None:
+            results[index] = {"index": index, "success": False, "error": error}
+        else:
+            valid.append(index)
+
+    if valid:
+        features = np.array([[records[index][field] for field in AR_FEATURES] for index in valid], dtype=np.float64)
+        labels, probabilities = model.classify(features)
+        classes = [str(label) for label in model.classes]
+        for index, label, row in zip(valid, labels.tolist(), probabilities.tolist()):
+            results[index] = {
+                "index": index,
+                "success": True,
+                "active_region_id": records[index].get(AR_REGION_FIELD),
+                "predicted_evolution": label,
+                "probabilities": dict(zip(classes, row))
+            }
+    return results
+
+
+def ar_model_unavailable_response():
+    """
+    The error response while no AR evolution model is loaded, or None when one is: 503 until a
+    model has been trained, 500 when the file exists but cannot be loaded.
+    """
+    if ar_model_loader.get() is not None:
+        return None
+    record_error('model_not_loaded')
+    if not os.path.exists(ar_model_loader.path):
+        return jsonify({"error": f"AR evolution model not trained; run ar_evolution.py --data-path <labelled regions CSV> "
+                                 f"--output-path {ar_model_loader.path}, or set ML_AR_MODEL_PATH."}), 503
+    return jsonify({"error": f"AR Evolution ML model not loaded: {ar_model_loader.error}. "
+                             f"Train one with ar_evolution.py or set ML_AR_MODEL_PATH."}), 500
+
 
 @app.route('/api/classify_ar_evolution', methods=['GET'])
 def classify_ar_evolution():
-    if lstm_model is None: 
-        return jsonify({"error": "AR Evolution ML model not loaded. Please ensure the model file is correctly configured and loaded."}), 500
-    
-    
-    magnetic_flux_change = request.args.get('magnetic_flux_change', type=float)
-    area_change = request.args.get('area_change', type=float)
-    gradient_value = request.args.get('gradient_value', type=float)
-
-  
-    if None in [magnetic_flux_change, area_change, gradient_value]:
+    unavailable_response = ar_model_unavailable_response()
+    if unavailable_response is not None:
+        return unavailable_response
+
+    record = {field: request.args.get(field, type=float) for field in AR_FEATURES}
+    if None in record.values():
+        record_error('missing_fields')
         return jsonify({"error": "Missing required features in query parameters. Requires: magnetic_flux_change, area_change, gradient_value."}), 400
-    
-    
-    input_features = np.array([[magnetic_flux_change, area_change, gradient_value]])
+    record[AR_REGION_FIELD] = request.args.get(AR_REGION_FIELD, 'AR-dynamic')
 
     try:
-        prediction = lstm_model.predict(input_features)[0] 
+        model = ar_model_loader.model
+        result = classify_ar_records(model, [record])[0]
+        if not result["success"]:
+            record_error('invalid_record')
+            return jsonify({"error": result["error"]}), 400
 
         return jsonify({
             "success": True,
-            "active_region_id": "AR-dynamic", 
-            "predicted_evolution": prediction.item(), 
-            "timestamp": datetime.datetime.now().isoformat() + 'Z' 
+            "active_region_id": result["active_region_id"],
+            "predicted_evolution": result["predicted_evolution"],
+            "probabilities": result["probabilities"],
+            "model_version": model.version,
+            "timestamp": datetime.datetime.now().isoformat() + 'Z'
         })
-    
+
     except Exception as e:
+        record_error(type(e).__name__)
         print(f"Error during AR evolution prediction: {e}")
         return jsonify({"error": f"Failed to classify AR evolution: {e}. Check server logs for details."}), 500
 
 
+# Endpoint for classifying many active regions in one request, e.g. every tracked region each cadence.
+@app.route('/api/classify_ar_evolution/batch', methods=['POST'])
+def classify_ar_evolution_batch():
+    unavailable_response = ar_model_unavailable_response()
+    if unavailable_response is not None:
+        return unavailable_response
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        record_error('invalid_body')
+        return jsonify({"error": "Request body must be a JSON array of active region records."}), 400
+
+    if len(data) > MAX_BATCH_SIZE:
+        record_error('batch_too_large')
+        return jsonify({"error": f"Batch too large: {len(data)} records (maximum is {MAX_BATCH_SIZE})."}), 413
+
+    try:
+        model = ar_model_loader.model
+        results = classify_ar_records(model, data)
+        error_count = sum(1 for result in results if not result["success"])
+        if error_count:
+            record_error('invalid_record', amount=error_count)
+
+        return jsonify({
+            "results": results,
+            "count": len(results),
+            "error_count": error_count,
+            "model_version": model.version,
+            "timestamp": datetime.datetime.now().isoformat() + 'Z'
+        })
+
+    except Exception as e:
+        record_error(type(e).__name__)
+        print(f"Error during batch AR evolution prediction: {e}")
+        return jsonify({"error": f"Failed to classify AR evolution: {e}. Check server logs for details."}), 500
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
@@ -2,277 +2,656 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
-from tensorflow import keras
-from tensorflow.keras import layers
-from tensorflow.keras.callbacks import EarlyStopping
-import joblib 
-from datetime import datetime, timedelta 
-import matplotlib.pyplot as plt
-import seaborn as sns
+import joblib
+from datetime import datetime, timedelta
 from sklearn.metrics import mean_absolute_error
-import os 
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from features import X_COLUMNS, add_cyclical_features, build_features
+from data_loader import TRAIN, VALIDATION, TEST, fit_scalers_streaming, make_tf_dataset
+from plots import DEFAULT_MAX_POINTS
+from sequences import SEQUENCE_GROUPS, FlareWindows, load_sequence_arrays, make_window_dataset
+import feature_store
+from model_bundle import BUNDLE_BACKENDS, DEFAULT_BUNDLE_FILENAME, write_bundle
+from regressors import REGRESSOR_BACKENDS, RegressorModel, make_estimator, regressor_filename
+
+
+# Artifact file names, relative to the output directory.
+MODEL_FILENAME = 'solar_flare_peak_time_predictor_lstm_model.h5'
+SCALER_X_FILENAME = 'scaler_X.pkl'
+SCALER_Y_FILENAME = 'scaler_y.pkl'
+HISTORY_FILENAME = 'training_history.json'
+EVALUATION_FILENAME = 'evaluation.npz'
+MODEL_INFO_FILENAME = 'model_info.json'
+# The data stage's output: its scalers, and the split arrays (memory loader) or split row indices.
+PREPARED_DATA_FILENAME = 'prepared_data.npz'
+PREPARED_SCALERS_FILENAME = 'prepared_scalers.pkl'
+# The settings the data stage ran with, stored as JSON bytes inside prepared_data.npz.
+SETTINGS_KEY = '__settings__'
+
+MODELS = ('lstm',) + REGRESSOR_BACKENDS
+LOADERS = ('memory', 'feature_store', 'streaming')
+STAGES = ('data', 'train', 'evaluate', 'plot')
+# How the memory / feature_store arrays reach model.fit: as NumPy arrays with validation_split, or
+# through tf.data pipelines with an explicit validation set, shuffled and batched once per epoch.
+PIPELINES = ('numpy', 'tf.data')
+# Adam's default learning rate and the batch size it is tuned for; with scale_learning_rate the
+# rate grows linearly with the batch size.
+BASE_LEARNING_RATE = 1e-3
+BASE_BATCH_SIZE = 64
+# Rows of cached training batches shuffled together per epoch with cache_dataset.
+SHUFFLE_BUFFER_ROWS = 65536
+
+
+def _default_loader():
+    # Keeps the ML_STREAMING_LOADER / ML_FEATURE_STORE switches working for existing job definitions.
+    if os.environ.get('ML_STREAMING_LOADER', '0') == '1':
+        return 'streaming'
+    if os.environ.get('ML_FEATURE_STORE', '0') == '1':
+        return 'feature_store'
+    return 'memory'
+
+
+@dataclass
+class TrainConfig:
+    """
+    Settings for one training run. `model` is the regressor to train: 'lstm' or one of the
+    non-recurrent backends in regressors.py ('gbt', 'mlp', 'ridge'). `loader` chooses how the data stage reads the CSV:
+    'memory' (whole table in pandas), 'feature_store' (memory-mapped cached matrix, see
+    feature_store.py) or 'streaming' (chunked tf.data pipeline, see data_loader.py).
+    `stages` lists the stages to run; skipped stages reuse the artifacts in output_dir.
+    With `sequence_length` K > 1 the LSTM sees each flare together with the K - 1 flares before it
+    (by start time, within its active region for sequence_group='region'), see sequences.py.
+    The LSTM's training throughput is set by `pipeline`, `cache_dataset` (keep the streaming or
+    sequence batches in memory after the first epoch), the TensorFlow thread pools (0 keeps
+    TensorFlow's default), `jit_compile` (XLA) and `scale_learning_rate`. `throughput` turns on
+    the tf.data pipeline and a small inter-op pool, unless they are set otherwise.
+    """
+    data_path: str = 'solar_flare_dataset.csv'
+    model: str = 'lstm'
+    output_dir: str = '.'
+    plots_dir: str = None
+    epochs: int = 200
+    batch_size: int = 64
+    patience: int = 15
+    test_size: float = 0.2
+    validation_split: float = 0.2
+    random_state: int = 42
+    loader: str = field(default_factory=_default_loader)
+    chunk_size: int = int(os.environ.get('ML_CHUNK_SIZE', '100000'))
+    feature_store_dir: str = os.environ.get('ML_FEATURE_STORE_DIR', feature_store.DEFAULT_STORE_DIR)
+    stages: tuple = STAGES
+    sequence_length: int = 1
+    sequence_group: str = 'none'
+    plot_workers: int = 0
+    plot_max_points: int = DEFAULT_MAX_POINTS
+    pipeline: str = 'numpy'
+    cache_dataset: bool = False
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    jit_compile: bool = False
+    scale_learning_rate: bool = False
+    throughput: bool = False
+
+    def __post_init__(self):
+        if self.model not in MODELS:
+            raise ValueError(f"Unknown model '{self.model}'. Expected one of {MODELS}.")
+        if self.model != 'lstm' and self.loader == 'streaming':
+            raise ValueError(f"The streaming loader only supports the LSTM, not '{self.model}'.")
+        if self.loader not in LOADERS:
+            raise ValueError(f"Unknown loader '{self.loader}'. Expected one of {LOADERS}.")
+        unknown = [stage for stage in self.stages if stage not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}. Expected a subset of {STAGES}.")
+        if self.sequence_group not in SEQUENCE_GROUPS:
+            raise ValueError(f"Unknown sequence group '{self.sequence_group}'. Expected one of {SEQUENCE_GROUPS}.")
+        if self.sequence_length < 1:
+            raise ValueError(f"sequence_length must be at least 1, got {self.sequence_length}.")
+        if self.sequence_length > 1 and (self.model != 'lstm' or self.loader != 'memory'):
+            raise ValueError("Sequences of flares are only supported for the LSTM with the memory loader.")
+        if self.pipeline not in PIPELINES:
+            raise ValueError(f"Unknown pipeline '{self.pipeline}'. Expected one of {PIPELINES}.")
+        if self.throughput:
+            self.pipeline = 'tf.data'
+            # The LSTM graph is mostly sequential, so a small inter-op pool is enough; the intra-op pool does the work.
+            self.inter_op_threads = self.inter_op_threads or 2
+        if self.plots_dir is None:
+            self.plots_dir = os.path.join(self.output_dir, 'public', 'plots')
+
+    @property
+    def sequence(self):
+        """The bundle's sequence settings, or None for single-flare models."""
+        if self.sequence_length == 1:
+            return None
+        return {"length": self.sequence_length, "group_by": self.sequence_group}
+
+    @property
+    def learning_rate(self):
+        if self.scale_learning_rate:
+            return BASE_LEARNING_RATE * self.batch_size / BASE_BATCH_SIZE
+        return BASE_LEARNING_RATE
+
+    @property
+    def model_filename(self):
+        return MODEL_FILENAME if self.model == 'lstm' else regressor_filename(self.model)
+
+    def artifact_path(self, filename):
+        return os.path.join(self.output_dir, filename)
 
 
-print("--- Starting Solar Flare Peak Time Prediction Model Development ---")
-
 # --- 1. Data Loading and Initial Datetime Conversion ---
+def load_raw_data(data_path):
+    try:
+        data = pd.read_csv(data_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Dataset not found at {data_path}. Please ensure 'solar_flare_dataset.csv' is in the same directory.")
 
-data_path = 'solar_flare_dataset.csv'
-try:
-    data = pd.read_csv(data_path)
-except FileNotFoundError:
-    print(f"Error: Dataset not found at {data_path}. Please ensure 'solar_flare_dataset.csv' is in the same directory.")
-    exit()
-
-print("Original data head:")
-print(data.head())
-
-
-data['start_datetime'] = pd.to_datetime(data['start.date'].astype(str) + ' ' + data['start.time'], errors='coerce')
-data['end_datetime'] = pd.to_datetime(data['start.date'].astype(str) + ' ' + data['end'], errors='coerce')
-data['peak_datetime'] = pd.to_datetime(data['start.date'].astype(str) + ' ' + data['peak'], errors='coerce')
-
-initial_rows = len(data)
-data.dropna(subset=['start_datetime', 'end_datetime', 'peak_datetime'], inplace=True)
-print(f"\nData after initial datetime parsing and dropping NaNs: {len(data)} rows (Dropped {initial_rows - len(data)} rows).")
-
-if data.empty:
-    print("Error: DataFrame is empty after initial datetime parsing and dropping NaNs. Cannot proceed.")
-    exit()
-
-# --- 2. Feature Engineering: Target Variable (Peak Offset in Seconds) ---
-data['peak_offset_seconds'] = (data['peak_datetime'] - data['start_datetime']).dt.total_seconds()
+    print("Original data head:")
+    print(data.head())
 
+    data['start_datetime'] = pd.to_datetime(data['start.date'].astype(str) + ' ' + data['start.time'], errors='coerce')
+    data['end_datetime'] = pd.to_datetime(data['start.date'].astype(str) + ' ' + data['end'], errors='coerce')
+    data['peak_datetime'] = pd.to_datetime(data['start.date'].astype(str) + ' ' + data['peak'], errors='coerce')
 
-initial_rows_after_offset_calc = len(data)
-data = data[data['peak_offset_seconds'] >= 0].copy()
-print(f"Data after filtering out negative peak offsets: {len(data)} rows (Dropped {initial_rows_after_offset_calc - len(data)} rows).")
-print("\nSample peak_offset_seconds:")
-print(data['peak_offset_seconds'].head())
+    initial_rows = len(data)
+    data.dropna(subset=['start_datetime', 'end_datetime', 'peak_datetime'], inplace=True)
+    print(f"\nData after initial datetime parsing and dropping NaNs: {len(data)} rows (Dropped {initial_rows - len(data)} rows).")
 
-if data.empty:
-    print("Error: DataFrame is empty after filtering out negative peak offsets. Cannot proceed.")
-    exit()
-
-# --- 3. Feature Engineering: Cyclical Time Features ---
-
-def add_cyclical_features(df, dt_col_name, time_unit, max_val, prefix=""):
-    if dt_col_name not in df.columns:
-        print(f"Warning: Datetime column '{dt_col_name}' not found in DataFrame.")
-        return df 
-
-    
-    if not pd.api.types.is_datetime64_any_dtype(df[dt_col_name]):
-        print(f"Warning: Column '{dt_col_name}' is not datetime type. Attempting conversion.")
-        df[dt_col_name] = pd.to_datetime(df[dt_col_name], errors='coerce')
-        df.dropna(subset=[dt_col_name], inplace=True) 
-        if df.empty:
-            print(f"Error: DataFrame became empty after re-coercing '{dt_col_name}' to datetime. Returning empty df.")
-            return pd.DataFrame()
-
-
-    if time_unit == 'hour':
-        value_series = df[dt_col_name].dt.hour
-    elif time_unit == 'minute':
-        value_series = df[dt_col_name].dt.minute
-    elif time_unit == 'second':
-        value_series = df[dt_col_name].dt.second
-    else:
-        raise ValueError(f"Unsupported time_unit: {time_unit}. Must be 'hour', 'minute', or 'second'.")
+    if data.empty:
+        raise ValueError("DataFrame is empty after initial datetime parsing and dropping NaNs. Cannot proceed.")
 
-    
-    if value_series.isnull().any():
-        print(f"Warning: NaNs found in '{dt_col_name}.dt.{time_unit}'. These rows will result in NaNs for cyclical features.")
-        
+    return data
 
-    df[f'{prefix}{time_unit}_sin'] = np.sin(2 * np.pi * value_series / max_val)
-    df[f'{prefix}{time_unit}_cos'] = np.cos(2 * np.pi * value_series / max_val)
-    return df
 
-print("\n--- Adding Cyclical Features ---")
+def engineer_features(data):
+    """Sections 2-4: target, cyclical features and the final X / y arrays."""
 
-data = add_cyclical_features(data, 'start_datetime', 'hour', 24, 'start_')
-print(f"Columns after start_hour features: {data.columns.tolist()}")
+    # --- 2. Feature Engineering: Target Variable (Peak Offset in Seconds) ---
+    data['peak_offset_seconds'] = (data['peak_datetime'] - data['start_datetime']).dt.total_seconds()
 
-data = add_cyclical_features(data, 'start_datetime', 'minute', 60, 'start_')
-print(f"Columns after start_minute features: {data.columns.tolist()}")
+    initial_rows_after_offset_calc = len(data)
+    data = data[data['peak_offset_seconds'] >= 0].copy()
+    print(f"Data after filtering out negative peak offsets: {len(data)} rows (Dropped {initial_rows_after_offset_calc - len(data)} rows).")
+    print("\nSample peak_offset_seconds:")
+    print(data['peak_offset_seconds'].head())
 
-data = add_cyclical_features(data, 'end_datetime', 'hour', 24, 'end_')
-print(f"Columns after end_hour features: {data.columns.tolist()}")
+    if data.empty:
+        raise ValueError("DataFrame is empty after filtering out negative peak offsets. Cannot proceed.")
 
-data = add_cyclical_features(data, 'end_datetime', 'minute', 60, 'end_')
-print(f"Columns after end_minute features: {data.columns.tolist()}")
+    # --- 3. Feature Engineering: Cyclical Time Features ---
 
+    # add_cyclical_features lives in features.py so the server uses the same lookup tables.
+    print("\n--- Adding Cyclical Features ---")
 
-# data = add_cyclical_features(data, 'start_datetime', 'second', 60, 'start_')
-# data = add_cyclical_features(data, 'end_datetime', 'second', 60, 'end_')
+    data = add_cyclical_features(data, 'start_datetime', 'hour', 24, 'start_')
+    data = add_cyclical_features(data, 'start_datetime', 'minute', 60, 'start_')
+    data = add_cyclical_features(data, 'end_datetime', 'hour', 24, 'end_')
+    data = add_cyclical_features(data, 'end_datetime', 'minute', 60, 'end_')
 
-print("\nFinal columns before defining X and y:")
-print(data.columns.tolist())
+    print("\nFinal columns before defining X and y:")
+    print(data.columns.tolist())
 
+    # --- 4. Define Features (X) and Target (y) ---
 
-# --- 4. Define Features (X) and Target (y) ---
+    missing_columns = [col for col in X_COLUMNS if col not in data.columns]
+    if missing_columns:
+        raise ValueError(f"The following required X_columns are missing after feature engineering: {missing_columns}")
 
-X_columns = [
-    'duration.s', 'total.counts', 'x.pos.asec', 'y.pos.asec',
-    'start_hour_sin', 'start_hour_cos',
-    'start_minute_sin', 'start_minute_cos',
-    'end_hour_sin', 'end_hour_cos',
-    'end_minute_sin', 'end_minute_cos'
-]
-
-
-missing_columns = [col for col in X_columns if col not in data.columns]
-if missing_columns:
-    print(f"Error: The following required X_columns are missing after feature engineering: {missing_columns}")
-    print("Please check the feature engineering steps.")
-    exit()
-
-
-print("\nChecking for NaNs in X_columns and target before final dropna...")
-for col in X_columns + ['peak_offset_seconds']:
-    if col in data.columns:
+    print("\nChecking for NaNs in X_columns and target before final dropna...")
+    for col in X_COLUMNS + ['peak_offset_seconds']:
         print(f"NaNs in '{col}': {data[col].isna().sum()}")
-    else:
-        print(f"Column '{col}' not found for NaN check.") # Should not happen if missing_columns check passes
-
-initial_rows_before_final_dropna = len(data)
-data.dropna(subset=X_columns + ['peak_offset_seconds'], inplace=True)
-print(f"Data after dropping NaNs in X_columns and target: {len(data)} rows (Dropped {initial_rows_before_final_dropna - len(data)} rows).")
-
-if data.empty:
-    print("Error: DataFrame is empty after dropping NaNs for model training. Cannot proceed.")
-    exit()
-
-X = data[X_columns].values
-y = data['peak_offset_seconds'].values.reshape(-1, 1) 
-
-print(f"\nFeatures (X) shape: {X.shape}")
-print(f"Target (y) shape: {y.shape}")
-
-# --- 5. Scaling Features (X) and Target (y) ---
-scaler_X = MinMaxScaler()
-X_scaled = scaler_X.fit_transform(X)
-
-scaler_y = MinMaxScaler()
-y_scaled = scaler_y.fit_transform(y)
-
 
-X_reshaped = X_scaled.reshape(-1, 1, X_scaled.shape[1])
-
-
-# --- 6. Train-Test Split ---
+    initial_rows_before_final_dropna = len(data)
+    data.dropna(subset=X_COLUMNS + ['peak_offset_seconds'], inplace=True)
+    print(f"Data after dropping NaNs in X_columns and target: {len(data)} rows (Dropped {initial_rows_before_final_dropna - len(data)} rows).")
+
+    if data.empty:
+        raise ValueError("DataFrame is empty after dropping NaNs for model training. Cannot proceed.")
+
+    X = data[X_COLUMNS].values
+    y = data['peak_offset_seconds'].values.reshape(-1, 1)
+
+    print(f"\nFeatures (X) shape: {X.shape}")
+    print(f"Target (y) shape: {y.shape}")
+    return X, y
+
+
+def load_features(config):
+    """Returns the engineered (X, y) arrays using the configured in-memory or feature-store loader."""
+    if config.loader == 'feature_store':
+        if not os.path.exists(config.data_path):
+            raise FileNotFoundError(f"Dataset not found at {config.data_path}.")
+        entry = feature_store.get_or_build(config.data_path, config.feature_store_dir, chunksize=config.chunk_size)
+        if len(entry) == 0:
+            raise ValueError("Feature store entry is empty. Cannot proceed.")
+        print(f"\nFeatures (X) shape: {entry.X.shape}")
+        print(f"Target (y) shape: {entry.y.shape}")
+        return entry.X, entry.y
+
+    return engineer_features(load_raw_data(config.data_path))
+
+
+def prepare_data(config, scalers=None, splits=None):
+    """
+    Data stage: loads and engineers the features, fits the scalers and splits train/test.
+    Returns a dict with the scalers and either arrays (memory / feature_store loaders)
+    or tf.data datasets (streaming loader, sequences), and under "splits" the row indices of
+    each split where the loader has them. With `scalers` (scaler_X, scaler_y) the features are
+    scaled with those instead of newly fitted ones, and with `splits` those rows are used.
+    """
+    if config.sequence_length > 1:
+        return prepare_sequence_data(config, scalers, splits)
+
+    if config.loader == 'streaming':
+        # --- 1-6 (streaming). Chunked CSV -> per-chunk feature engineering -> tf.data pipelines ---
+        if not os.path.exists(config.data_path):
+            raise FileNotFoundError(f"Dataset not found at {config.data_path}.")
+
+        print(f"\n--- Streaming {config.data_path} in chunks of {config.chunk_size} rows ---")
+
+        if scalers is None:
+            # MinMaxScaler.partial_fit gives the same min/max as fit over the full table, without loading it.
+            scaler_X, scaler_y, _ = fit_scalers_streaming(config.data_path, chunksize=config.chunk_size)
+        else:
+            scaler_X, scaler_y = scalers
+        # The split is a hash of each row, so it needs no saved indices.
+        split_options = dict(
+            batch_size=config.batch_size, chunksize=config.chunk_size, seed=config.random_state,
+            test_size=config.test_size, validation_size=config.validation_split
+        )
+        return cache_datasets(config, {
+            "scaler_X": scaler_X,
+            "scaler_y": scaler_y,
+            "train_dataset": make_tf_dataset(config.data_path, scaler_X, scaler_y, TRAIN, shuffle=True, **split_options),
+            "validation_dataset": make_tf_dataset(config.data_path, scaler_X, scaler_y, VALIDATION, **split_options),
+            "test_dataset": make_tf_dataset(config.data_path, scaler_X, scaler_y, TEST, **split_options)
+        })
+
+    X, y = load_features(config)
+
+    # --- 5. Scaling Features (X) and Target (y) ---
+    if scalers is None:
+        scaler_X, scaler_y = MinMaxScaler().fit(X), MinMaxScaler().fit(y)
+    else:
+        scaler_X, scaler_y = scalers
+    X_scaled = scaler_X.transform(X)
+    y_scaled = scaler_y.transform(y)
 
-X_train, X_test, y_train, y_test = train_test_split(X_reshaped, y_scaled, test_size=0.2, random_state=42)
+    X_reshaped = X_scaled.reshape(-1, 1, X_scaled.shape[1])
 
-# print(f"\nShape of X_train: {X_train.shape}")
-# print(f"Shape of y_train: {y_train.shape}")
-# print(f"Shape of X_test: {X_test.shape}")
-# print(f"Shape of y_test: {y_test.shape}")
+    # --- 6. Train-Test Split ---
+    if splits is None:
+        train_rows, test_rows = train_test_split(np.arange(len(y_scaled)), test_size=config.test_size, random_state=config.random_state)
+    else:
+        train_rows, test_rows = splits["train_rows"], splits["test_rows"]
+
+    return {
+        "scaler_X": scaler_X,
+        "scaler_y": scaler_y,
+        "X_train": X_reshaped[train_rows],
+        "X_test": X_reshaped[test_rows],
+        "y_train": y_scaled[train_rows],
+        "y_test": y_scaled[test_rows],
+        "splits": {"train_rows": train_rows, "test_rows": test_rows}
+    }
+
+
+def data_settings(config):
+    """What the data stage's output depends on; a saved output made with other settings is not reused."""
+    stat = os.stat(config.data_path)
+    return {
+        "data_path": os.path.abspath(config.data_path),
+        "data_size": stat.st_size,
+        "data_mtime_ns": stat.st_mtime_ns,
+        "loader": config.loader,
+        "sequence_length": config.sequence_length,
+        "sequence_group": config.sequence_group,
+        "test_size": config.test_size,
+        "validation_split": config.validation_split,
+        "random_state": config.random_state
+    }
+
+
+def save_prepared_data(config, data):
+    """
+    Writes the data stage's output to output_dir: the scalers, and the split arrays for the memory
+    loader or the split row indices for the others (which re-read their cached or streamed rows).
+    """
+    os.makedirs(config.output_dir, exist_ok=True)
+    arrays = dict(data.get("splits") or {})
+    if config.loader == 'memory' and "X_train" in data:
+        arrays.update({name: data[name] for name in ("X_train", "X_test", "y_train", "y_test")})
+    arrays[SETTINGS_KEY] = np.frombuffer(json.dumps(data_settings(config)).encode('utf-8'), dtype=np.uint8)
+    np.savez(config.artifact_path(PREPARED_DATA_FILENAME), **arrays)
+    joblib.dump((data["scaler_X"], data["scaler_y"]), config.artifact_path(PREPARED_SCALERS_FILENAME))
+    print(f"Data stage output saved to '{config.artifact_path(PREPARED_DATA_FILENAME)}'")
+
+
+def load_prepared_data(config):
+    """The data stage's output saved by an earlier run, for a run that skips the data stage."""
+    path = config.artifact_path(PREPARED_DATA_FILENAME)
+    if not os.path.exists(config.data_path):
+        raise FileNotFoundError(f"Dataset not found at {config.data_path}.")
+    with np.load(path, allow_pickle=False) as saved:
+        arrays = {name: saved[name] for name in saved.files}
+    settings = json.loads(arrays.pop(SETTINGS_KEY).tobytes().decode('utf-8'))
+    changed = sorted(key for key, value in data_settings(config).items() if settings.get(key) != value)
+    if changed:
+        raise ValueError(f"The data stage output in {config.output_dir} was made with different settings or an older "
+                         f"catalog (changed: {changed}); run the data stage again.")
+
+    scaler_X, scaler_y = joblib.load(config.artifact_path(PREPARED_SCALERS_FILENAME))
+    print(f"\n--- Reusing the data stage output in '{path}' ---")
+    if "X_train" in arrays:
+        return {"scaler_X": scaler_X, "scaler_y": scaler_y, **arrays}
+    return prepare_data(config, scalers=(scaler_X, scaler_y), splits=arrays or None)
+
+
+def prepare_sequence_data(config, scalers=None, splits=None):
+    """
+    Data stage for sequence_length > 1: the scaled features are held once, sorted by start time,
+    in a float32 array, and each flare's window of preceding flares is read from it (see
+    sequences.FlareWindows). Batches copy only their own windows, so memory stays O(rows)
+    rather than O(rows * length). `scalers` and `splits` are as for prepare_data.
+    """
+    if not os.path.exists(config.data_path):
+        raise FileNotFoundError(f"Dataset not found at {config.data_path}.")
+
+    print(f"\n--- Building windows of {config.sequence_length} flares (grouped by {config.sequence_group}) ---")
+    X, y, group_starts = load_sequence_arrays(config.data_path, config.chunk_size, config.sequence_group)
+
+    if scalers is None:
+        scaler_X, scaler_y = MinMaxScaler().fit(X), MinMaxScaler().fit(y)
+    else:
+        scaler_X, scaler_y = scalers
+    X_scaled = scaler_X.transform(X).astype(np.float32)
+    y_scaled = scaler_y.transform(y).astype(np.float32)
+    del X
+
+    windows = FlareWindows(X_scaled, config.sequence_length, group_starts)
+    del X_scaled
+
+    if splits is None:
+        rows = np.arange(len(y_scaled))
+        train_rows, test_rows = train_test_split(rows, test_size=config.test_size, random_state=config.random_state)
+        train_rows, validation_rows = train_test_split(train_rows, test_size=config.validation_split, random_state=config.random_state)
+    else:
+        train_rows, validation_rows, test_rows = splits["train_rows"], splits["validation_rows"], splits["test_rows"]
+
+    options = dict(batch_size=config.batch_size, seed=config.random_state)
+    return cache_datasets(config, {
+        "scaler_X": scaler_X,
+        "scaler_y": scaler_y,
+        "train_dataset": make_window_dataset(windows, y_scaled, train_rows, shuffle=True, **options),
+        "validation_dataset": make_window_dataset(windows, y_scaled, validation_rows, **options),
+        "test_dataset": make_window_dataset(windows, y_scaled, test_rows, **options),
+        "splits": {"train_rows": train_rows, "validation_rows": validation_rows, "test_rows": test_rows}
+    })
+
+
+def cache_datasets(config, data):
+    """
+    With `cache_dataset`, the train and validation batches are kept in memory after the first
+    epoch instead of being re-read from the CSV (or re-gathered from the windows) every epoch. The
+    cached training batches are reshuffled as whole batches each epoch. This trades the
+    loaders' bounded memory for speed, so it is off by default.
+    """
+    if not config.cache_dataset:
+        return data
+    import tensorflow as tf
+
+    shuffle_buffer = max(1, SHUFFLE_BUFFER_ROWS // config.batch_size)
+    data["train_dataset"] = (data["train_dataset"].cache()
+                             .shuffle(shuffle_buffer, seed=config.random_state, reshuffle_each_iteration=True)
+                             .prefetch(tf.data.AUTOTUNE))
+    data["validation_dataset"] = data["validation_dataset"].cache().prefetch(tf.data.AUTOTUNE)
+    return data
+
+
+def array_datasets(config, data):
+    """
+    The tf.data pipeline for the memory / feature_store arrays: float32 tensors built once, an
+    explicit validation split (instead of model.fit's validation_split, which re-slices the
+    arrays every epoch), per-epoch shuffling, batching and prefetch.
+    """
+    import tensorflow as tf
+
+    X_fit, X_validation, y_fit, y_validation = train_test_split(
+        data["X_train"].astype(np.float32), data["y_train"].astype(np.float32),
+        test_size=config.validation_split, random_state=config.random_state
+    )
+    train_dataset = (tf.data.Dataset.from_tensor_slices((X_fit, y_fit))
+                     .cache()
+                     .shuffle(len(X_fit), seed=config.random_state, reshuffle_each_iteration=True)
+                     .batch(config.batch_size)
+                     .prefetch(tf.data.AUTOTUNE))
+    validation_dataset = (tf.data.Dataset.from_tensor_slices((X_validation, y_validation))
+                          .batch(config.batch_size)
+                          .cache()
+                          .prefetch(tf.data.AUTOTUNE))
+    return train_dataset, validation_dataset
+
+
+def configure_tensorflow(config):
+    """Sizes TensorFlow's thread pools; this only works before the TensorFlow runtime has started in this process."""
+    if not (config.intra_op_threads or config.inter_op_threads):
+        return
+    import tensorflow as tf
+
+    try:
+        if config.intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(config.intra_op_threads)
+        if config.inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(config.inter_op_threads)
+    except RuntimeError as e:
+        print(f"Warning: TensorFlow is already running, keeping its thread pools: {e}")
+        return
+    print(f"TensorFlow threads: intra-op {config.intra_op_threads or 'default'}, inter-op {config.inter_op_threads or 'default'}")
 
 
 # --- 7. Build and Train LSTM Model ---
-def build_lstm_model(input_shape):
+def build_lstm_model(input_shape, lstm1_units=128, lstm2_units=64, dropout=0.3, optimizer='adam', jit_compile=False):
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
     model = keras.Sequential([
         keras.Input(shape=input_shape),
-        layers.LSTM(128, return_sequences=True), 
-        layers.Dropout(0.3), 
-        layers.LSTM(64), 
-        layers.Dense(1)  
+        layers.LSTM(lstm1_units, return_sequences=True),
+        layers.Dropout(dropout),
+        layers.LSTM(lstm2_units),
+        layers.Dense(1)
     ])
-    model.compile(optimizer='adam', loss='mse', metrics=['mae'])
+    model.compile(optimizer=optimizer, loss='mse', metrics=['mae'], jit_compile=jit_compile)
     return model
 
-input_shape = (X_train.shape[1], X_train.shape[2])
-model = build_lstm_model(input_shape)
-model.summary()
 
+def train_regressor(config, data):
+    """Fits one of the non-recurrent backends on the same scaled features and target as the LSTM."""
+    print(f"\n--- Training {config.model} Model ---")
+    model = RegressorModel(make_estimator(config.model, config.random_state), config.model)
+    model.fit(data["X_train"], data["y_train"])
+    model.save(config.artifact_path(config.model_filename))
+    return model, {}
 
-early_stopping = EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True) # Increased patience
 
-print("\n--- Training Model ---")
-history = model.fit(
-    X_train, y_train,
-    epochs=200, 
-    batch_size=64,
-    validation_split=0.2, 
-    callbacks=[early_stopping],
-    verbose=1
-)
-
-# --- 8. Evaluate Model on Test Set ---
-print("\n--- Evaluating Model on Separate Test Set ---")
-loss, mae = model.evaluate(X_test, y_test, verbose=1)
-print(f"Test Loss (MSE): {loss:.4f}")
-print(f"Test MAE (Mean Absolute Error on scaled values): {mae:.4f}")
-
-
-y_pred_scaled = model.predict(X_test)
-y_pred_original_units = scaler_y.inverse_transform(y_pred_scaled)
-y_test_original_units = scaler_y.inverse_transform(y_test)
-mae_original_units = mean_absolute_error(y_test_original_units, y_pred_original_units)
-print(f"Test MAE (in seconds): {mae_original_units:.2f} seconds")
+def train_model(config, data):
+    """Train stage: fits the model and saves it, the scalers, model_info.json and the training history to output_dir."""
+    os.makedirs(config.output_dir, exist_ok=True)
+    if config.model != 'lstm':
+        model, history_dict = train_regressor(config, data)
+    else:
+        model, history_dict = train_lstm(config, data)
+    print(f"\nModel saved to '{config.artifact_path(config.model_filename)}'")
+
+    joblib.dump(data["scaler_X"], config.artifact_path(SCALER_X_FILENAME))
+    joblib.dump(data["scaler_y"], config.artifact_path(SCALER_Y_FILENAME))
+    print(f"Scalers saved to '{config.artifact_path(SCALER_X_FILENAME)}' and '{config.artifact_path(SCALER_Y_FILENAME)}'")
+
+    with open(config.artifact_path(HISTORY_FILENAME), 'w') as f:
+        json.dump(history_dict, f)
+
+    publish_model(config, data["scaler_X"], data["scaler_y"])
+
+    return model, history_dict
+
+
+def publish_model(config, scaler_X, scaler_y, extra_info=None):
+    """
+    Writes the model bundle for the saved model file and model_info.json (with `extra_info` added).
+    Returns the bundle version, or None for backends that cannot be bundled.
+    """
+    # The bundle is what the server prefers to load; it is replaced atomically so running servers can hot-swap it.
+    bundle_path = config.artifact_path(DEFAULT_BUNDLE_FILENAME)
+    bundle_version = None
+    if config.model in BUNDLE_BACKENDS:
+        bundle_version = write_bundle(bundle_path, config.artifact_path(config.model_filename), scaler_X, scaler_y, config.sequence)["version"]
+        print(f"Model bundle {bundle_version} saved to '{bundle_path}'")
+    elif os.path.exists(bundle_path):
+        # A bundle left by an earlier run would otherwise be served instead of this model.
+        os.remove(bundle_path)
+        print(f"Note: '{config.model}' models cannot be bundled; removed the stale '{bundle_path}'.")
+
+    # Records which backend produced the artifacts; the server and later stages read it to pick the loader.
+    with open(config.artifact_path(MODEL_INFO_FILENAME), 'w') as f:
+        json.dump({
+            "backend": config.model,
+            "model_file": config.model_filename,
+            "bundle_file": DEFAULT_BUNDLE_FILENAME if bundle_version else None,
+            "bundle_version": bundle_version,
+            "scaler_x_file": SCALER_X_FILENAME,
+            "scaler_y_file": SCALER_Y_FILENAME,
+            "x_columns": X_COLUMNS,
+            "trained_at": datetime.now().isoformat(),
+            "sequence": config.sequence,
+            **(extra_info or {})
+        }, f, indent=2)
+    return bundle_version
+
+
+def train_lstm(config, data):
+    from tensorflow.keras.callbacks import EarlyStopping, LambdaCallback
+    from tensorflow.keras.optimizers import Adam
+
+    input_shape = (config.sequence_length, len(X_COLUMNS))
+    optimizer = Adam(learning_rate=config.learning_rate) if config.scale_learning_rate else 'adam'
+    model = build_lstm_model(input_shape, optimizer=optimizer, jit_compile=config.jit_compile)
+    model.summary()
+
+    early_stopping = EarlyStopping(monitor='val_loss', patience=config.patience, restore_best_weights=True)
+    # Wall-clock seconds of each epoch, including validation, for throughput comparisons.
+    epoch_seconds = []
+    epoch_timer = LambdaCallback(
+        on_epoch_begin=lambda epoch, logs: epoch_seconds.append(time.perf_counter()),
+        on_epoch_end=lambda epoch, logs: epoch_seconds.__setitem__(-1, time.perf_counter() - epoch_seconds[-1])
+    )
+    callbacks = [early_stopping, epoch_timer]
+
+    print("\n--- Training Model ---")
+    if "train_dataset" in data:
+        history = model.fit(
+            data["train_dataset"],
+            validation_data=data["validation_dataset"],
+            epochs=config.epochs,
+            callbacks=callbacks,
+            verbose=1
+        )
+    elif config.pipeline == 'tf.data':
+        train_dataset, validation_dataset = array_datasets(config, data)
+        history = model.fit(
+            train_dataset,
+            validation_data=validation_dataset,
+            epochs=config.epochs,
+            callbacks=callbacks,
+            verbose=1
+        )
+    else:
+        history = model.fit(
+            data["X_train"], data["y_train"],
+            epochs=config.epochs,
+            batch_size=config.batch_size,
+            validation_split=config.validation_split,
+            callbacks=callbacks,
+            verbose=1
+        )
+
+    # --- 9. Save the Trained Model ---
+    model.save(config.artifact_path(MODEL_FILENAME))
+
+    history_dict = {key: [float(value) for value in values] for key, values in history.history.items()}
+    history_dict["epoch_seconds"] = epoch_seconds
+    return model, history_dict
+
+
+def load_trained_artifacts(config):
+    """Loads the model and scalers a previous train stage saved in output_dir."""
+    info_path = config.artifact_path(MODEL_INFO_FILENAME)
+    model_file = MODEL_FILENAME
+    if os.path.exists(info_path):
+        with open(info_path) as f:
+            model_file = json.load(f)["model_file"]
+
+    if model_file.endswith('.joblib'):
+        model = RegressorModel.load(config.artifact_path(model_file))
+    else:
+        from tensorflow.keras.models import load_model
+        # The saved loss and metrics do not deserialize across Keras versions; compile as build_lstm_model does.
+        model = load_model(config.artifact_path(model_file), compile=False)
+        model.compile(optimizer='adam', loss='mse', metrics=['mae'])
+    scaler_X = joblib.load(config.artifact_path(SCALER_X_FILENAME))
+    scaler_y = joblib.load(config.artifact_path(SCALER_Y_FILENAME))
+    return model, scaler_X, scaler_y
 
 
-# --- 9. Save the Trained Model and Scalers ---
+# --- 8. Evaluate Model on Test Set ---
+def evaluate_model(config, model, data):
+    """Evaluate stage: test-set loss/MAE; saves test targets and predictions (in seconds) for plotting."""
+    print("\n--- Evaluating Model on Separate Test Set ---")
+    if "test_dataset" in data:
+        loss, mae = model.evaluate(data["test_dataset"], verbose=1)
+    else:
+        loss, mae = model.evaluate(data["X_test"], data["y_test"], verbose=1)
+    print(f"Test Loss (MSE): {loss:.4f}")
+    print(f"Test MAE (Mean Absolute Error on scaled values): {mae:.4f}")
+
+    if "test_dataset" in data:
+        # Only the targets and predictions of the test split are collected (for MAE and plots), not its features.
+        y_test_batches, y_pred_batches = [], []
+        for X_batch, y_batch in data["test_dataset"]:
+            y_test_batches.append(y_batch.numpy())
+            y_pred_batches.append(model.predict_on_batch(X_batch))
+        y_test = np.concatenate(y_test_batches)
+        y_pred_scaled = np.concatenate(y_pred_batches)
+    else:
+        y_test = data["y_test"]
+        y_pred_scaled = model.predict(data["X_test"])
+    y_pred_original_units = data["scaler_y"].inverse_transform(y_pred_scaled)
+    y_test_original_units = data["scaler_y"].inverse_transform(y_test)
+    mae_original_units = mean_absolute_error(y_test_original_units, y_pred_original_units)
+    print(f"Test MAE (in seconds): {mae_original_units:.2f} seconds")
 
-model.save('solar_flare_peak_time_predictor_lstm_model.h5')
-print("\nModel saved to 'solar_flare_peak_time_predictor_lstm_model.h5'")
+    os.makedirs(config.output_dir, exist_ok=True)
+    np.savez(config.artifact_path(EVALUATION_FILENAME), y_true=y_test_original_units, y_pred=y_pred_original_units)
 
-joblib.dump(scaler_X, 'scaler_X.pkl')
-joblib.dump(scaler_y, 'scaler_y.pkl')
-print("Scalers saved to 'scaler_X.pkl' and 'scaler_y.pkl'")
+    return {"loss": float(loss), "mae_scaled": float(mae), "mae_seconds": float(mae_original_units)}
 
 
 # --- 10. Prediction Function (Improved and Corrected) ---
 def predict_peak_time_offset(model, scaler_X, scaler_y, user_input_raw):
-    
-    # 1. Calculate duration.s from user input
-  
-    dummy_date = datetime(2000, 1, 1)
-    start_dt_user = dummy_date.replace(hour=user_input_raw['start_hour'], minute=user_input_raw['start_minute'], second=user_input_raw['start_second'])
-    end_dt_user = dummy_date.replace(hour=user_input_raw['end_hour'], minute=user_input_raw['end_minute'], second=user_input_raw['end_second'])
-    
-    
-    if end_dt_user < start_dt_user:
-        end_dt_user += timedelta(days=1)
-        
-    duration_seconds = (end_dt_user - start_dt_user).total_seconds()
-    user_input_raw['duration.s'] = duration_seconds
-
-    # 2. Add Cyclical Features for user input
-    user_input_raw['start_hour_sin'] = np.sin(2 * np.pi * user_input_raw['start_hour'] / 24)
-    user_input_raw['start_hour_cos'] = np.cos(2 * np.pi * user_input_raw['start_hour'] / 24)
-    user_input_raw['start_minute_sin'] = np.sin(2 * np.pi * user_input_raw['start_minute'] / 60)
-    user_input_raw['start_minute_cos'] = np.cos(2 * np.pi * user_input_raw['start_minute'] / 60)
-    
-    user_input_raw['end_hour_sin'] = np.sin(2 * np.pi * user_input_raw['end_hour'] / 24)
-    user_input_raw['end_hour_cos'] = np.cos(2 * np.pi * user_input_raw['end_hour'] / 24)
-    user_input_raw['end_minute_sin'] = np.sin(2 * np.pi * user_input_raw['end_minute'] / 60)
-    user_input_raw['end_minute_cos'] = np.cos(2 * np.pi * user_input_raw['end_minute'] / 60)
-
-    # 3. Prepare features array in the correct order for scaling (must match X_columns used in training)
-
-    user_features_array = np.array([[
-        user_input_raw['duration.s'],
-        user_input_raw['total.counts'],
-        user_input_raw['x.pos.asec'],
-        user_input_raw['y.pos.asec'],
-        user_input_raw['start_hour_sin'],
-        user_input_raw['start_hour_cos'],
-        user_input_raw['start_minute_sin'],
-        user_input_raw['start_minute_cos'],
-        user_input_raw['end_hour_sin'],
-        user_input_raw['end_hour_cos'],
-        user_input_raw['end_minute_sin'],
-        user_input_raw['end_minute_cos']
-    ]])
+
+    # 1-3. Duration, cyclical features and feature ordering (X_columns) come from the shared features module
+    user_features_array = build_features([user_input_raw])
 
     # 4. Scale the input features using the fitted scaler_X
     scaled_user_features = scaler_X.transform(user_features_array)
 
-    # 5. Reshape for LSTM input (1 sample, 1 timestep, num_features)
-    X_user_reshaped = scaled_user_features.reshape(1, 1, scaled_user_features.shape[1])
+    # 5. Reshape for LSTM input (1 sample, 1 timestep, num_features). A model trained on sequences
+    # sees the flare repeated, which is how a flare without earlier flares is padded in training.
+    timesteps = model.input_shape[1] or 1
+    X_user_reshaped = np.repeat(scaled_user_features.reshape(1, 1, scaled_user_features.shape[1]), timesteps, axis=1)
 
     # 6. Predict the scaled peak offset
     predicted_scaled_offset = model.predict(X_user_reshaped)
@@ -283,29 +662,21 @@ def predict_peak_time_offset(model, scaler_X, scaler_y, user_input_raw):
     predicted_seconds_offset_raw = max(0, predicted_seconds_offset_raw)
 
     # ---8. Convert predicted offset to HH:MM:SS format---
-   
+
     offset_td = timedelta(seconds=int(round(predicted_seconds_offset_raw)))
-    
+
     hours_offset, remainder_offset = divmod(offset_td.total_seconds(), 3600)
     minutes_offset, seconds_offset = divmod(remainder_offset, 60)
     predicted_time_str_offset = f"{int(hours_offset):02d}:{int(minutes_offset):02d}:{int(seconds_offset):02d}"
 
- 
     dummy_start_datetime = datetime(2000, 1, 1, user_input_raw['start_hour'], user_input_raw['start_minute'], user_input_raw['start_second'])
     predicted_actual_peak_datetime = dummy_start_datetime + offset_td
     actual_peak_time_str = predicted_actual_peak_datetime.strftime('%H:%M:%S')
 
     return predicted_seconds_offset_raw, predicted_time_str_offset, actual_peak_time_str
 
-# --- Example Usage for Prediction ---
-print("\n--- Testing Prediction Function with Sample Input ---")
-
-
-# from tensorflow.keras.models import load_model
-# model = load_model('solar_flare_peak_time_predictor_lstm_model.h5')
-# scaler_X = joblib.load('scaler_X.pkl')
-# scaler_y = joblib.load('scaler_y.pkl')
 
+# --- Example Usage for Prediction ---
 user_input_example = {
     'total.counts': 50000,
     'x.pos.asec': 100,
@@ -318,84 +689,179 @@ user_input_example = {
     'end_second': 48
 }
 
-predicted_offset_seconds, predicted_offset_str, actual_predicted_peak_time_str = predict_peak_time_offset(model, scaler_X, scaler_y, user_input_example)
-
-print(f"Input Flare Start Time: {user_input_example['start_hour']:02d}:{user_input_example['start_minute']:02d}:{user_input_example['start_second']:02d}")
-print(f"Predicted Peak Offset from Start: {predicted_offset_seconds:.2f} seconds ({predicted_offset_str})")
-print(f"Predicted Absolute Peak Time: {actual_predicted_peak_time_str}")
-
-
-sns.set_theme(style="whitegrid")
-
-PLOTS_DIR = 'public/plots'
-os.makedirs(PLOTS_DIR, exist_ok=True) 
-print(f"Saving plots to: {os.path.abspath(PLOTS_DIR)}") 
-
-# --- 1. Plot Training History ---
-def plot_training_history(history):
-    
-    plt.figure(figsize=(14, 7)) 
-
-    # Plot loss
-    plt.subplot(1, 2, 1)
-    plt.plot(history.history['loss'], label='Training Loss')
-    if 'val_loss' in history.history:
-        plt.plot(history.history['val_loss'], label='Validation Loss')
-    plt.title('Model Training Progress: Loss Over Epochs', fontsize=16) 
-    plt.xlabel('Epoch', fontsize=12)
-    plt.ylabel('Loss (Mean Squared Error)', fontsize=12) 
-    plt.legend(fontsize=10)
-    plt.grid(True)
-
-    # Plot MAE
-    plt.subplot(1, 2, 2) 
-    plt.plot(history.history['mae'], label='Training MAE')
-    if 'val_mae' in history.history:
-        plt.plot(history.history['val_mae'], label='Validation MAE')
-    plt.title('Model Training Progress: Mean Absolute Error Over Epochs', fontsize=16) 
-    plt.xlabel('Epoch', fontsize=12)
-    plt.ylabel('Mean Absolute Error', fontsize=12)
-    plt.legend(fontsize=10)
-    plt.grid(True)
-
-    plt.tight_layout() 
-    plt.savefig(os.path.join(PLOTS_DIR, 'training_history_plot.png')) 
-    plt.close() 
-
-
-# --- 2. Plot Actual vs. Predicted Values ---
-def plot_actual_vs_predicted(y_true, y_pred, title='Actual vs. Predicted Peak Offsets'):
-    plt.figure(figsize=(9, 9)) 
-    plt.scatter(y_true, y_pred, alpha=0.6, s=10) 
-    plt.plot([y_true.min(), y_true.max()], [y_true.min(), y_true.max()], 'r--', lw=2, label='Ideal Prediction') # Ideal line
-    plt.xlabel('Actual Peak Offset (seconds)', fontsize=12)
-    plt.ylabel('Predicted Peak Offset (seconds)', fontsize=12)
-    plt.title('Actual vs. Predicted Solar Flare Peak Offsets', fontsize=16) 
-    plt.grid(True)
-    plt.gca().set_aspect('equal', adjustable='box') 
-    plt.legend(fontsize=10)
-    plt.savefig(os.path.join(PLOTS_DIR, 'actual_vs_predicted_plot.png')) 
-    plt.close() 
-
-# --- 3. Plot Residuals ---
-def plot_residuals(y_true, y_pred, title='Residual Plot'):
-    residuals = y_true - y_pred
-    plt.figure(figsize=(12, 7)) 
-    plt.scatter(y_pred, residuals, alpha=0.6, s=10) 
-    plt.axhline(y=0, color='r', linestyle='--', lw=2, label='Zero Error Line') 
-    plt.xlabel('Predicted Peak Offset (seconds)', fontsize=12)
-    plt.ylabel('Residual (Actual - Predicted) (seconds)', fontsize=12)
-    plt.title('Residuals of Solar Flare Peak Offset Predictions', fontsize=16) 
-    plt.grid(True)
-    plt.legend(fontsize=10)
-    plt.savefig(os.path.join(PLOTS_DIR, 'residuals_plot.png')) 
-    plt.close() 
-
-
-print("\n--- Generating Plots ---")
-plot_training_history(history)
-plot_actual_vs_predicted(y_test_original_units, y_pred_original_units)
-plot_residuals(y_test_original_units, y_pred_original_units)
-
-
-print("\n--- Model Development and Prediction Process Complete ---")
+
+def print_example_prediction(model, scaler_X, scaler_y):
+    print("\n--- Testing Prediction Function with Sample Input ---")
+
+    predicted_offset_seconds, predicted_offset_str, actual_predicted_peak_time_str = predict_peak_time_offset(model, scaler_X, scaler_y, user_input_example)
+
+    print(f"Input Flare Start Time: {user_input_example['start_hour']:02d}:{user_input_example['start_minute']:02d}:{user_input_example['start_second']:02d}")
+    print(f"Predicted Peak Offset from Start: {predicted_offset_seconds:.2f} seconds ({predicted_offset_str})")
+    print(f"Predicted Absolute Peak Time: {actual_predicted_peak_time_str}")
+
+
+def generate_plots(config):
+    """
+    Plot stage: renders the plots from the saved training history and evaluation results, in
+    parallel worker processes, as content-hashed files plus plots_manifest.json (see plots.py).
+    """
+    from plots import render_plots
+
+    print(f"\n--- Generating Plots in {os.path.abspath(config.plots_dir)} ---")
+    manifest = render_plots(config.artifact_path(HISTORY_FILENAME), config.artifact_path(EVALUATION_FILENAME), config.plots_dir,
+                            workers=config.plot_workers, max_points=config.plot_max_points)
+    for name, entry in manifest["plots"].items():
+        print(f"{name} -> {entry['file']} ({entry['render_seconds']:.2f} s)")
+
+
+def check_stages(config):
+    """
+    Raises ValueError for a stage set that cannot run: each skipped stage that a selected one
+    depends on must have left its output in output_dir.
+    """
+    stages = set(config.stages)
+    missing = []
+    if 'data' not in stages and stages & {'train', 'evaluate'}:
+        if not (os.path.exists(config.artifact_path(PREPARED_DATA_FILENAME)) and os.path.exists(config.artifact_path(PREPARED_SCALERS_FILENAME))):
+            missing.append(("data", "train and evaluate", PREPARED_DATA_FILENAME))
+    if 'train' not in stages and 'evaluate' in stages:
+        for filename in (SCALER_X_FILENAME, SCALER_Y_FILENAME):
+            if not os.path.exists(config.artifact_path(filename)):
+                missing.append(("train", "evaluate", filename))
+    if 'plot' in stages:
+        if 'evaluate' not in stages and not os.path.exists(config.artifact_path(EVALUATION_FILENAME)):
+            missing.append(("evaluate", "plot", EVALUATION_FILENAME))
+        if 'train' not in stages and not os.path.exists(config.artifact_path(HISTORY_FILENAME)):
+            missing.append(("train", "plot", HISTORY_FILENAME))
+    if missing:
+        stage, needed_by, filename = missing[0]
+        raise ValueError(f"The {needed_by} stage needs the {stage} stage, which is skipped, and {config.output_dir} "
+                         f"has no {filename} from an earlier run. Run the {stage} stage too.")
+
+
+def same_scalers(scalers, other):
+    return all(np.allclose(a.min_, b.min_) and np.allclose(a.scale_, b.scale_) for a, b in zip(scalers, other))
+
+
+def train(config=None):
+    """
+    Runs the configured stages in order: data -> train -> evaluate -> plot. Each stage saves its
+    output to output_dir, and a stage that is skipped reuses what an earlier run left there
+    (prepared data for train and evaluate, model and scalers for evaluate, history and evaluation
+    results for plot). When the train stage is skipped, the data is scaled with the saved model's
+    scalers. Returns a summary dict.
+    """
+    config = config or TrainConfig()
+    stages = set(config.stages)
+    summary = {"model": config.model, "stages": [stage for stage in STAGES if stage in stages]}
+    check_stages(config)
+
+    print("--- Starting Solar Flare Peak Time Prediction Model Development ---")
+
+    if config.model == 'lstm':
+        configure_tensorflow(config)
+
+    model = None
+    if 'evaluate' in stages and 'train' not in stages:
+        model, scaler_X, scaler_y = load_trained_artifacts(config)
+
+    data = None
+    if 'data' in stages:
+        # Without the train stage, the evaluation data is scaled exactly as the saved model's training data was.
+        data = prepare_data(config, scalers=(scaler_X, scaler_y) if model is not None else None)
+        save_prepared_data(config, data)
+    elif stages & {'train', 'evaluate'}:
+        data = load_prepared_data(config)
+        if model is not None and not same_scalers((data["scaler_X"], data["scaler_y"]), (scaler_X, scaler_y)):
+            raise ValueError(f"The data stage output in {config.output_dir} was scaled differently from the saved model; "
+                             f"run the data stage together with the evaluate stage.")
+
+    if 'train' in stages:
+        model, history = train_model(config, data)
+        summary["epochs_trained"] = len(history.get('loss', []))
+
+    if 'evaluate' in stages:
+        summary["metrics"] = evaluate_model(config, model, data)
+        print_example_prediction(model, data["scaler_X"], data["scaler_y"])
+
+    if 'plot' in stages:
+        generate_plots(config)
+
+    print("\n--- Model Development and Prediction Process Complete ---")
+    return summary
+
+
+def parse_args(argv=None):
+    defaults = TrainConfig()
+    parser = argparse.ArgumentParser(description="Train the solar flare peak-time LSTM.")
+    parser.add_argument('--data-path', default=defaults.data_path, help="Flare catalog CSV (default: %(default)s).")
+    parser.add_argument('--output-dir', default=defaults.output_dir, help="Where model, scalers and stage outputs are written.")
+    parser.add_argument('--plots-dir', default=None, help="Where plots are written (default: <output-dir>/public/plots).")
+    parser.add_argument('--model', choices=MODELS, default=defaults.model, help="Regressor to train (default: %(default)s).")
+    parser.add_argument('--epochs', type=int, default=defaults.epochs)
+    parser.add_argument('--batch-size', type=int, default=defaults.batch_size)
+    parser.add_argument('--patience', type=int, default=defaults.patience, help="Early-stopping patience in epochs.")
+    parser.add_argument('--loader', choices=LOADERS, default=defaults.loader)
+    parser.add_argument('--chunk-size', type=int, default=defaults.chunk_size, help="Rows per chunk for the streaming and feature_store loaders.")
+    parser.add_argument('--feature-store-dir', default=defaults.feature_store_dir)
+    parser.add_argument('--sequence-length', type=int, default=defaults.sequence_length,
+                        help="Flares per LSTM input window: each flare and the ones before it (default: %(default)s).")
+    parser.add_argument('--sequence-group', choices=SEQUENCE_GROUPS, default=defaults.sequence_group,
+                        help="'region' builds windows within each active region (default: %(default)s).")
+    parser.add_argument('--plot-workers', type=int, default=defaults.plot_workers,
+                        help="Processes the plot stage renders in; 0 = one per plot up to the CPU count.")
+    parser.add_argument('--plot-max-points', type=int, default=defaults.plot_max_points,
+                        help="Scatter plots of larger test sets are drawn as a hexbin density (default: %(default)s).")
+    parser.add_argument('--pipeline', choices=PIPELINES, default=defaults.pipeline,
+                        help="How the memory / feature_store arrays are fed to the LSTM (default: %(default)s).")
+    parser.add_argument('--cache-dataset', action='store_true', help="Keep the streaming or sequence batches in memory after the first epoch.")
+    parser.add_argument('--intra-op-threads', type=int, default=defaults.intra_op_threads, help="TensorFlow intra-op threads; 0 = TensorFlow's default.")
+    parser.add_argument('--inter-op-threads', type=int, default=defaults.inter_op_threads, help="TensorFlow inter-op threads; 0 = TensorFlow's default.")
+    parser.add_argument('--jit', action='store_true', help="Compile the LSTM's train and predict steps with XLA (for GPUs; much slower for this LSTM on CPU).")
+    parser.add_argument('--scale-lr', action='store_true', help="Scale Adam's learning rate linearly with --batch-size.")
+    parser.add_argument('--throughput', action='store_true', help="High-throughput preset: the tf.data pipeline and a small inter-op pool.")
+    parser.add_argument('--stages', default=','.join(STAGES), help="Comma-separated stages to run (default: %(default)s).")
+    parser.add_argument('--skip', default='', help="Comma-separated stages to skip, e.g. --skip plot.")
+    args = parser.parse_args(argv)
+
+    skip = {stage for stage in args.skip.split(',') if stage}
+    stages = tuple(stage for stage in args.stages.split(',') if stage and stage not in skip)
+
+    return TrainConfig(
+        data_path=args.data_path,
+        model=args.model,
+        output_dir=args.output_dir,
+        plots_dir=args.plots_dir,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        patience=args.patience,
+        loader=args.loader,
+        chunk_size=args.chunk_size,
+        feature_store_dir=args.feature_store_dir,
+        stages=stages,
+        sequence_length=args.sequence_length,
+        sequence_group=args.sequence_group,
+        plot_workers=args.plot_workers,
+        plot_max_points=args.plot_max_points,
+        pipeline=args.pipeline,
+        cache_dataset=args.cache_dataset,
+        intra_op_threads=args.intra_op_threads,
+        inter_op_threads=args.inter_op_threads,
+        jit_compile=args.jit,
+        scale_learning_rate=args.scale_lr,
+        throughput=args.throughput
+    )
+
+
+def main(argv=None):
+    try:
+        config = parse_args(argv)
+        train(config)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,371 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from features import X_COLUMNS
+from numpy_lstm import NumpyLSTMModel, _DenseLayer, read_h5_model
+
+
+# Bump when the layout of the bundle changes; loaders refuse bundles newer than they understand.
+BUNDLE_FORMAT_VERSION = 1
+DEFAULT_BUNDLE_FILENAME = 'model_bundle.npz'
+MANIFEST_KEY = '__manifest__'
+
+# Backends whose weights can be stored as plain arrays. Gradient-boosted trees cannot, and stay .joblib only.
+BUNDLE_BACKENDS = ('lstm', 'ridge', 'mlp')
+
+# scikit-learn MLPRegressor activation -> numpy_lstm activation
+MLP_ACTIVATIONS = {'identity': 'linear', 'relu': 'relu', 'tanh': 'tanh', 'logistic': 'sigmoid'}
+
+
+class ArrayScaler:
+    """MinMaxScaler.transform / inverse_transform from the fitted min_ and scale_ arrays, without scikit-learn."""
+
+    def __init__(self, min_, scale_):
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        return cls(scaler.min_, scaler.scale_)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+
+class DenseStackModel:
+    """Dense layers over the flattened features; the array form of the ridge and MLP backends."""
+
+    def __init__(self, layers, n_features, backend):
+        self.layers = layers
+        self.backend = backend
+        self.input_shape = (None, 1, n_features)
+        self.warmup_seconds = None
+
+    def predict(self, X, batch_size=None, verbose=None):
+        outputs = np.asarray(X, dtype=np.float64)
+        outputs = outputs.reshape(len(outputs), -1)
+        for layer in self.layers:
+            outputs = layer(outputs)
+        return outputs.reshape(-1, 1)
+
+    def warmup(self, batch_sizes=(1, 32)):
+        started = time.perf_counter()
+        for size in batch_sizes:
+            self.predict(np.zeros((size,) + self.input_shape[1:]))
+        self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
+
+
+class ModelBundle:
+    """A loaded bundle: the model, both scalers and the manifest they were written with."""
+
+    # Set by shared_weights.load_shared_bundle when the weights are mapped from a shared weight file.
+    weights_path = None
+
+    def __init__(self, path, manifest, model, scaler_X, scaler_y):
+        self.path = path
+        self.manifest = manifest
+        self.model = model
+        self.scaler_X = scaler_X
+        self.scaler_y = scaler_y
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    @property
+    def backend(self):
+        return self.manifest["backend"]
+
+
+def content_hash(manifest, arrays):
+    """SHA-256 over the manifest (without its hash fields) and every array's name, dtype, shape and bytes."""
+    digest = hashlib.sha256()
+    unhashed = {key: value for key, value in manifest.items() if key not in ('content_hash', 'version')}
+    digest.update(json.dumps(unhashed, sort_keys=True).encode('utf-8'))
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape};".encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _lstm_payload(h5_path):
+    model_config, layer_weights = read_h5_model(h5_path)
+    arrays = {f'weights/{name}/{i}': weight for name, weights in layer_weights.items() for i, weight in enumerate(weights)}
+    layers = [{"name": name, "weights": len(weights)} for name, weights in layer_weights.items()]
+    return {"model_config": model_config, "layers": layers}, arrays
+
+
+def _regressor_payload(model):
+    estimator = model.estimator
+    if model.backend == 'ridge':
+        kernels = [np.asarray(estimator.coef_, dtype=np.float64).reshape(-1, 1)]
+        biases = [np.atleast_1d(np.asarray(estimator.intercept_, dtype=np.float64))]
+        activations = ['linear']
+    elif model.backend == 'mlp':
+        kernels = [np.asarray(kernel, dtype=np.float64) for kernel in estimator.coefs_]
+        biases = [np.asarray(bias, dtype=np.float64) for bias in estimator.intercepts_]
+        activations = [MLP_ACTIVATIONS[estimator.activation]] * (len(kernels) - 1) + [MLP_ACTIVATIONS[estimator.out_activation_]]
+    else:
+        raise ValueError(f"'{model.backend}' models cannot be stored in a bundle. Supported: {BUNDLE_BACKENDS}.")
+
+    arrays, layers = {}, []
+    for i, (kernel, bias, activation) in enumerate(zip(kernels, biases, activations)):
+        name = f'dense_{i}'
+        arrays[f'weights/{name}/0'], arrays[f'weights/{name}/1'] = kernel, bias
+        layers.append({"name": name, "weights": 2, "activation": activation})
+    return {"layers": layers}, arrays
+
+
+def write_bundle(path, model_path, scaler_X, scaler_y, sequence=None):
+    """
+    Writes one bundle from a trained model file (.h5 LSTM or .joblib regressor) and the fitted
+    scalers. The file is written next to `path` and renamed into place, so readers only ever see a
+    complete bundle. `sequence` ({"length", "group_by"}) is recorded for models trained on windows
+    of preceding flares (see sequences.py). Returns the manifest.
+    """
+    if model_path.endswith('.joblib'):
+        from regressors import RegressorModel
+        regressor = RegressorModel.load(model_path)
+        backend = regressor.backend
+        payload, arrays = _regressor_payload(regressor)
+    else:
+        backend = 'lstm'
+        payload, arrays = _lstm_payload(model_path)
+
+    arrays['scaler_x/min'] = np.asarray(scaler_X.min_, dtype=np.float64)
+    arrays['scaler_x/scale'] = np.asarray(scaler_X.scale_, dtype=np.float64)
+    arrays['scaler_y/min'] = np.asarray(scaler_y.min_, dtype=np.float64)
+    arrays['scaler_y/scale'] = np.asarray(scaler_y.scale_, dtype=np.float64)
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "backend": backend,
+        "x_columns": X_COLUMNS,
+        "created_at": datetime.now().isoformat(),
+        "source": os.path.basename(model_path),
+        "model": payload
+    }
+    if sequence:
+        manifest["sequence"] = sequence
+    return write_manifest_npz(path, manifest, arrays)
+
+
+def write_manifest_npz(path, manifest, arrays):
+    """
+    Hashes `arrays` into `manifest` (content_hash and the 12-character version) and writes both
+    as one .npz, next to `path` and renamed into place. Returns the manifest.
+    """
+    manifest["content_hash"] = content_hash(manifest, arrays)
+    manifest["version"] = manifest["content_hash"][:12]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.bundle-', suffix='.npz', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays, **{MANIFEST_KEY: np.frombuffer(json.dumps(manifest).encode('utf-8'), dtype=np.uint8)})
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return manifest
+
+
+def _layer_weights(manifest, arrays):
+    return {layer["name"]: [arrays[f'weights/{layer["name"]}/{i}'] for i in range(layer["weights"])]
+            for layer in manifest["model"]["layers"]}
+
+
+def _keras_model(model_config, layer_weights):
+    """
+    Rebuilds a tf.keras Sequential LSTM from the stored layer configs and sets its weights. Layers
+    are constructed from the few options NumpyLSTMModel also reads, rather than deserialized, so a
+    bundle written under one Keras version loads under another.
+    """
+    from tensorflow import keras
+
+    if model_config['class_name'] != 'Sequential':
+        raise ValueError(f"Only Sequential models are supported, got {model_config['class_name']}.")
+
+    layers = []
+    for layer_config in model_config['config']['layers']:
+        class_name, config = layer_config['class_name'], layer_config['config']
+        if not layers:
+            input_shape = config.get('batch_input_shape') or config.get('batch_shape')
+            if input_shape is None:
+                raise ValueError("Could not determine the model input shape from the model bundle.")
+            layers.append(keras.Input(shape=tuple(input_shape[1:])))
+        if class_name == 'InputLayer':
+            continue
+        if class_name == 'LSTM':
+            if config.get('go_backwards') or config.get('stateful'):
+                raise ValueError(f"LSTM layer '{config['name']}' uses go_backwards/stateful, which is not supported.")
+            layers.append(keras.layers.LSTM(config['units'], name=config['name'],
+                                            activation=config.get('activation', 'tanh'),
+                                            recurrent_activation=config.get('recurrent_activation', 'sigmoid'),
+                                            use_bias=config.get('use_bias', True),
+                                            return_sequences=config.get('return_sequences', False)))
+        elif class_name == 'Dropout':
+            layers.append(keras.layers.Dropout(config['rate'], name=config['name']))
+        elif class_name == 'Dense':
+            layers.append(keras.layers.Dense(config['units'], name=config['name'], activation=config.get('activation', 'linear'),
+                                             use_bias=config.get('use_bias', True)))
+        else:
+            raise ValueError(f"Unsupported layer type '{class_name}' in the model bundle.")
+
+    model = keras.Sequential(layers)
+    for layer in model.layers:
+        if layer.name in layer_weights:
+            layer.set_weights(layer_weights[layer.name])
+    return model
+
+
+def _build_model(manifest, arrays, runtime):
+    layer_weights = _layer_weights(manifest, arrays)
+
+    if manifest["backend"] != 'lstm':
+        layers = [_DenseLayer(*layer_weights[layer["name"]], activation=layer["activation"]) for layer in manifest["model"]["layers"]]
+        return DenseStackModel(layers, len(manifest["x_columns"]), manifest["backend"])
+
+    model_config = manifest["model"]["model_config"]
+    if runtime == 'numpy':
+        return NumpyLSTMModel.from_config(model_config, layer_weights, source='model bundle')
+    if runtime == 'keras':
+        return _keras_model(model_config, layer_weights)
+    raise ValueError(f"Unknown runtime '{runtime}'. Expected 'numpy' or 'keras'.")
+
+
+def _check_manifest(path, manifest):
+    if manifest.get("format_version", 0) > BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"{path} uses bundle format {manifest['format_version']}; this code reads up to {BUNDLE_FORMAT_VERSION}.")
+    if manifest["x_columns"] != X_COLUMNS:
+        raise ValueError(f"{path} was trained on columns {manifest['x_columns']}, expected {X_COLUMNS}.")
+
+
+def read_bundle_manifest(path):
+    """Reads only the manifest of a bundle; the weight arrays are not loaded."""
+    with np.load(path, allow_pickle=False) as data:
+        if MANIFEST_KEY not in data.files:
+            raise ValueError(f"{path} is not a model bundle (no manifest).")
+        manifest = json.loads(data[MANIFEST_KEY].tobytes().decode('utf-8'))
+    _check_manifest(path, manifest)
+    return manifest
+
+
+def read_bundle_arrays(path, verify=True):
+    """
+    Returns (manifest, name -> array) for a bundle, read without unpickling anything
+    (np.load with allow_pickle=False). With `verify`, the content hash is recomputed and a
+    mismatch raises ValueError.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+
+    if MANIFEST_KEY not in arrays:
+        raise ValueError(f"{path} is not a model bundle (no manifest).")
+    manifest = json.loads(arrays.pop(MANIFEST_KEY).tobytes().decode('utf-8'))
+
+    _check_manifest(path, manifest)
+    if verify and content_hash(manifest, arrays) != manifest.get("content_hash"):
+        raise ValueError(f"Content hash mismatch for {path}; the bundle is corrupt or was modified.")
+    return manifest, arrays
+
+
+def bundle_from_arrays(path, manifest, arrays, runtime='numpy'):
+    """Builds a ModelBundle from a manifest and its arrays, wherever the arrays live."""
+    scaler_X = ArrayScaler(arrays['scaler_x/min'], arrays['scaler_x/scale'])
+    scaler_y = ArrayScaler(arrays['scaler_y/min'], arrays['scaler_y/scale'])
+    return ModelBundle(path, manifest, _build_model(manifest, arrays, runtime), scaler_X, scaler_y)
+
+
+def load_bundle(path, runtime='numpy', verify=True):
+    """
+    Loads a bundle without unpickling anything. With `verify`, the content hash is checked.
+    `runtime` selects how an LSTM is rebuilt: 'numpy' (NumpyLSTMModel) or 'keras' (a tf.keras
+    model with the same weights).
+    """
+    manifest, arrays = read_bundle_arrays(path, verify=verify)
+    return bundle_from_arrays(path, manifest, arrays, runtime)
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class BundleWatcher:
+    """
+    Polls a bundle file and calls `on_change` after it has been replaced. The polling thread is
+    started by `ensure_running()`, which also restarts it in forked workers, where the parent's
+    thread does not exist.
+    """
+
+    def __init__(self, path, on_change, interval_seconds=5.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval_seconds = interval_seconds
+        self.loaded_signature = file_signature(path)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def mark_loaded(self, signature=None):
+        """Records the file version that is now being served."""
+        self.loaded_signature = signature if signature is not None else file_signature(self.path)
+
+    def ensure_running(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="bundle-watcher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            signature = file_signature(self.path)
+            if signature is not None and signature != self.loaded_signature:
+                # Recorded before reloading, so a bundle that fails to load is not retried in a loop.
+                self.loaded_signature = signature
+                print(f"Model bundle {self.path} changed; reloading.")
+                self.on_change()
+
+
+if __name__ == '__main__':
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Build a model bundle from a trained model and its scalers, or inspect one.")
+    parser.add_argument('--model-path', default='solar_flare_peak_time_predictor_lstm_model.h5')
+    parser.add_argument('--scaler-x-path', default='scaler_X.pkl')
+    parser.add_argument('--scaler-y-path', default='scaler_y.pkl')
+    parser.add_argument('--output', default=DEFAULT_BUNDLE_FILENAME)
+    parser.add_argument('--inspect', metavar='BUNDLE', help="Verify a bundle and print its manifest instead of building one.")
+    args = parser.parse_args()
+
+    if args.inspect:
+        started = time.perf_counter()
+        bundle = load_bundle(args.inspect)
+        print(f"Loaded and verified in {(time.perf_counter() - started) * 1000:.1f} ms")
+        print(json.dumps({key: value for key, value in bundle.manifest.items() if key != 'model'}, indent=2))
+    else:
+        manifest = write_bundle(args.output, args.model_path, joblib.load(args.scaler_x_path), joblib.load(args.scaler_y_path))
+        print(f"Wrote {manifest['backend']} bundle {manifest['version']} to {args.output}")
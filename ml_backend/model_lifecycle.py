@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+LOAD_MODES = ('eager', 'background', 'lazy')
+
+
+class ModelLifecycle:
+    """
+    Tracks the load state of the ML components behind the server.
+
+    `loader` is a callable that loads and publishes the components; it is run at most once
+    at a time. Load modes:
+      - 'eager': load synchronously when `start()` is called (at import). Combined with
+        gunicorn --preload this loads once in the master and shares the pages with every worker.
+      - 'background': load in a daemon thread started by `start()`; requests see "loading"
+        until it finishes, so the process can bind and answer health checks immediately.
+      - 'lazy': load on the first call to `ensure_loaded()`.
+    """
+
+    def __init__(self, loader, mode='eager'):
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode '{mode}'. Expected one of {LOAD_MODES}.")
+
+        self.loader = loader
+        self.mode = mode
+        self.state = NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.load_count = 0
+
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread = None
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def _after_fork_in_child(self):
+        # Locks may have been held by the parent's loader thread, and that thread does not
+        # exist in the child. A finished load (e.g. gunicorn --preload) is kept as is.
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread = None
+        if self.state == LOADING:
+            self.state = NOT_LOADED
+
+    def start(self):
+        """Starts loading according to the configured mode."""
+        if self.mode == 'eager':
+            self.load()
+        elif self.mode == 'background':
+            self.load_in_background()
+
+    def load(self, reload=False):
+        """
+        Loads the components in the calling thread and returns True on success.
+        Concurrent callers wait for the load in progress instead of starting another one.
+
+        A reload of components that are already ready keeps the state READY throughout: the
+        loader publishes the new components in one step, and if it fails the old ones keep
+        serving and the error is recorded.
+        """
+        with self._load_lock:
+            if self.state == READY and not reload:
+                return True
+
+            hot_swap = self.state == READY
+            with self._lock:
+                if not hot_swap:
+                    self.state = LOADING
+                self.error = None
+
+            started = time.perf_counter()
+            try:
+                self.loader()
+            except Exception as e:
+                with self._lock:
+                    if not hot_swap:
+                        self.state = FAILED
+                    self.error = str(e)
+                    self.load_seconds = time.perf_counter() - started
+                return False
+
+            with self._lock:
+                self.state = READY
+                self.load_seconds = time.perf_counter() - started
+                self.loaded_at = time.time()
+                self.load_count += 1
+            return True
+
+    def load_in_background(self):
+        """Starts `load()` in a daemon thread unless one is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self._thread = threading.Thread(target=self.load, name="model-loader", daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def ensure_loaded(self):
+        """
+        Returns True if the components are ready. In lazy mode the first call loads them
+        (other requests wait for it); in background mode this never blocks and returns
+        False until the loader thread has finished. A failed load is not retried here.
+        """
+        state = self.state
+        if state == READY:
+            return True
+        if state == FAILED:
+            return False
+        if self.mode == 'lazy':
+            return self.load()
+        if state == NOT_LOADED and self.mode == 'background':
+            self.load_in_background()
+        return False
+
+    def wait_until_ready(self, timeout=None):
+        """Blocks until a background load finishes. Returns True if the components are ready."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.state == READY
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "mode": self.mode,
+                "ready": self.state == READY,
+                "load_seconds": self.load_seconds,
+                "loaded_at": self.loaded_at,
+                "load_count": self.load_count,
+                "error": self.error,
+                "pid": os.getpid()
+            }
@@ -0,0 +1,201 @@
+import json
+import time
+
+import h5py
+import numpy as np
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'relu': lambda x: np.maximum(x, 0.0)
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation '{name}'. Supported: {sorted(ACTIVATIONS)}")
+    return ACTIVATIONS[name]
+
+
+class _LSTMLayer:
+    """Keras LSTM layer (gate order i, f, c, o) evaluated with batched NumPy matmuls."""
+
+    def __init__(self, kernel, recurrent_kernel, bias, activation='tanh',
+                 recurrent_activation='sigmoid', return_sequences=False):
+        self.kernel = kernel
+        self.recurrent_kernel = recurrent_kernel
+        self.bias = bias
+        self.units = recurrent_kernel.shape[0]
+        self.activation = _activation(activation)
+        self.recurrent_activation = _activation(recurrent_activation)
+        self.return_sequences = return_sequences
+
+    def __call__(self, inputs):
+        n_samples, n_timesteps, _ = inputs.shape
+        units = self.units
+
+        # Input projections for every timestep in one matmul: (n_samples, n_timesteps, 4 * units).
+        projected = inputs @ self.kernel
+        if self.bias is not None:
+            projected += self.bias
+
+        h = np.zeros((n_samples, units), dtype=inputs.dtype)
+        c = np.zeros((n_samples, units), dtype=inputs.dtype)
+        outputs = []
+
+        for t in range(n_timesteps):
+            z = projected[:, t, :]
+            if t > 0:
+                # h is all zeros at t == 0, so the recurrent matmul can be skipped.
+                z = z + h @ self.recurrent_kernel
+
+            i = self.recurrent_activation(z[:, :units])
+            f = self.recurrent_activation(z[:, units:2 * units])
+            c_candidate = self.activation(z[:, 2 * units:3 * units])
+            o = self.recurrent_activation(z[:, 3 * units:])
+
+            c = f * c + i * c_candidate
+            h = o * self.activation(c)
+
+            if self.return_sequences:
+                outputs.append(h)
+
+        if self.return_sequences:
+            return np.stack(outputs, axis=1)
+        return h
+
+
+class _DenseLayer:
+    def __init__(self, kernel, bias, activation='linear'):
+        self.kernel = kernel
+        self.bias = bias
+        self.activation = _activation(activation)
+
+    def __call__(self, inputs):
+        outputs = inputs @ self.kernel
+        if self.bias is not None:
+            outputs += self.bias
+        return self.activation(outputs)
+
+
+def _read_layer_weights(weights_group, layer_name, dtype):
+    layer_group = weights_group[layer_name]
+    weight_names = [
+        name.decode('utf-8') if isinstance(name, bytes) else name
+        for name in layer_group.attrs['weight_names']
+    ]
+    return [np.asarray(layer_group[name], dtype=dtype) for name in weight_names]
+
+
+def read_h5_model(path, dtype=np.float32):
+    """Reads (model_config, layer name -> weight arrays) from a Keras .h5 file with h5py."""
+    with h5py.File(path, 'r') as f:
+        model_config = f.attrs['model_config']
+        if isinstance(model_config, bytes):
+            model_config = model_config.decode('utf-8')
+        model_config = json.loads(model_config)
+
+        weights_group = f['model_weights'] if 'model_weights' in f else f
+        layer_weights = {}
+        for layer_config in model_config['config']['layers']:
+            name = layer_config['config'].get('name')
+            if name in weights_group and layer_config['class_name'] not in ('InputLayer', 'Dropout'):
+                layer_weights[name] = _read_layer_weights(weights_group, name, dtype)
+    return model_config, layer_weights
+
+
+class NumpyLSTMModel:
+    """
+    TensorFlow-free inference engine for the Sequential LSTM models saved by ml_model.py.
+
+    Weights and layer configuration are read from the Keras .h5 file with h5py, or from a
+    model bundle (see model_bundle.py). Supports
+    InputLayer, LSTM, Dropout (identity at inference) and Dense layers. Exposes the same
+    `predict(X, batch_size, verbose)` interface as a Keras model.
+    """
+
+    def __init__(self, layers, input_shape, dtype=np.float32):
+        self.layers = layers
+        self.input_shape = tuple(input_shape)
+        self.dtype = dtype
+        self.warmup_seconds = None
+
+    @classmethod
+    def from_h5(cls, path, dtype=np.float32):
+        model_config, layer_weights = read_h5_model(path, dtype)
+        return cls.from_config(model_config, layer_weights, dtype=dtype, source=path)
+
+    @classmethod
+    def from_config(cls, model_config, layer_weights, dtype=np.float32, source='model'):
+        """
+        Builds the model from a Keras Sequential config and a dict of layer name -> list of
+        weight arrays (in Keras weight order).
+        """
+        if model_config['class_name'] != 'Sequential':
+            raise ValueError(f"Only Sequential models are supported, got {model_config['class_name']}.")
+
+        layers = []
+        input_shape = None
+
+        for layer_config in model_config['config']['layers']:
+            class_name = layer_config['class_name']
+            config = layer_config['config']
+
+            if input_shape is None and 'batch_input_shape' in config:
+                input_shape = config['batch_input_shape']
+            if input_shape is None and 'batch_shape' in config:
+                input_shape = config['batch_shape']
+
+            if class_name in ('InputLayer', 'Dropout'):
+                continue
+
+            weights = [np.asarray(weight, dtype=dtype) for weight in layer_weights[config['name']]]
+            bias = weights[-1] if config.get('use_bias', True) else None
+
+            if class_name == 'LSTM':
+                if config.get('go_backwards') or config.get('stateful'):
+                    raise ValueError(f"LSTM layer '{config['name']}' uses go_backwards/stateful, which is not supported.")
+                layers.append(_LSTMLayer(
+                    weights[0], weights[1], bias,
+                    activation=config.get('activation', 'tanh'),
+                    recurrent_activation=config.get('recurrent_activation', 'sigmoid'),
+                    return_sequences=config.get('return_sequences', False)
+                ))
+            elif class_name == 'Dense':
+                layers.append(_DenseLayer(weights[0], bias, activation=config.get('activation', 'linear')))
+            else:
+                raise ValueError(f"Unsupported layer type '{class_name}' in {source}.")
+
+        if input_shape is None:
+            raise ValueError(f"Could not determine the model input shape from {source}.")
+
+        return cls(layers, input_shape, dtype=dtype)
+
+    def predict(self, X, batch_size=None, verbose=None):
+        """Runs a forward pass over X (n_samples, timesteps, n_features) and returns (n_samples, n_outputs)."""
+        outputs = np.asarray(X, dtype=self.dtype)
+        if outputs.ndim != 3 or outputs.shape[2] != self.input_shape[2]:
+            raise ValueError(f"Expected input of shape (n, timesteps, {self.input_shape[2]}), got {outputs.shape}.")
+
+        for layer in self.layers:
+            outputs = layer(outputs)
+        return outputs
+
+    def warmup(self, batch_sizes=(1, 32)):
+        started = time.perf_counter()
+        for size in batch_sizes:
+            sample_shape = tuple(dim if dim is not None else 1 for dim in self.input_shape[1:])
+            self.predict(np.zeros((size,) + sample_shape, dtype=self.dtype))
+        self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
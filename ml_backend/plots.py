@@ -0,0 +1,300 @@
+import argparse
+import hashlib
+import json
+import mimetypes
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from io import BytesIO
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+
+TRAINING_HISTORY_PLOT = 'training_history_plot.png'
+ACTUAL_VS_PREDICTED_PLOT = 'actual_vs_predicted_plot.png'
+RESIDUALS_PLOT = 'residuals_plot.png'
+PLOT_NAMES = (TRAINING_HISTORY_PLOT, ACTUAL_VS_PREDICTED_PLOT, RESIDUALS_PLOT)
+# Maps each plot name to the content-hashed file holding its current version.
+MANIFEST_FILENAME = 'plots_manifest.json'
+DEFAULT_PLOTS_DIR = os.path.join('public', 'plots')
+
+# Scatters with more points than this are drawn as a hexbin density (or a sample of this many points).
+DEFAULT_MAX_POINTS = 20000
+LARGE_SCATTER_MODES = ('hexbin', 'sample')
+HASH_LENGTH = 12
+HASHED_NAME = re.compile(r'^(?P<stem>[\w-]+)\.(?P<digest>[0-9a-f]{%d})(?P<suffix>\.\w+)$' % HASH_LENGTH)
+
+
+def hashed_filename(name, digest):
+    stem, suffix = os.path.splitext(name)
+    return f"{stem}.{digest[:HASH_LENGTH]}{suffix}"
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.plot-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _new_figure(figsize):
+    # Figures are built without pyplot, so rendering keeps no global state and needs no display.
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    sns.set_theme(style="whitegrid")
+    return Figure(figsize=figsize)
+
+
+def _scatter(figure, ax, x, y, max_points, large_scatter, seed=0):
+    """Plain scatter for small inputs; above max_points a log-scaled hexbin, or a fixed random sample of max_points."""
+    if len(x) <= max_points:
+        ax.scatter(x, y, alpha=0.6, s=10)
+    elif large_scatter == 'sample':
+        keep = np.random.default_rng(seed).choice(len(x), size=max_points, replace=False)
+        ax.scatter(x[keep], y[keep], alpha=0.6, s=10, label=f'{max_points:,} of {len(x):,} flares')
+    else:
+        cells = ax.hexbin(x, y, gridsize=80, bins='log', mincnt=1, cmap='viridis')
+        figure.colorbar(cells, ax=ax, label='Flares per cell')
+
+
+def training_history_figure(history):
+    figure = _new_figure((14, 7))
+
+    # Loss
+    ax = figure.add_subplot(1, 2, 1)
+    ax.plot(history['loss'], label='Training Loss')
+    if 'val_loss' in history:
+        ax.plot(history['val_loss'], label='Validation Loss')
+    ax.set_title('Model Training Progress: Loss Over Epochs', fontsize=16)
+    ax.set_xlabel('Epoch', fontsize=12)
+    ax.set_ylabel('Loss (Mean Squared Error)', fontsize=12)
+    ax.legend(fontsize=10)
+    ax.grid(True)
+
+    # MAE
+    ax = figure.add_subplot(1, 2, 2)
+    ax.plot(history['mae'], label='Training MAE')
+    if 'val_mae' in history:
+        ax.plot(history['val_mae'], label='Validation MAE')
+    ax.set_title('Model Training Progress: Mean Absolute Error Over Epochs', fontsize=16)
+    ax.set_xlabel('Epoch', fontsize=12)
+    ax.set_ylabel('Mean Absolute Error', fontsize=12)
+    ax.legend(fontsize=10)
+    ax.grid(True)
+
+    figure.tight_layout()
+    return figure
+
+
+def actual_vs_predicted_figure(y_true, y_pred, max_points=DEFAULT_MAX_POINTS, large_scatter='hexbin'):
+    figure = _new_figure((9, 9))
+    ax = figure.add_subplot(1, 1, 1)
+    _scatter(figure, ax, y_true, y_pred, max_points, large_scatter)
+    ax.plot([y_true.min(), y_true.max()], [y_true.min(), y_true.max()], 'r--', lw=2, label='Ideal Prediction')
+    ax.set_xlabel('Actual Peak Offset (seconds)', fontsize=12)
+    ax.set_ylabel('Predicted Peak Offset (seconds)', fontsize=12)
+    ax.set_title('Actual vs. Predicted Solar Flare Peak Offsets', fontsize=16)
+    ax.grid(True)
+    ax.set_aspect('equal', adjustable='box')
+    ax.legend(fontsize=10)
+    return figure
+
+
+def residuals_figure(y_true, y_pred, max_points=DEFAULT_MAX_POINTS, large_scatter='hexbin'):
+    figure = _new_figure((12, 7))
+    ax = figure.add_subplot(1, 1, 1)
+    _scatter(figure, ax, y_pred, y_true - y_pred, max_points, large_scatter)
+    ax.axhline(y=0, color='r', linestyle='--', lw=2, label='Zero Error Line')
+    ax.set_xlabel('Predicted Peak Offset (seconds)', fontsize=12)
+    ax.set_ylabel('Residual (Actual - Predicted) (seconds)', fontsize=12)
+    ax.set_title('Residuals of Solar Flare Peak Offset Predictions', fontsize=16)
+    ax.grid(True)
+    ax.legend(fontsize=10)
+    return figure
+
+
+def render_plot(name, history_path, evaluation_path, plots_dir, max_points=DEFAULT_MAX_POINTS, large_scatter='hexbin'):
+    """
+    Renders one plot from the saved training history / evaluation results and writes it twice:
+    as <stem>.<content hash>.png, which never changes once written, and under its plain name.
+    Returns (name, hashed file name, seconds). Runs in a worker process, so it reads its own inputs.
+    """
+    started = time.perf_counter()
+    if name == TRAINING_HISTORY_PLOT:
+        with open(history_path) as f:
+            figure = training_history_figure(json.load(f))
+    else:
+        evaluation = np.load(evaluation_path)
+        y_true, y_pred = evaluation['y_true'].ravel(), evaluation['y_pred'].ravel()
+        build = actual_vs_predicted_figure if name == ACTUAL_VS_PREDICTED_PLOT else residuals_figure
+        figure = build(y_true, y_pred, max_points, large_scatter)
+
+    buffer = BytesIO()
+    figure.savefig(buffer, format='png')
+    data = buffer.getvalue()
+
+    hashed_name = hashed_filename(name, hashlib.sha256(data).hexdigest())
+    _write_atomic(os.path.join(plots_dir, hashed_name), data)
+    _write_atomic(os.path.join(plots_dir, name), data)
+    return name, hashed_name, time.perf_counter() - started
+
+
+def _render_job(job):
+    return render_plot(*job)
+
+
+def render_plots(history_path, evaluation_path, plots_dir=DEFAULT_PLOTS_DIR, workers=0, max_points=DEFAULT_MAX_POINTS, large_scatter='hexbin'):
+    """
+    Renders every plot its inputs allow, each in its own process (at most `workers`, 0 = one per
+    plot up to the CPU count), then writes the manifest and removes hashed files it no longer
+    names. The training history plot is skipped when the history has no epochs (non-recurrent
+    backends). Returns the manifest.
+    """
+    if large_scatter not in LARGE_SCATTER_MODES:
+        raise ValueError(f"Unknown large scatter mode '{large_scatter}'. Expected one of {LARGE_SCATTER_MODES}.")
+    os.makedirs(plots_dir, exist_ok=True)
+
+    names = [ACTUAL_VS_PREDICTED_PLOT, RESIDUALS_PLOT]
+    with open(history_path) as f:
+        if 'mae' in json.load(f):
+            names.insert(0, TRAINING_HISTORY_PLOT)
+    jobs = [(name, history_path, evaluation_path, plots_dir, max_points, large_scatter) for name in names]
+
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers > 1:
+        # Spawned, not forked: the parent may have TensorFlow loaded, which does not survive fork().
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=multiprocessing.get_context('spawn')) as pool:
+            rendered = list(pool.map(_render_job, jobs))
+    else:
+        rendered = [_render_job(job) for job in jobs]
+
+    manifest = {
+        "plots": {name: {"file": hashed_name, "etag": HASHED_NAME.match(hashed_name)['digest'], "render_seconds": round(seconds, 3)}
+                  for name, hashed_name, seconds in rendered},
+        "rendered_at": datetime.now().isoformat()
+    }
+    _write_atomic(os.path.join(plots_dir, MANIFEST_FILENAME), json.dumps(manifest, indent=2).encode('utf-8'))
+
+    current = {entry["file"] for entry in manifest["plots"].values()}
+    for filename in os.listdir(plots_dir):
+        match = HASHED_NAME.match(filename)
+        if match and filename not in current and f"{match['stem']}{match['suffix']}" in PLOT_NAMES:
+            os.remove(os.path.join(plots_dir, filename))
+    return manifest
+
+
+CachedPlot = namedtuple('CachedPlot', ['data', 'etag', 'immutable', 'mimetype'])
+
+
+class PlotStore:
+    """
+    Serves plot files from memory. A plain name (training_history_plot.png) is resolved through
+    the manifest to its current hashed file, whose hash is the ETag; a hashed name is immutable and
+    is never re-read. Files without a manifest entry are hashed when read and re-read when their
+    mtime or size changes. At most `max_entries` files are kept, least recently used dropped first.
+    """
+
+    def __init__(self, plots_dir=DEFAULT_PLOTS_DIR, max_entries=32):
+        self.plots_dir = plots_dir
+        self.max_entries = max_entries
+        self._files = OrderedDict()
+        self._manifest = (None, {})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _signature(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _manifest_plots(self):
+        path = os.path.join(self.plots_dir, MANIFEST_FILENAME)
+        signature = self._signature(path)
+        if signature != self._manifest[0]:
+            plots = {}
+            if signature is not None:
+                try:
+                    with open(path) as f:
+                        plots = json.load(f).get("plots", {})
+                except (OSError, ValueError) as e:
+                    print(f"Could not read plot manifest {path}: {e}")
+            self._manifest = (signature, plots)
+        return self._manifest[1]
+
+    def get(self, filename):
+        """The CachedPlot for `filename`, or None if there is no such plot."""
+        if os.path.basename(filename) != filename or filename.startswith('.'):
+            return None
+
+        with self._lock:
+            entry = self._manifest_plots().get(filename)
+            immutable = entry is None and HASHED_NAME.match(filename) is not None
+            target = entry["file"] if entry else filename
+            cached = self._files.get(target)
+            # Hashed files never change, so only plain files without a manifest entry are checked on disk.
+            signature = None if entry or immutable else self._signature(os.path.join(self.plots_dir, target))
+            if cached is not None and cached[0] == signature:
+                self._files.move_to_end(target)
+                self.hits += 1
+                data, etag = cached[1], cached[2]
+            else:
+                try:
+                    with open(os.path.join(self.plots_dir, target), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    return None
+                if entry:
+                    etag = entry["etag"]
+                elif immutable:
+                    etag = HASHED_NAME.match(filename)['digest']
+                else:
+                    etag = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+                self._files[target] = (signature, data, etag)
+                while len(self._files) > self.max_entries:
+                    self._files.popitem(last=False)
+                self.misses += 1
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return CachedPlot(data, etag, immutable, mimetype)
+
+    def stats(self):
+        with self._lock:
+            return {"files": len(self._files), "hits": self.hits, "misses": self.misses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the training plots from a run's training_history.json and evaluation.npz.")
+    parser.add_argument('--output-dir', default='.', help="Run directory holding training_history.json and evaluation.npz.")
+    parser.add_argument('--plots-dir', default=None, help="Where plots are written (default: <output-dir>/public/plots).")
+    parser.add_argument('--workers', type=int, default=0, help="Processes to render in; 0 = one per plot up to the CPU count.")
+    parser.add_argument('--max-points', type=int, default=DEFAULT_MAX_POINTS, help="Scatters with more points are drawn with --large-scatter.")
+    parser.add_argument('--large-scatter', choices=LARGE_SCATTER_MODES, default='hexbin')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest = render_plots(os.path.join(args.output_dir, 'training_history.json'), os.path.join(args.output_dir, 'evaluation.npz'),
+                            args.plots_dir or os.path.join(args.output_dir, DEFAULT_PLOTS_DIR), args.workers, args.max_points, args.large_scatter)
+    for name, entry in manifest["plots"].items():
+        print(f"{name} -> {entry['file']} ({entry['render_seconds']:.2f} s)")
+    print(f"Rendered {len(manifest['plots'])} plots in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+FLOAT_FIELDS = ['total_counts', 'x_pos_asec', 'y_pos_asec']
+INT_FIELDS = ['start_hour', 'start_minute', 'start_second', 'end_hour', 'end_minute', 'end_second']
+
+
+def canonical_key(user_input_raw):
+    """
+    Canonical cache key for a prediction input: the nine required fields only, with
+    numbers normalised so that e.g. 100 and 100.0 or reordered JSON keys hit the same entry.
+    Returns None if the record cannot be keyed (missing or non-numeric fields).
+    """
+    try:
+        values = [float(user_input_raw[field]) for field in FLOAT_FIELDS]
+        values += [int(user_input_raw[field]) for field in INT_FIELDS]
+    except (KeyError, TypeError, ValueError):
+        return None
+    return json.dumps(values, separators=(',', ':'))
+
+
+class InProcessCacheBackend:
+    """Thread-safe LRU dictionary with an optional per-entry TTL."""
+
+    def __init__(self, max_entries=10000, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"backend": "memory", "size": len(self), "max_entries": self.max_entries,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+
+class RedisCacheBackend:
+    """
+    Cache shared between workers through a Redis-compatible server. LRU eviction is left to the
+    server (configure `maxmemory-policy allkeys-lru`); the TTL is set per key.
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', ttl_seconds=None, prefix='ml_predict:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.url = url
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        ttl = int(self.ttl_seconds) if self.ttl_seconds else None
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    def clear(self):
+        # Keys carry the served model's version, so entries of other versions are never hit; the
+        # server's LRU policy (or the TTL) reclaims them.
+        pass
+
+    def stats(self):
+        return {"backend": "redis", "url": self.url}
+
+
+class PredictionCache:
+    """
+    Caches prediction results keyed on the canonicalised input and the version of the model that
+    computed them (the bundle's content hash, or the export's version). Callers pass the version
+    of the model snapshot they predict with, so a result is only ever returned for the model that
+    produced it, whichever worker wrote it and whenever the workers swap models.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.model_version = None
+
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Drops this worker's entries, e.g. after a model reload; they belong to a version no longer served."""
+        with self._lock:
+            self.invalidations += 1
+            self.backend.clear()
+
+    def _full_key(self, user_input_raw, model_version):
+        if model_version is None:
+            return None
+        key = canonical_key(user_input_raw)
+        if key is None:
+            return None
+        self.model_version = model_version
+        return f"{model_version}:{key}"
+
+    def get(self, user_input_raw, model_version):
+        """
+        Returns (key, cached value or None). A None key means the input cannot be cached, which
+        includes every input of a model without a version.
+        """
+        key = self._full_key(user_input_raw, model_version)
+        if key is None:
+            return None, None
+
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, value
+
+    def set(self, key, value):
+        if key is not None:
+            self.backend.set(key, value)
+
+    def get_or_compute(self, user_input_raw, compute, model_version):
+        key, value = self.get(user_input_raw, model_version)
+        if value is not None:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "model_version": self.model_version
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+
+def create_cache_backend(kind, max_entries=10000, ttl_seconds=None, redis_url=None):
+    if kind == 'memory':
+        return InProcessCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if kind == 'redis':
+        return RedisCacheBackend(url=redis_url or 'redis://localhost:6379/0', ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unknown cache backend '{kind}'. Expected 'memory' or 'redis'.")
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for every thread in the process. A background thread reads
+    sys._current_frames() every `interval_seconds` and counts each distinct stack. Requests are not
+    instrumented, so the cost is paid only while profiling and scales with the interval, not with
+    traffic. The result is in folded-stack format (one "thread;outer;...;inner count" line per
+    stack), which flamegraph.pl, speedscope and inferno read directly.
+    """
+
+    def __init__(self, interval_seconds=0.005):
+        if interval_seconds <= 0:
+            raise ValueError(f"interval_seconds must be positive, got {interval_seconds}.")
+        self.interval_seconds = interval_seconds
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_seconds=None):
+        """Starts sampling; with `duration_seconds`, sampling stops by itself after that long."""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("The profiler is already running.")
+            self.samples = Counter()
+            self.sample_count = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration_seconds,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops sampling and returns the folded stacks collected so far."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.folded()
+
+    def _run(self, duration_seconds):
+        own_ident = threading.get_ident()
+        deadline = time.perf_counter() + duration_seconds if duration_seconds else None
+        while not self._stop_event.wait(self.interval_seconds):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                self.samples[self._fold(thread_names.get(ident, str(ident)), frame)] += 1
+            self.sample_count += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _fold(thread_name, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ';'.join(reversed(stack))
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval_ms": self.interval_seconds * 1000.0,
+            "samples": self.sample_count,
+            "distinct_stacks": len(self.samples),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at
+        }
+
+    def dump(self, directory):
+        """Writes the folded stacks to profile-<pid>-<start time>.folded in `directory` and returns the path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{os.getpid()}-{int(self.started_at or time.time())}.folded")
+        with open(path, 'w') as f:
+            f.write(self.folded())
+        return path
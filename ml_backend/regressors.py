@@ -0,0 +1,84 @@
+import time
+
+import joblib
+import numpy as np
+
+from features import X_COLUMNS
+
+
+# Non-recurrent alternatives to the LSTM. They are trained on the same scaled X_COLUMNS features and
+# scaled target, so scaler_X.pkl / scaler_y.pkl and the serving code are shared with the LSTM.
+REGRESSOR_BACKENDS = ('gbt', 'mlp', 'ridge')
+
+
+def make_estimator(backend, random_state=42):
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.linear_model import Ridge
+    from sklearn.neural_network import MLPRegressor
+
+    if backend == 'gbt':
+        return HistGradientBoostingRegressor(max_iter=300, learning_rate=0.1, random_state=random_state)
+    if backend == 'mlp':
+        return MLPRegressor(hidden_layer_sizes=(64, 32), early_stopping=True, max_iter=200, random_state=random_state)
+    if backend == 'ridge':
+        return Ridge(alpha=1.0)
+    raise ValueError(f"Unknown regressor backend '{backend}'. Expected one of {REGRESSOR_BACKENDS}.")
+
+
+def regressor_filename(backend):
+    return f'solar_flare_peak_time_predictor_{backend}.joblib'
+
+
+class RegressorModel:
+    """
+    A scikit-learn regressor behind the same predict / evaluate / warmup interface as the LSTM
+    predictors. Inputs may be shaped (n, 1, n_features) like the LSTM's or (n, n_features);
+    predictions are returned as (n, 1) scaled offsets.
+    """
+
+    def __init__(self, estimator, backend, x_columns=X_COLUMNS):
+        self.estimator = estimator
+        self.backend = backend
+        self.x_columns = list(x_columns)
+        self.input_shape = (None, 1, len(self.x_columns))
+        self.warmup_seconds = None
+
+    def _flatten(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return X.reshape(len(X), -1)
+
+    def fit(self, X, y):
+        self.estimator.fit(self._flatten(X), np.asarray(y).ravel())
+        return self
+
+    def predict(self, X, batch_size=None, verbose=None):
+        return self.estimator.predict(self._flatten(X)).reshape(-1, 1)
+
+    def evaluate(self, X, y, verbose=None):
+        """Returns (mse, mae) on the scaled target, like Keras model.evaluate with metrics=['mae']."""
+        errors = self.predict(X).ravel() - np.asarray(y).ravel()
+        return float(np.mean(errors ** 2)), float(np.mean(np.abs(errors)))
+
+    def warmup(self, batch_sizes=(1, 32)):
+        started = time.perf_counter()
+        for size in batch_sizes:
+            self.predict(np.zeros((size,) + self.input_shape[1:]))
+        self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
+
+    def save(self, path):
+        import sklearn
+
+        joblib.dump({
+            "backend": self.backend,
+            "estimator": self.estimator,
+            "x_columns": self.x_columns,
+            "sklearn_version": sklearn.__version__
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        artifact = joblib.load(path)
+        if artifact["x_columns"] != X_COLUMNS:
+            raise ValueError(f"{path} was trained on columns {artifact['x_columns']}, expected {X_COLUMNS}.")
+        return cls(artifact["estimator"], artifact["backend"], artifact["x_columns"])
@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_loader import DEFAULT_CHUNK_SIZE, TARGET_COLUMN, IngestStats, iter_engineered_chunks
+from features import X_COLUMNS
+
+
+# 'none': one timeline of all flares; 'region': one timeline per active region (active.region.nb).
+SEQUENCE_GROUPS = ('none', 'region')
+# Regions whose history the server keeps; the least recently seen are dropped beyond this.
+DEFAULT_MAX_KEYS = 10000
+
+
+class FlareWindows:
+    """
+    Windows of the `window` flares ending at each row of `rows` (n, n_features), one timeline per
+    group of consecutive rows starting at the indices in `group_starts`. A flare with fewer than
+    window - 1 earlier flares in its group is padded at the front with copies of the group's first
+    flare, so windows never reach into another group. Only `rows` and a small per-row depth are
+    held, so memory is O(n) however long the window or small the groups. `view` is the strided
+    (n - window + 1, window, n_features) view of `rows`; take() copies only the requested windows.
+    """
+
+    def __init__(self, rows, window, group_starts=(0,)):
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}.")
+        self.rows = np.ascontiguousarray(rows)
+        self.window = window
+        starts = np.asarray(group_starts, dtype=np.int64)
+        first_rows = np.repeat(starts, np.diff(np.r_[starts, len(self.rows)]))
+        # Earlier flares available in the group, capped at window - 1.
+        self.depth = np.minimum(np.arange(len(self.rows)) - first_rows, window - 1).astype(np.int16)
+        self.view = sliding_window_view(self.rows, (window, self.rows.shape[1]))[:, 0] if len(self.rows) >= window else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def shape(self):
+        return (len(self.rows), self.window, self.rows.shape[1])
+
+    def take(self, indices):
+        """The (len(indices), window, n_features) windows ending at `indices`, as a new array."""
+        indices = np.asarray(indices, dtype=np.int64)
+        short = self.depth[indices] < self.window - 1
+        if self.view is None or short.all():
+            steps = indices[:, None] - (self.window - 1) + np.arange(self.window)
+            return self.rows[np.maximum(steps, (indices - self.depth[indices])[:, None])]
+        windows = self.view[np.maximum(indices - (self.window - 1), 0)]
+        if short.any():
+            windows[short] = self.take(indices[short])
+        return windows
+
+
+def group_starts_of(groups):
+    """Indices where a new group starts in an array of group ids that is sorted by group."""
+    if groups is None or not len(groups):
+        return np.zeros(1, dtype=np.int64)
+    groups = np.asarray(groups)
+    return np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+
+def load_sequence_arrays(data_path, chunksize=DEFAULT_CHUNK_SIZE, group_by='none'):
+    """
+    Reads the catalog through the chunked feature engineering into contiguous arrays sorted by
+    start_datetime (within each region for group_by='region'). Returns (X, y, group_starts).
+    """
+    if group_by not in SEQUENCE_GROUPS:
+        raise ValueError(f"Unknown sequence group '{group_by}'. Expected one of {SEQUENCE_GROUPS}.")
+
+    X_parts, y_parts, start_parts, region_parts = [], [], [], []
+    stats = IngestStats("sequences")
+    for engineered in iter_engineered_chunks(data_path, chunksize, stats, with_region=(group_by == 'region')):
+        X_parts.append(engineered[X_COLUMNS].to_numpy(dtype=np.float64))
+        y_parts.append(engineered[[TARGET_COLUMN]].to_numpy(dtype=np.float64))
+        start_parts.append(engineered['start_datetime'].to_numpy(dtype='datetime64[ns]').astype(np.int64))
+        if group_by == 'region':
+            region_parts.append(engineered['region'].to_numpy())
+
+    if stats.rows_kept == 0:
+        raise ValueError(f"No usable rows in {data_path} after feature engineering.")
+    X, y, start_ns = np.concatenate(X_parts), np.concatenate(y_parts), np.concatenate(start_parts)
+    if group_by == 'region':
+        regions = np.concatenate(region_parts)
+        order = np.lexsort((start_ns, regions))
+        return X[order], y[order], group_starts_of(regions[order])
+    order = np.argsort(start_ns, kind='stable')
+    return X[order], y[order], group_starts_of(None)
+
+
+def iter_window_batches(windows, y, indices, batch_size=64, shuffle=False, seed=42):
+    """Yields (X, y) batches for the rows in `indices` of a FlareWindows; only each batch's windows are copied."""
+    indices = np.asarray(indices)
+    if shuffle:
+        indices = np.random.default_rng(seed).permutation(indices)
+    for start in range(0, len(indices), batch_size):
+        batch = indices[start:start + batch_size]
+        yield windows.take(batch), y[batch]
+
+
+def make_window_dataset(windows, y, indices, batch_size=64, shuffle=False, seed=42):
+    """
+    Wraps iter_window_batches in a tf.data.Dataset for model.fit. With `shuffle`, each epoch uses
+    a new order.
+    """
+    import tensorflow as tf
+
+    _, window, n_features = windows.shape
+    epochs = iter(range(1 << 62))
+    return tf.data.Dataset.from_generator(
+        lambda: iter_window_batches(windows, y, indices, batch_size, shuffle, seed + next(epochs)),
+        output_signature=(
+            tf.TensorSpec(shape=(None, window, n_features), dtype=tf.float32),
+            tf.TensorSpec(shape=(None, 1), dtype=tf.float32)
+        )
+    ).prefetch(tf.data.AUTOTUNE)
+
+
+class SequenceHistory:
+    """
+    Rolling history of raw feature rows per region, for serving a model trained on windows of
+    `window` flares. windows() builds each new flare's window from the last window - 1 flares seen
+    under its key, in the order given, and then records the flares. Raw (unscaled) rows are kept,
+    so the history stays valid when a new model version is swapped in. With group_by='none' every
+    flare shares one history. At most `max_keys` regions are kept, least recently seen dropped first.
+    """
+
+    def __init__(self, window, group_by='none', max_keys=DEFAULT_MAX_KEYS):
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}.")
+        if group_by not in SEQUENCE_GROUPS:
+            raise ValueError(f"Unknown sequence group '{group_by}'. Expected one of {SEQUENCE_GROUPS}.")
+        self.window = window
+        self.group_by = group_by
+        self.max_keys = max_keys
+        self._histories = OrderedDict()
+        self._lock = threading.Lock()
+
+    def windows(self, features, regions=None):
+        """Returns (n, window, n_features) raw windows for `features` (n, n_features) and appends them to the history."""
+        features = np.asarray(features, dtype=np.float64)
+        if self.group_by == 'none' or regions is None:
+            keys = [None] * len(features)
+        else:
+            keys = [None if region is None else str(region) for region in regions]
+
+        rows_by_key = OrderedDict()
+        for index, key in enumerate(keys):
+            rows_by_key.setdefault(key, []).append(index)
+
+        result = np.empty((len(features), self.window, features.shape[1]))
+        with self._lock:
+            for key, indices in rows_by_key.items():
+                history = self._histories.pop(key, features[:0])
+                timeline = np.concatenate([history, features[indices]])
+                result[indices] = FlareWindows(timeline, self.window).take(np.arange(len(history), len(timeline)))
+                self._histories[key] = timeline[len(timeline) - (self.window - 1):].copy() if self.window > 1 else timeline[:0]
+                while len(self._histories) > self.max_keys:
+                    self._histories.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._histories.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"window": self.window, "group_by": self.group_by, "regions": len(self._histories), "max_regions": self.max_keys}
@@ -0,0 +1,180 @@
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from model_bundle import DEFAULT_BUNDLE_FILENAME, bundle_from_arrays, content_hash, read_bundle_arrays, read_bundle_manifest
+
+
+WEIGHT_FILE_MAGIC = b'MLWEIGHTS1\n'
+WEIGHT_FILE_PATTERN = 'ml-weights-*.bin'
+# Array offsets are aligned so every mapped array starts on a cache line.
+ALIGNMENT = 64
+# /dev/shm is a RAM-backed tmpfs, so a weight file there is a shared memory segment that outlives workers.
+DEFAULT_SHARED_WEIGHTS_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def weight_file_path(directory, manifest):
+    """Weight files are named by the bundle's content hash, so each bundle version gets its own file."""
+    return os.path.join(directory, f"ml-weights-{manifest['content_hash'][:16]}.bin")
+
+
+def write_weight_file(path, manifest, arrays):
+    """
+    Writes the bundle's arrays as one flat file: magic, header length, a JSON header (manifest
+    plus dtype, shape and offset of every array) and the raw array bytes. Like write_bundle, it is
+    written to a temporary file and renamed into place, so concurrent workers never map a partial file.
+    """
+    layout = {}
+    offset = 0
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header = json.dumps({"manifest": manifest, "arrays": layout}).encode('utf-8')
+    data_start = -(-(len(WEIGHT_FILE_MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.ml-weights-', suffix='.bin', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(WEIGHT_FILE_MAGIC + struct.pack('<Q', data_start) + header)
+            for name, entry in layout.items():
+                f.seek(data_start + entry["offset"])
+                f.write(np.ascontiguousarray(arrays[name]).tobytes())
+            f.truncate(data_start + offset)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def map_weight_file(path):
+    """
+    Maps a weight file read-only and returns (manifest, name -> array). The arrays are views
+    of the mapping, so every process that maps the same file shares the same physical pages.
+    """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapping[:len(WEIGHT_FILE_MAGIC)] != WEIGHT_FILE_MAGIC:
+        raise ValueError(f"{path} is not a shared weight file.")
+    header_start = len(WEIGHT_FILE_MAGIC) + 8
+    data_start = struct.unpack('<Q', mapping[len(WEIGHT_FILE_MAGIC):header_start])[0]
+    header = json.loads(bytes(mapping[header_start:data_start]).rstrip(b'\0').decode('utf-8'))
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(mapping, dtype=dtype, count=count, offset=data_start + entry["offset"]).reshape(entry["shape"])
+    return header["manifest"], arrays
+
+
+def ensure_weight_file(bundle_path, directory=DEFAULT_SHARED_WEIGHTS_DIR, rebuild=False):
+    """
+    Returns the weight file for the bundle's current version, creating it if no process has yet
+    (or replacing it, with `rebuild`). Only the writing process reads the whole bundle; the others
+    read its manifest and verify the mapped arrays (see load_shared_bundle).
+    """
+    manifest = read_bundle_manifest(bundle_path)
+    path = weight_file_path(directory, manifest)
+    if os.path.exists(path) and not rebuild:
+        return path
+
+    manifest, arrays = read_bundle_arrays(bundle_path, verify=True)
+    write_weight_file(path, manifest, arrays)
+    print(f"Wrote shared weight file {path} for bundle {manifest['version']}.")
+    return path
+
+
+def load_shared_bundle(bundle_path, directory=DEFAULT_SHARED_WEIGHTS_DIR):
+    """
+    Loads a bundle with its weights mapped from the shared weight file, so extra workers add
+    no private copy of the weights. Only the NumPy runtime can use mapped weights; TensorFlow
+    copies weights into its own tensors.
+    """
+    manifest = read_bundle_manifest(bundle_path)
+    path = ensure_weight_file(bundle_path, directory)
+    arrays = map_verified_arrays(path, manifest)
+    if arrays is None:
+        # A stale, corrupt or foreign file under this version's name: replace it from the verified bundle.
+        print(f"Warning: shared weight file {path} does not match {bundle_path}; rebuilding it.")
+        path = ensure_weight_file(bundle_path, directory, rebuild=True)
+        arrays = map_verified_arrays(path, manifest)
+        if arrays is None:
+            raise ValueError(f"Shared weight file {path} does not match {bundle_path} after rebuilding it.")
+    bundle = bundle_from_arrays(bundle_path, manifest, arrays, runtime='numpy')
+    bundle.weights_path = path
+    return bundle
+
+
+def map_verified_arrays(path, manifest):
+    """
+    Maps a weight file and returns its arrays if they hash to the bundle manifest's content_hash,
+    or None. The file's own header is not trusted: the hash is recomputed over the mapped bytes,
+    which reads the shared pages without making private copies.
+    """
+    _, arrays = map_weight_file(path)
+    if content_hash(manifest, arrays) != manifest["content_hash"]:
+        return None
+    return arrays
+
+
+def remove_weight_file(path):
+    """Deletes a weight file that is no longer served. Processes that still map it keep their mapping."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def process_memory(pid='self'):
+    """
+    RSS, PSS and USS (private) bytes of a process from /proc/<pid>/smaps_rollup, or None where that
+    is unavailable. PSS splits shared pages between the processes that map them, so the PSS of
+    all workers adds up to their real footprint; USS is what one more worker costs.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get('Rss', 0),
+        "pss": fields.get('Pss', 0),
+        "uss": fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create, inspect or prune the shared weight files served with ML_SHARED_WEIGHTS=1.")
+    parser.add_argument('--bundle-path', default=DEFAULT_BUNDLE_FILENAME)
+    parser.add_argument('--dir', default=DEFAULT_SHARED_WEIGHTS_DIR)
+    parser.add_argument('--prune', action='store_true', help="Delete weight files in --dir that do not belong to the current bundle.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    current = ensure_weight_file(args.bundle_path, args.dir)
+    print(f"{current}: {os.path.getsize(current) / 1024:.1f} KB (ready in {(time.perf_counter() - started) * 1000:.1f} ms)")
+    if args.prune:
+        for path in glob.glob(os.path.join(args.dir, WEIGHT_FILE_PATTERN)):
+            if path != current:
+                remove_weight_file(path)
+                print(f"Removed {path}")
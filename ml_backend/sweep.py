@@ -0,0 +1,232 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+import joblib
+import numpy as np
+
+from features import X_COLUMNS
+
+
+# Parameter -> candidate values. The defaults of build_lstm_model are 128/64 units, 0.3 dropout, adam, batch 64.
+SEARCH_SPACE = {
+    'lstm1_units': [64, 128, 256],
+    'lstm2_units': [32, 64, 128],
+    'dropout': [0.1, 0.2, 0.3, 0.5],
+    'optimizer': ['adam', 'rmsprop', 'nadam'],
+    'batch_size': [32, 64, 128, 256]
+}
+
+DATA_ARRAYS = ('X_train', 'y_train', 'X_test', 'y_test')
+RESULT_COLUMNS = [
+    'trial', 'lstm1_units', 'lstm2_units', 'dropout', 'optimizer', 'batch_size',
+    'test_mae_seconds', 'best_val_loss', 'epochs_trained', 'train_seconds', 'trial_seconds',
+    'worker_pid', 'cpus', 'error'
+]
+
+
+def grid_trials(space):
+    """Every combination of the search space, as a list of parameter dicts."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_trials(space, n_trials, seed=42):
+    """`n_trials` distinct random combinations (fewer if the grid is smaller), reproducible for a seed."""
+    names = list(space)
+    grid_size = int(np.prod([len(space[name]) for name in names]))
+    rng = random.Random(seed)
+    trials, seen = [], set()
+    while len(trials) < min(n_trials, grid_size):
+        values = tuple(rng.choice(space[name]) for name in names)
+        if values not in seen:
+            seen.add(values)
+            trials.append(dict(zip(names, values)))
+    return trials
+
+
+def cpu_slices(n_workers, threads_per_worker=None):
+    """Splits the CPUs this process may use into one slice per worker (wrapping around if oversubscribed)."""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    threads_per_worker = threads_per_worker or max(1, len(cpus) // n_workers)
+    return [[cpus[(worker * threads_per_worker + i) % len(cpus)] for i in range(threads_per_worker)] for worker in range(n_workers)]
+
+
+def write_sweep_data(data, data_dir):
+    """Saves the scaled train/test split once as .npy files that every worker memory-maps."""
+    os.makedirs(data_dir, exist_ok=True)
+    for name in DATA_ARRAYS:
+        np.save(os.path.join(data_dir, f'{name}.npy'), np.ascontiguousarray(data[name], dtype=np.float32))
+    joblib.dump(data["scaler_y"], os.path.join(data_dir, 'scaler_y.pkl'))
+    return data_dir
+
+
+# Per-worker state, set up once by _init_worker.
+_worker = {}
+
+
+def _init_worker(slice_queue, data_dir):
+    cpus = slice_queue.get()
+    threads = str(len(cpus))
+    # Must be set before TensorFlow is imported in this process.
+    os.environ['OMP_NUM_THREADS'] = threads
+    os.environ['TF_NUM_INTRAOP_THREADS'] = threads
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            print(f"Warning: could not pin worker {os.getpid()} to CPUs {cpus}: {e}")
+
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(len(cpus))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    _worker["cpus"] = cpus
+    _worker["data"] = {name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r') for name in DATA_ARRAYS}
+    _worker["scaler_y"] = joblib.load(os.path.join(data_dir, 'scaler_y.pkl'))
+
+
+def run_trial(trial_id, params, epochs=200, patience=15, validation_split=0.2, seed=42):
+    """Trains and evaluates one configuration inside a worker. Failures are recorded, not raised."""
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from sklearn.metrics import mean_absolute_error
+    from ml_model import build_lstm_model
+
+    started = time.perf_counter()
+    result = dict(params, trial=trial_id, worker_pid=os.getpid(), cpus=' '.join(map(str, _worker["cpus"])), error='')
+    try:
+        tf.keras.utils.set_random_seed(seed + trial_id)
+        data = _worker["data"]
+        model = build_lstm_model(
+            (1, len(X_COLUMNS)), lstm1_units=params['lstm1_units'], lstm2_units=params['lstm2_units'],
+            dropout=params['dropout'], optimizer=params['optimizer']
+        )
+        early_stopping = EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+
+        history = model.fit(
+            data["X_train"], data["y_train"],
+            epochs=epochs,
+            batch_size=params['batch_size'],
+            validation_split=validation_split,
+            callbacks=[early_stopping],
+            verbose=0
+        )
+        result["train_seconds"] = time.perf_counter() - started
+        result["epochs_trained"] = len(history.history['loss'])
+        result["best_val_loss"] = float(min(history.history['val_loss']))
+
+        y_pred = model.predict(data["X_test"], batch_size=4096, verbose=0)
+        scaler_y = _worker["scaler_y"]
+        result["test_mae_seconds"] = float(mean_absolute_error(scaler_y.inverse_transform(data["y_test"]), scaler_y.inverse_transform(y_pred)))
+        tf.keras.backend.clear_session()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["trial_seconds"] = time.perf_counter() - started
+    return result
+
+
+def _sort_key(column):
+    return lambda row: (row.get(column) is None or row.get(column) == '', row.get(column) or 0)
+
+
+def write_results(results, path):
+    """Writes the results table ranked by test MAE (failed trials last)."""
+    ranked = sorted(results, key=_sort_key('test_mae_seconds'))
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['rank'] + RESULT_COLUMNS)
+        writer.writeheader()
+        for rank, row in enumerate(ranked, start=1):
+            writer.writerow(dict({column: row.get(column, '') for column in RESULT_COLUMNS}, rank=rank))
+    return ranked
+
+
+def print_ranking(results, column, top=5):
+    print(f"\nTop {top} trials by {column}:")
+    for row in sorted((row for row in results if not row['error']), key=_sort_key(column))[:top]:
+        print(f"  trial {row['trial']:>3}: MAE {row['test_mae_seconds']:.2f} s, {row['trial_seconds']:.1f} s/trial, "
+              f"units {row['lstm1_units']}/{row['lstm2_units']}, dropout {row['dropout']}, "
+              f"{row['optimizer']}, batch {row['batch_size']}")
+
+
+def run_sweep(data, trials, output_dir='sweep_results', n_workers=None, threads_per_worker=None,
+              epochs=200, patience=15, validation_split=0.2, seed=42):
+    """
+    Runs `trials` (parameter dicts) in a process pool of `n_workers` spawned workers, each pinned to
+    its own slice of CPUs. The scaled split in `data` is written once under output_dir/data and
+    memory-mapped by every worker. Results are written to output_dir/results.csv as trials finish
+    and ranked by test MAE at the end. Returns the ranked result rows.
+    """
+    n_workers = n_workers or max(1, min(len(trials), os.cpu_count() or 1))
+    os.makedirs(output_dir, exist_ok=True)
+    data_dir = write_sweep_data(data, os.path.join(output_dir, 'data'))
+    results_path = os.path.join(output_dir, 'results.csv')
+
+    context = multiprocessing.get_context('spawn')
+    slice_queue = context.Queue()
+    for cpus in cpu_slices(n_workers, threads_per_worker):
+        slice_queue.put(cpus)
+
+    print(f"--- Running {len(trials)} trials on {n_workers} workers ---")
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_init_worker,
+                             initargs=(slice_queue, data_dir)) as executor:
+        futures = [executor.submit(run_trial, trial_id, params, epochs, patience, validation_split, seed)
+                   for trial_id, params in enumerate(trials)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            write_results(results, results_path)
+            if result['error']:
+                print(f"Trial {result['trial']} failed: {result['error']}")
+            else:
+                print(f"Trial {result['trial']} ({len(results)}/{len(trials)}): MAE {result['test_mae_seconds']:.2f} s "
+                      f"in {result['trial_seconds']:.1f} s on CPUs {result['cpus']}")
+
+    ranked = write_results(results, results_path)
+    print(f"\nSweep finished in {time.perf_counter() - started:.1f} s. Results saved to '{results_path}'")
+    print_ranking(ranked, 'test_mae_seconds')
+    print_ranking(ranked, 'trial_seconds')
+    return ranked
+
+
+def main(argv=None):
+    from ml_model import TrainConfig, prepare_data
+
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for build_lstm_model.")
+    parser.add_argument('--data-path', default='solar_flare_dataset.csv')
+    parser.add_argument('--output-dir', default='sweep_results')
+    parser.add_argument('--loader', choices=('memory', 'feature_store'), default='memory')
+    parser.add_argument('--search', choices=('grid', 'random'), default='random')
+    parser.add_argument('--trials', type=int, default=20, help="Number of trials for random search.")
+    parser.add_argument('--space', help="JSON file with a search space overriding SEARCH_SPACE entries.")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel trials (default: one per CPU).")
+    parser.add_argument('--threads-per-worker', type=int, default=None, help="CPU threads per worker (default: CPUs / workers).")
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--patience', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    space = dict(SEARCH_SPACE)
+    if args.space:
+        with open(args.space) as f:
+            space.update(json.load(f))
+    trials = grid_trials(space) if args.search == 'grid' else random_trials(space, args.trials, args.seed)
+
+    config = TrainConfig(data_path=args.data_path, loader=args.loader, random_state=args.seed)
+    data = prepare_data(config)
+    run_sweep(data, trials, args.output_dir, args.workers, args.threads_per_worker,
+              args.epochs, args.patience, config.validation_split, args.seed)
+
+
+if __name__ == '__main__':
+    main()
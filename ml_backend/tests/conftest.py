@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the ml_backend modules directly, the same way the scripts are run.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import ar_evolution
+import ml_backend_server as server
+from bench_ar_evolution import synthetic_regions
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = str(tmp_path / ar_evolution.DEFAULT_AR_MODEL_FILENAME)
+    ar_evolution.train_ar_model(*synthetic_regions(600), output_path=path)
+    return path
+
+
+def test_vectorized_scoring_matches_row_by_row_and_handles_two_classes(model_path):
+    model = ar_evolution.load_ar_model(model_path)
+    X, labels = synthetic_regions(600)
+
+    predicted, probabilities = model.classify(X)
+    np.testing.assert_allclose(probabilities.sum(axis=1), 1.0)
+    assert list(model.classes) == ['decaying', 'growing', 'stable']
+    assert model.manifest["metrics"]["accuracy"] > 0.6
+    assert [model.classify(X[i:i + 1])[0][0] for i in range(20)] == list(predicted[:20])
+
+    # A binary fit is stored as two logits, the first fixed at zero.
+    binary_path = model_path.replace('.npz', '_binary.npz')
+    binary = labels != 'stable'
+    ar_evolution.train_ar_model(X[binary], labels[binary], output_path=binary_path)
+    assert ar_evolution.load_ar_model(binary_path).predict_proba(X).shape == (600, 2)
+
+    with pytest.raises(ValueError):
+        ar_evolution.train_ar_model(X, np.full(600, 'stable'), output_path=binary_path)
+
+
+def test_endpoints_score_regions_with_their_own_model(model_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'ar_model_loader', ar_evolution.ArModelLoader(str(tmp_path / 'missing.npz')))
+    client = server.app.test_client()
+    query = '/api/classify_ar_evolution?magnetic_flux_change=2.5&area_change=1.0&gradient_value=1.0'
+    response = client.get(query)
+    assert response.status_code == 503
+    assert "not trained" in response.get_json()["error"]
+    assert client.post('/api/classify_ar_evolution/batch', json=[]).status_code == 503
+
+    corrupt_path = tmp_path / 'corrupt.npz'
+    corrupt_path.write_bytes(b'not a model')
+    monkeypatch.setattr(server, 'ar_model_loader', ar_evolution.ArModelLoader(str(corrupt_path)))
+    assert client.get(query).status_code == 500
+
+    monkeypatch.setattr(server, 'ar_model_loader', ar_evolution.ArModelLoader(model_path))
+    single = client.get(query + '&active_region_id=13664').get_json()
+    assert single["predicted_evolution"] == 'growing'
+    assert single["active_region_id"] == '13664'
+    assert client.get('/api/classify_ar_evolution?area_change=1').status_code == 400
+
+    records = [{"active_region_id": 1, "magnetic_flux_change": 2.5, "area_change": 1.0, "gradient_value": 1.0},
+               {"active_region_id": 2, "magnetic_flux_change": -2.5, "area_change": -1.0, "gradient_value": 0.5},
+               {"active_region_id": 3, "magnetic_flux_change": "up", "area_change": 0, "gradient_value": 0},
+               {"area_change": 0, "gradient_value": 0}]
+    body = client.post('/api/classify_ar_evolution/batch', json=records).get_json()
+    assert body["count"] == 4 and body["error_count"] == 2
+    assert [result.get("predicted_evolution") for result in body["results"]] == ['growing', 'decaying', None, None]
+    assert body["results"][0]["probabilities"]["growing"] == pytest.approx(single["probabilities"]["growing"])
+    assert client.post('/api/classify_ar_evolution/batch', json={"regions": records}).status_code == 400
+    assert client.get('/api/ml_predict/stats').get_json()["ar_evolution"]["version"] == body["model_version"]
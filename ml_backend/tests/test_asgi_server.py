@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+import ml_backend_server as server
+from asgi_server import BoundedWSGIApp
+from test_batch_prediction import DurationModel, make_record
+
+
+async def asgi_request(app, method, path, body=b'', headers=()):
+    """Sends one HTTP request through an ASGI app; returns (status, headers dict, body)."""
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + list(headers),
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 5000), 'scheme': 'http', 'http_version': '1.1'
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start, response_body = messages
+    return start['status'], {name.decode(): value.decode() for name, value in start['headers']}, response_body['body']
+
+
+def blocking_wsgi_app(release):
+    def wsgi_app(environ, start_response):
+        if environ['PATH_INFO'] != '/healthz':
+            release.wait(5)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'done']
+    return wsgi_app
+
+
+def test_flask_contract_is_unchanged(monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, size=(50, 12))
+    X[:, 0] = np.linspace(0, 7200, 50)
+    components = server.ModelComponents(DurationModel(), MinMaxScaler().fit(X), MinMaxScaler().fit(X[:, :1]), None)
+    monkeypatch.setattr(server, 'ml_components', components)
+    payload = [make_record(), {}]
+
+    app = BoundedWSGIApp(server.app, threads=2, max_queue=2)
+    status, headers, body = asyncio.run(asgi_request(app, 'POST', '/api/ml_predict/batch', json.dumps(payload).encode()))
+    expected = server.app.test_client().post('/api/ml_predict/batch', json=payload)
+
+    assert status == expected.status_code == 200
+    assert headers['content-type'] == 'application/json'
+    body, expected_body = json.loads(body), expected.get_json()
+    body.pop('timestamp'), expected_body.pop('timestamp')
+    assert body == expected_body
+
+
+def test_requests_beyond_the_queue_are_rejected_immediately():
+    release = threading.Event()
+    app = BoundedWSGIApp(blocking_wsgi_app(release), threads=1, max_queue=1, queue_timeout=5, retry_after=2)
+
+    async def scenario():
+        running = asyncio.ensure_future(asgi_request(app, 'POST', '/api/ml_predict'))
+        queued = asyncio.ensure_future(asgi_request(app, 'POST', '/api/ml_predict'))
+        await asyncio.sleep(0.05)
+        rejected = await asgi_request(app, 'POST', '/api/ml_predict')
+        probe = await asgi_request(app, 'GET', '/healthz')
+        release.set()
+        return await running, await queued, rejected, probe
+
+    running, queued, rejected, probe = asyncio.run(scenario())
+
+    assert running[0] == queued[0] == 200
+    assert rejected[0] == 503
+    assert rejected[1]['retry-after'] == '2'
+    assert json.loads(rejected[2])['queue_depth'] == 1
+    # Probes bypass admission control while the pool is saturated.
+    assert probe[0] == 200
+    assert app.admission.stats()["rejected_queue_full"] == 1
+    assert app.admission.stats()["admitted"] == 2
+
+
+def test_queued_requests_time_out_with_configured_status():
+    release = threading.Event()
+    app = BoundedWSGIApp(blocking_wsgi_app(release), threads=1, max_queue=4, queue_timeout=0.05, reject_status=429)
+
+    async def scenario():
+        running = asyncio.ensure_future(asgi_request(app, 'POST', '/api/ml_predict'))
+        await asyncio.sleep(0.01)
+        timed_out = await asgi_request(app, 'POST', '/api/ml_predict')
+        release.set()
+        return await running, timed_out
+
+    running, timed_out = asyncio.run(scenario())
+
+    assert running[0] == 200
+    assert timed_out[0] == 429
+    assert app.admission.stats()["rejected_timeout"] == 1
+    assert app.admission.in_flight == 0
+
+
+def test_streaming_paths_pass_bodies_through_in_pieces():
+    def echo_lines_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return iter(environ['wsgi.input'].readline, b'')
+
+    app = BoundedWSGIApp(echo_lines_app, threads=1, max_queue=1, streaming_paths=('/stream',))
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': '/stream', 'query_string': b'', 'root_path': '',
+        'headers': [(b'content-type', b'text/csv')], 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)
+    }
+    body_parts = [b'a\nb', b'\nc\n', b'd\n']
+    received = []
+    messages = []
+
+    async def receive():
+        received.append(len(messages))
+        part = body_parts[len(received) - 1]
+        return {'type': 'http.request', 'body': part, 'more_body': len(received) < len(body_parts)}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+
+    assert messages[0]['status'] == 200
+    assert [message['body'] for message in messages[1:]] == [b'a\n', b'b\n', b'c\n', b'd\n', b'']
+    assert not messages[-1].get('more_body', False)
+    # Later parts of the body were only received after earlier lines had been sent back.
+    assert received == [1, 2, 4]
+    assert app.admission.in_flight == 0
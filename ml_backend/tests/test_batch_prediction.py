@@ -0,0 +1,148 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+import ml_backend_server as server
+
+
+class DurationModel:
+    """Stand-in for the LSTM that predicts the scaled duration as the scaled offset."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, X, batch_size=None, verbose=None):
+        self.calls += 1
+        return X[:, 0, :1]
+
+
+def make_record(**overrides):
+    record = {
+        'total_counts': 50000, 'x_pos_asec': 100, 'y_pos_asec': -200,
+        'start_hour': 21, 'start_minute': 29, 'start_second': 56,
+        'end_hour': 21, 'end_minute': 41, 'end_second': 48
+    }
+    record.update(overrides)
+    return record
+
+
+@pytest.fixture
+def scalers():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, size=(50, 12))
+    X[:, 0] = np.linspace(0, 7200, 50)
+    scaler_X = MinMaxScaler().fit(X)
+    scaler_y = MinMaxScaler().fit(np.linspace(0, 7200, 50).reshape(-1, 1))
+    return scaler_X, scaler_y
+
+
+def test_batch_prediction_runs_one_inference_and_matches_single(scalers):
+    scaler_X, scaler_y = scalers
+    model = DurationModel()
+    records = [make_record(), make_record(end_minute=59), make_record(start_hour=2, end_hour=3)]
+
+    results = server.make_batch_prediction(model, scaler_X, scaler_y, records)
+
+    assert model.calls == 1
+    assert [result["index"] for result in results] == [0, 1, 2]
+    for record, result in zip(records, results):
+        single = server.make_prediction(DurationModel(), scaler_X, scaler_y, record)
+        assert result["success"]
+        assert result["prediction"] == pytest.approx(single["predicted_offset_seconds"])
+        assert result["predicted_peak_time"] == single["predicted_peak_time"]
+
+
+def test_batch_prediction_reports_errors_per_row(scalers):
+    scaler_X, scaler_y = scalers
+    records = [make_record(), {'total_counts': 1}, make_record(start_hour=25), make_record(x_pos_asec="left")]
+
+    results = server.make_batch_prediction(DurationModel(), scaler_X, scaler_y, records)
+
+    assert results[0]["success"]
+    assert [result["success"] for result in results[1:]] == [False, False, False]
+    assert "Missing required input features" in results[1]["error"]
+    assert "start_hour" in results[2]["error"]
+    assert "x_pos_asec" in results[3]["error"]
+
+
+def test_batch_endpoint(monkeypatch, scalers):
+    scaler_X, scaler_y = scalers
+    monkeypatch.setattr(server, 'ml_components', server.ModelComponents(DurationModel(), scaler_X, scaler_y, None))
+    client = server.app.test_client()
+
+    response = client.post('/api/ml_predict/batch', json=[make_record(), {}])
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body["count"] == 2
+    assert body["error_count"] == 1
+
+    response = client.post('/api/ml_predict/batch', json=make_record())
+    assert response.status_code == 400
+
+
+def test_batch_prediction_only_scores_cache_misses(scalers):
+    from prediction_cache import InProcessCacheBackend, PredictionCache
+
+    scaler_X, scaler_y = scalers
+    cache = PredictionCache(InProcessCacheBackend())
+    model = DurationModel()
+    server.make_batch_prediction(model, scaler_X, scaler_y, [make_record()], cache=cache, model_version='v1')
+
+    results = server.make_batch_prediction(model, scaler_X, scaler_y, [make_record(), make_record()], cache=cache, model_version='v1')
+
+    assert model.calls == 1
+    assert all(result["success"] for result in results)
+    assert cache.stats()["hits"] == 2
+
+
+def test_micro_batch_scores_each_request_with_its_own_snapshot(scalers):
+    import threading
+
+    from micro_batcher import MicroBatcher
+
+    class DoubledModel(DurationModel):
+        def predict(self, X, batch_size=None, verbose=None):
+            return super().predict(X) * 2
+
+    scaler_X, scaler_y = scalers
+    old_model, new_model = DurationModel(), DoubledModel()
+    batcher = MicroBatcher(server._predict_feature_rows, max_batch_size=4, max_wait_ms=500)
+    results = {}
+
+    def predict(name, model):
+        results[name] = server.make_prediction(model, scaler_X, scaler_y, make_record(), batcher=batcher)["predicted_offset_seconds"]
+
+    # Requests from before and after a reload land in the same flush.
+    threads = [threading.Thread(target=predict, args=(name, model))
+               for name, model in (('old', old_model), ('new', new_model), ('old2', old_model), ('new2', new_model))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.stop(timeout=5)
+
+    expected = server.make_prediction(DurationModel(), scaler_X, scaler_y, make_record())["predicted_offset_seconds"]
+    assert batcher.stats()["batches"] == 1
+    assert (old_model.calls, new_model.calls) == (1, 1)
+    assert results["old"] == results["old2"] == pytest.approx(expected)
+    assert results["new"] == results["new2"] != pytest.approx(expected)
+
+
+def test_invalid_requests_are_client_errors(monkeypatch, scalers):
+    scaler_X, scaler_y = scalers
+    monkeypatch.setattr(server, 'ml_components', server.ModelComponents(DurationModel(), scaler_X, scaler_y, None))
+    client = server.app.test_client()
+    # Python's json reads and writes NaN and Infinity, so they reach the server as floats.
+    nan_record = json.dumps(make_record(total_counts=float('nan')))
+
+    assert client.post('/api/ml_predict', json=[make_record()]).status_code == 400
+    assert client.post('/api/ml_predict', data='not json', content_type='application/json').status_code == 400
+    response = client.post('/api/ml_predict', data=nan_record, content_type='application/json')
+    assert response.status_code == 400
+    assert "total_counts" in response.get_json()["error"]
+
+    results = client.post('/api/ml_predict/batch', data=f'[{nan_record}]', content_type='application/json').get_json()["results"]
+    assert not results[0]["success"] and "finite" in results[0]["error"]
@@ -0,0 +1,106 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+import bulk_scoring
+import ml_backend_server as server
+from data_loader import IngestStats
+from test_batch_prediction import DurationModel
+
+
+CATALOG_CSV = """flare,start.date,start.time,peak,end,duration.s,total.counts,x.pos.asec,y.pos.asec
+0,2006-05-14,09:20:27,09:21:25,09:29:11,524,140288,519,432
+1,2005-04-19,10:55:18,11:15:58,11:37:00,2502,700109,-927,724
+2,2004-09-01,bad,19:48:02,19:55:00,500,1000,0,0
+3,2004-09-01,19:46:40,,19:55:00,500,1000,0,0
+4,2002-04-27,18:38:25,18:40:00,18:58:25,1200,5000,-10,20
+"""
+
+
+def duration_predictor():
+    """Predicts each flare's duration as its peak offset, so expected values are easy to state."""
+    X = np.zeros((2, 12))
+    X[:, 0] = (0, 7200)
+    return bulk_scoring.offset_predictor(DurationModel(), MinMaxScaler().fit(X), MinMaxScaler().fit(X[:, :1]), batch_size=2)
+
+
+def use_duration_model(monkeypatch):
+    X = np.zeros((2, 12))
+    X[:, 0] = (0, 7200)
+    components = server.ModelComponents(DurationModel(), MinMaxScaler().fit(X), MinMaxScaler().fit(X[:, :1]), None)
+    monkeypatch.setattr(server, 'ml_components', components)
+
+
+def test_csv_catalog_is_scored_in_chunks_with_row_errors():
+    stats = IngestStats('test')
+    chunks = bulk_scoring.read_csv_chunks(io.StringIO(CATALOG_CSV), chunk_size=2)
+
+    results = pd.concat(list(bulk_scoring.score_chunks(chunks, duration_predictor(), stats)))
+
+    assert results['row'].tolist() == [0, 1, 2, 3, 4]
+    assert stats.rows_read == 5 and stats.rows_kept == 4 and stats.chunks == 3
+    scored = results.set_index('row')
+    np.testing.assert_allclose(scored.loc[[0, 1, 3, 4], 'predicted_offset_seconds'], [524, 2502, 500, 1200], atol=1e-6)
+    assert scored.loc[0, 'predicted_peak_time'] == '2006-05-14 09:29:11'
+    assert scored.loc[0, 'actual_offset_seconds'] == 58
+    # A missing peak does not stop a row from being scored, it only leaves the actual offset empty.
+    assert np.isnan(scored.loc[3, 'actual_offset_seconds'])
+    assert scored.loc[2, 'error'] == "Unparsable times or missing features."
+
+
+def test_non_finite_features_are_row_errors():
+    catalog = CATALOG_CSV.replace('524,140288', '524,inf')
+    results = pd.concat(list(bulk_scoring.score_chunks(bulk_scoring.read_csv_chunks(io.StringIO(catalog)), duration_predictor())))
+
+    assert results.set_index('row').loc[0, 'error'] == "Unparsable times or missing features."
+    assert np.isfinite(results['predicted_offset_seconds'].dropna()).all()
+
+
+def test_ndjson_lines_are_split_across_reads_and_bad_lines_reported():
+    records = pd.read_csv(io.StringIO(CATALOG_CSV), dtype=str).drop(columns=['peak']).to_dict('records')
+    body = '\n'.join([json.dumps(records[0]), 'not json', '', json.dumps(records[1])]).encode()
+
+    lines = list(bulk_scoring.iter_stream_lines(io.BytesIO(body), block_size=7))
+    results = pd.concat(list(bulk_scoring.score_chunks(bulk_scoring.read_ndjson_chunks(lines, chunk_size=10), duration_predictor())))
+
+    assert results['row'].tolist() == [0, 1, 2]
+    assert results['error'].tolist()[1] == "Line is not a JSON object."
+    np.testing.assert_allclose(results['predicted_offset_seconds'].to_numpy()[[0, 2]], [524, 2502], atol=1e-6)
+
+
+def test_stream_endpoint_returns_predictions_and_summary(monkeypatch):
+    use_duration_model(monkeypatch)
+    monkeypatch.setattr(server, 'BULK_CHUNK_SIZE', 2)
+    client = server.app.test_client()
+
+    response = client.post('/api/ml_predict/stream', data=CATALOG_CSV, content_type='text/csv', query_string={'output': 'ndjson'})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert [line['row'] for line in lines[:-1]] == [0, 1, 2, 3, 4]
+    assert lines[-1]["summary"]["rows"] == 5 and lines[-1]["summary"]["scored"] == 4
+
+    response = client.post('/api/ml_predict/stream', data=CATALOG_CSV, content_type='text/csv')
+    text = response.get_data(as_text=True)
+    scored = pd.read_csv(io.StringIO(text), comment='#')
+
+    assert response.mimetype == 'text/csv'
+    assert scored.columns.tolist() == bulk_scoring.OUTPUT_COLUMNS
+    assert len(scored) == 5
+    assert text.splitlines()[-1].startswith('# rows=5 scored=4 errors=1')
+
+
+def test_stream_endpoint_reports_a_bad_upload_in_the_body(monkeypatch):
+    use_duration_model(monkeypatch)
+    client = server.app.test_client()
+
+    response = client.post('/api/ml_predict/stream', data='flare,start.date\n0,2006-05-14\n', content_type='text/csv')
+    lines = response.get_data(as_text=True).splitlines()
+
+    assert response.status_code == 200
+    assert lines[1].startswith('# error=Failed to score the upload: Catalog is missing required columns')
+    assert lines[-1].startswith('# rows=0')
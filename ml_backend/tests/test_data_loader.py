@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+from data_loader import (
+    TARGET_COLUMN, TEST, TRAIN, VALIDATION,
+    assign_splits, fit_scalers_streaming, iter_engineered_chunks, iter_training_batches
+)
+from features import X_COLUMNS
+
+
+@pytest.fixture
+def dataset_path(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 500
+    # Start times stay clear of midnight so no peak rolls over into the next day.
+    start = (pd.Timestamp('2002-02-12') + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+             + pd.to_timedelta(rng.integers(0, 80_000, n), unit='s'))
+    duration = rng.integers(60, 3000, n)
+    df = pd.DataFrame({
+        'flare': np.arange(n),
+        'start.date': start.strftime('%Y-%m-%d'),
+        'start.time': start.strftime('%H:%M:%S'),
+        'peak': (start + pd.to_timedelta(duration // 3, unit='s')).strftime('%H:%M:%S'),
+        'end': (start + pd.to_timedelta(duration, unit='s')).strftime('%H:%M:%S'),
+        'duration.s': duration,
+        'total.counts': rng.integers(1000, 10**6, n),
+        'x.pos.asec': rng.integers(-1000, 1000, n),
+        'y.pos.asec': rng.integers(-1000, 1000, n),
+        'energy.kev': '6-12'
+    })
+    df.loc[3, 'start.time'] = 'not a time'
+    path = tmp_path / 'solar_flare_dataset.csv'
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_chunked_engineering_is_independent_of_chunk_size(dataset_path):
+    whole = pd.concat(iter_engineered_chunks(dataset_path, chunksize=10_000))
+    chunked = pd.concat(iter_engineered_chunks(dataset_path, chunksize=64))
+
+    assert len(whole) == 499
+    assert 3 not in whole.index
+    pd.testing.assert_frame_equal(whole, chunked)
+    assert (whole[TARGET_COLUMN] >= 0).all()
+    assert not whole[X_COLUMNS].isna().any().any()
+
+
+def test_streaming_scalers_match_full_fit(dataset_path):
+    scaler_X, scaler_y, stats = fit_scalers_streaming(dataset_path, chunksize=50)
+    whole = pd.concat(iter_engineered_chunks(dataset_path))
+
+    np.testing.assert_allclose(scaler_X.data_min_, MinMaxScaler().fit(whole[X_COLUMNS]).data_min_)
+    np.testing.assert_allclose(scaler_y.data_max_, whole[TARGET_COLUMN].max())
+    assert stats.rows_read == 500
+    assert stats.rows_kept == 499
+    assert stats.rows_per_second > 0
+
+
+def test_splits_are_deterministic_and_disjoint(dataset_path):
+    splits = assign_splits(np.arange(10_000))
+    assert np.array_equal(splits, assign_splits(np.arange(10_000)))
+    assert abs((splits == TEST).mean() - 0.2) < 0.02
+    assert abs((splits == VALIDATION).mean() - 0.16) < 0.02
+
+    scaler_X, scaler_y, _ = fit_scalers_streaming(dataset_path, chunksize=100)
+    sizes = []
+    for split in (TRAIN, VALIDATION, TEST):
+        batches = list(iter_training_batches(dataset_path, scaler_X, scaler_y, split, batch_size=32, chunksize=100))
+        assert all(X.shape[1:] == (1, len(X_COLUMNS)) and len(X) == len(y) for X, y in batches)
+        sizes.append(sum(len(X) for X, _ in batches))
+    assert sum(sizes) == 499
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+import export_model
+import ml_backend_server as server
+from exported_runtime import IdentityScaler, exported_model_version, load_exported_model
+from features import X_COLUMNS
+from model_bundle import load_bundle
+
+
+ML_BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+BUNDLE_PATH = os.path.join(ML_BACKEND_DIR, 'model_bundle.npz')
+
+
+@pytest.fixture(scope='module')
+def keras_components():
+    return export_model.load_keras_components(bundle_path=BUNDLE_PATH)
+
+
+@pytest.fixture(scope='module')
+def onnx_support():
+    pytest.importorskip('tf2onnx')
+    pytest.importorskip('onnxruntime')
+
+
+@pytest.fixture(scope='module')
+def raw_features(keras_components):
+    _, scaler_X, _ = keras_components
+    return scaler_X.inverse_transform(np.random.default_rng(0).uniform(0, 1, size=(200, len(X_COLUMNS)))).astype(np.float32)
+
+
+def test_tflite_export_matches_keras_on_raw_features(tmp_path, keras_components, raw_features):
+    path = export_model.export_tflite(*keras_components, path=str(tmp_path / 'model.tflite'))
+    exported = load_exported_model(path)
+
+    assert export_model.check_parity(exported, *keras_components, raw_features) < 0.01
+    # The server passes (n, 1, n_features) inputs; predictions are the same either way.
+    np.testing.assert_array_equal(exported.predict(raw_features[:7].reshape(7, 1, -1)), exported.predict(raw_features[:7]))
+    assert exported.predict(raw_features[:1]).shape == (1, 1)
+
+
+def test_onnx_export_matches_keras_on_raw_features(tmp_path, onnx_support, keras_components, raw_features):
+    path = export_model.export_onnx(*keras_components, path=str(tmp_path / 'model.onnx'))
+    exported = load_exported_model(path, threads=1)
+
+    assert exported.n_features == len(X_COLUMNS)
+    assert export_model.check_parity(exported, *keras_components, raw_features) < 0.01
+    assert len(exported_model_version(path)) == 12
+
+
+def test_identity_scalers_serve_through_predict_offsets(tmp_path, keras_components, raw_features):
+    path = export_model.export_tflite(*keras_components, path=str(tmp_path / 'model.tflite'))
+    exported = load_exported_model(path)
+    _, scaler_X, scaler_y = keras_components
+    numpy_model = load_bundle(BUNDLE_PATH).model
+
+    served = server.predict_offsets(exported, IdentityScaler(), IdentityScaler(), raw_features[:16])
+    expected = server.predict_offsets(numpy_model, scaler_X, scaler_y, raw_features[:16])
+    np.testing.assert_allclose(served, expected, atol=0.01)
+
+
+def test_unknown_exported_file_type_is_rejected():
+    with pytest.raises(ValueError, match="Unknown exported model type"):
+        load_exported_model('model.h5')
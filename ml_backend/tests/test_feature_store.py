@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+from data_loader import TARGET_COLUMN, iter_engineered_chunks
+from features import X_COLUMNS
+
+
+@pytest.fixture
+def dataset_path(tmp_path):
+    rng = np.random.default_rng(1)
+    n = 300
+    start = (pd.Timestamp('2003-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+             + pd.to_timedelta(rng.integers(0, 80_000, n), unit='s'))
+    duration = rng.integers(60, 3000, n)
+    pd.DataFrame({
+        'start.date': start.strftime('%Y-%m-%d'),
+        'start.time': start.strftime('%H:%M:%S'),
+        'peak': (start + pd.to_timedelta(duration // 2, unit='s')).strftime('%H:%M:%S'),
+        'end': (start + pd.to_timedelta(duration, unit='s')).strftime('%H:%M:%S'),
+        'duration.s': duration,
+        'total.counts': rng.integers(1000, 10**6, n),
+        'x.pos.asec': rng.integers(-1000, 1000, n),
+        'y.pos.asec': rng.integers(-1000, 1000, n)
+    }).to_csv(tmp_path / 'flares.csv', index=False)
+    return str(tmp_path / 'flares.csv')
+
+
+def test_build_and_memory_map(dataset_path, tmp_path):
+    store_dir = str(tmp_path / 'store')
+    entry = feature_store.get_or_build(dataset_path, store_dir, chunksize=64)
+    expected = pd.concat(iter_engineered_chunks(dataset_path))
+
+    assert isinstance(entry.X, np.memmap)
+    np.testing.assert_array_equal(entry.X, expected[X_COLUMNS].to_numpy())
+    np.testing.assert_array_equal(entry.y[:, 0], expected[TARGET_COLUMN].to_numpy())
+    np.testing.assert_array_equal(entry.row_id, expected.index.to_numpy())
+    assert entry.meta["rows"] == len(expected)
+
+
+def test_cache_hit_and_invalidation_on_source_change(dataset_path, tmp_path, monkeypatch):
+    store_dir = str(tmp_path / 'store')
+    feature_store.get_or_build(dataset_path, store_dir)
+
+    builds = []
+    original_build = feature_store.build_feature_store
+    monkeypatch.setattr(feature_store, 'build_feature_store', lambda *args, **kwargs: builds.append(1) or original_build(*args, **kwargs))
+
+    feature_store.get_or_build(dataset_path, store_dir)
+    assert builds == []
+
+    with open(dataset_path, 'a') as f:
+        f.write('2003-06-01,10:00:00,10:05:00,10:10:00,600,5000,10,20\n')
+    entry = feature_store.get_or_build(dataset_path, store_dir)
+    assert builds == [1]
+    assert entry.X[-1, 0] == 600
+
+
+def test_load_returns_none_on_miss(dataset_path, tmp_path):
+    assert feature_store.load_feature_store(dataset_path, str(tmp_path / 'empty')) is None
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import X_COLUMNS, add_cyclical_features, build_features, cyclical_encode
+
+
+def make_record(**overrides):
+    record = {
+        'total_counts': 50000, 'x_pos_asec': 100, 'y_pos_asec': -200,
+        'start_hour': 21, 'start_minute': 29, 'start_second': 56,
+        'end_hour': 21, 'end_minute': 41, 'end_second': 48
+    }
+    record.update(overrides)
+    return record
+
+
+def test_lookup_tables_match_trig_formulas():
+    hours = np.arange(24)
+    minutes = np.arange(60)
+
+    sin_values, cos_values = cyclical_encode(hours, 'hour')
+    np.testing.assert_allclose(sin_values, np.sin(2 * np.pi * hours / 24))
+    np.testing.assert_allclose(cos_values, np.cos(2 * np.pi * hours / 24))
+
+    sin_values, cos_values = cyclical_encode(minutes, 'minute')
+    np.testing.assert_allclose(sin_values, np.sin(2 * np.pi * minutes / 60))
+    np.testing.assert_allclose(cos_values, np.cos(2 * np.pi * minutes / 60))
+
+
+def test_cyclical_encode_propagates_nan():
+    sin_values, cos_values = cyclical_encode(np.array([3.0, np.nan]), 'hour')
+
+    assert sin_values[0] == pytest.approx(np.sin(2 * np.pi * 3 / 24))
+    assert np.isnan(sin_values[1]) and np.isnan(cos_values[1])
+
+
+def test_build_features_from_records():
+    features = build_features([make_record(), make_record(start_hour=23, end_hour=0, end_minute=5)])
+
+    assert features.shape == (2, len(X_COLUMNS))
+    assert features[0, 0] == 712
+    # 23:29:56 -> 00:05:48 wraps past midnight
+    assert features[1, 0] == 2152
+    assert features[0, 1:4].tolist() == [50000, 100, -200]
+    assert features[0, 4] == pytest.approx(np.sin(2 * np.pi * 21 / 24))
+    assert features[1, 11] == pytest.approx(np.cos(2 * np.pi * 5 / 60))
+
+
+def test_build_features_accepts_columns_and_dataset_names():
+    record = make_record()
+    dataset_style = {
+        'duration.s': [712.0], 'total.counts': [50000], 'x.pos.asec': [100], 'y.pos.asec': [-200],
+        'start_hour': [21], 'start_minute': [29], 'end_hour': [21], 'end_minute': [41]
+    }
+
+    np.testing.assert_allclose(build_features(dataset_style), build_features([record]))
+
+
+def test_training_and_serving_features_agree():
+    df = pd.DataFrame({
+        'start_datetime': pd.to_datetime(['2002-02-12 21:29:56', '2002-02-13 23:59:00']),
+        'end_datetime': pd.to_datetime(['2002-02-12 21:41:48', '2002-02-14 00:10:00'])
+    })
+    for column, prefix in (('start_datetime', 'start_'), ('end_datetime', 'end_')):
+        df = add_cyclical_features(df, column, 'hour', 24, prefix)
+        df = add_cyclical_features(df, column, 'minute', 60, prefix)
+
+    served = build_features([
+        make_record(),
+        make_record(start_hour=23, start_minute=59, start_second=0, end_hour=0, end_minute=10, end_second=0)
+    ])
+
+    np.testing.assert_allclose(df[X_COLUMNS[4:]].to_numpy(), served[:, 4:])
+
+
+def test_missing_fields_raise():
+    with pytest.raises(ValueError):
+        build_features([{'total_counts': 1}])
@@ -0,0 +1,104 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+import incremental_training
+import ml_model
+from features import X_COLUMNS
+from model_bundle import DEFAULT_BUNDLE_FILENAME, load_bundle, read_bundle_manifest
+
+
+def write_catalog(path, n, first_day, seed, counts_scale=1, mode='w'):
+    rng = np.random.default_rng(seed)
+    start = (pd.Timestamp(first_day) + pd.to_timedelta(rng.integers(0, 60, n), unit='D')
+             + pd.to_timedelta(rng.integers(0, 80_000, n), unit='s'))
+    duration = rng.integers(200, 2500, n)
+    pd.DataFrame({
+        'start.date': start.strftime('%Y-%m-%d'),
+        'start.time': start.strftime('%H:%M:%S'),
+        'peak': (start + pd.to_timedelta(duration // 2, unit='s')).strftime('%H:%M:%S'),
+        'end': (start + pd.to_timedelta(duration, unit='s')).strftime('%H:%M:%S'),
+        'duration.s': duration,
+        'total.counts': rng.integers(10_000, 500_000, n) * counts_scale,
+        'x.pos.asec': rng.integers(-800, 800, n),
+        'y.pos.asec': rng.integers(-800, 800, n)
+    }).to_csv(path, index=False, mode=mode, header=(mode == 'w'))
+
+
+def make_config(tmp_path, **overrides):
+    options = dict(data_path=str(tmp_path / 'flares.csv'), output_dir=str(tmp_path / 'run'), epochs=1, batch_size=32,
+                   full_epochs=1, range_tolerance=0.05, max_mae_increase=10.0)
+    options.update(overrides)
+    return incremental_training.IncrementalConfig(**options)
+
+
+def test_range_violations_are_checked_on_scaled_values():
+    X = np.random.default_rng(0).uniform(0, 1, size=(20, len(X_COLUMNS)))
+    y = np.linspace(0, 100, 20).reshape(-1, 1)
+    scaler_X, scaler_y = MinMaxScaler().fit(X), MinMaxScaler().fit(y)
+    inside = X[:5]
+    outside = X[:5].copy()
+    outside[0, 2] = X[:, 2].max() + 1
+
+    assert incremental_training.range_violations(scaler_X, scaler_y, inside, y[:5]) == []
+    assert incremental_training.range_violations(scaler_X, scaler_y, outside, y[:5] + 1000) == [X_COLUMNS[2], 'peak_offset_seconds']
+    assert incremental_training.range_violations(scaler_X, scaler_y, outside, y[:5], tolerance=10.0) == []
+
+
+def test_new_rows_are_fine_tuned_and_published_then_watermark_advances(tmp_path):
+    write_catalog(tmp_path / 'flares.csv', 300, '2003-01-01', seed=0)
+    config = make_config(tmp_path)
+
+    # No bundle yet: the first run is a full refit, which also sets the watermark and the holdout.
+    summary = incremental_training.run_incremental(config)
+    assert summary["mode"] == incremental_training.FULL_REFIT
+    first_watermark = summary["watermark"]
+    first_version = read_bundle_manifest(config.artifact_path(DEFAULT_BUNDLE_FILENAME))["version"]
+
+    write_catalog(tmp_path / 'flares.csv', 80, '2003-04-01', seed=1, mode='a')
+    summary = incremental_training.run_incremental(config)
+
+    assert summary["mode"] == incremental_training.PUBLISHED
+    assert summary["new_rows"] + summary["new_holdout_rows"] == 80
+    state = incremental_training.read_state(config.artifact_path(incremental_training.STATE_FILENAME))
+    assert state["watermark"] > first_watermark
+    assert state["bundle_version"] == summary["bundle_version"] != first_version
+    with open(config.artifact_path(ml_model.MODEL_INFO_FILENAME)) as f:
+        assert json.load(f)["training_mode"] == "incremental"
+
+    # The published fine-tuned bundle is what the next run starts from, through the Keras runtime.
+    X = np.random.default_rng(0).uniform(0, 1, size=(8, 1, len(X_COLUMNS))).astype(np.float32)
+    bundle_path = config.artifact_path(DEFAULT_BUNDLE_FILENAME)
+    np.testing.assert_allclose(load_bundle(bundle_path, runtime='keras').model.predict(X, verbose=0),
+                               load_bundle(bundle_path).model.predict(X), rtol=1e-4, atol=1e-5)
+
+    assert incremental_training.run_incremental(config)["mode"] == incremental_training.UP_TO_DATE
+
+
+def test_worse_model_is_rejected_and_out_of_range_data_refits(tmp_path):
+    write_catalog(tmp_path / 'flares.csv', 300, '2003-01-01', seed=0)
+    config = make_config(tmp_path)
+    incremental_training.run_incremental(config)
+    bundle_path = config.artifact_path(DEFAULT_BUNDLE_FILENAME)
+    state_path = config.artifact_path(incremental_training.STATE_FILENAME)
+    version = read_bundle_manifest(bundle_path)["version"]
+    watermark = incremental_training.read_state(state_path)["watermark"]
+
+    write_catalog(tmp_path / 'flares.csv', 80, '2003-04-01', seed=1, mode='a')
+    # No fine-tuned model can lower the holdout MAE by 100%, so this run must keep the current model.
+    summary = incremental_training.run_incremental(make_config(tmp_path, max_mae_increase=-1.0))
+
+    assert summary["mode"] == incremental_training.REJECTED
+    assert read_bundle_manifest(bundle_path)["version"] == version
+    assert incremental_training.read_state(state_path)["watermark"] == watermark
+
+    write_catalog(tmp_path / 'flares.csv', 20, '2003-07-01', seed=2, counts_scale=100, mode='a')
+    summary = incremental_training.run_incremental(config)
+
+    assert summary["mode"] == incremental_training.FULL_REFIT
+    assert 'total.counts' in summary["reason"]
+    assert incremental_training.read_state(state_path)["watermark"] > watermark
+    assert os.path.exists(config.artifact_path(incremental_training.HOLDOUT_FILENAME))
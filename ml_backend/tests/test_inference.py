@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from inference import CompiledPredictor
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(1, 12)),
+        tf.keras.layers.LSTM(8),
+        tf.keras.layers.Dense(1)
+    ])
+    return model
+
+
+def test_compiled_path_matches_keras_predict(small_model):
+    X = np.random.default_rng(0).uniform(0, 1, size=(5, 1, 12))
+    predictor = CompiledPredictor(small_model)
+
+    expected = small_model.predict(X, verbose=0)
+    np.testing.assert_allclose(predictor.predict(X), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_keras_predict_fallback(small_model):
+    X = np.zeros((2, 1, 12))
+    predictor = CompiledPredictor(small_model, use_keras_predict=True)
+
+    np.testing.assert_allclose(predictor.predict(X, batch_size=2), small_model.predict(X, verbose=0))
+
+
+def test_warmup_records_time(small_model):
+    predictor = CompiledPredictor(small_model)
+
+    assert predictor.warmup(batch_sizes=(1, 4)) >= 0
+    assert predictor.warmup_seconds is not None
@@ -0,0 +1,61 @@
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+import ml_backend_server as server
+from metrics import MetricsRegistry
+from test_batch_prediction import DurationModel, make_record
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('stage_seconds', "Stage time.", ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, 'model')
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP stage_seconds Stage time.", "# TYPE stage_seconds histogram"]
+    assert 'stage_seconds_bucket{stage="model",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="model",le="1.0"} 3' in lines
+    assert 'stage_seconds_bucket{stage="model",le="+Inf"} 4' in lines
+    assert 'stage_seconds_sum{stage="model"} 4.25' in lines
+    assert 'stage_seconds_count{stage="model"} 4' in lines
+
+
+def test_counter_and_gauge_render_with_escaped_labels():
+    registry = MetricsRegistry()
+    errors = registry.counter('errors', "Errors.", ['type'])
+    errors.inc('Bad "input"')
+    errors.inc('Bad "input"', amount=2)
+    registry.gauge('queue_depth', "Queue depth.", lambda: 7)
+    registry.gauge('missing', "Not available.", lambda: None)
+
+    text = registry.render()
+
+    assert 'errors_total{type="Bad \\"input\\""} 3' in text
+    assert 'queue_depth 7' in text
+    assert not any(line.startswith('missing ') for line in text.splitlines())
+
+
+def test_metrics_endpoint_reports_stages_batch_sizes_and_errors(monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, size=(50, 12))
+    X[:, 0] = np.linspace(0, 7200, 50)
+    components = server.ModelComponents(DurationModel(), MinMaxScaler().fit(X), MinMaxScaler().fit(X[:, :1]), 'abc123', 'bundle.npz')
+    monkeypatch.setattr(server, 'ml_components', components)
+    monkeypatch.setattr(server, 'prediction_cache', None)
+    client = server.app.test_client()
+    before = server.errors_total.value('/api/ml_predict/batch', 'invalid_record')
+
+    client.post('/api/ml_predict/batch', json=[make_record(), make_record(end_minute=59), {}])
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    for stage in ('parse', 'validate', 'features', 'scale', 'model', 'inverse_transform', 'format', 'serialize'):
+        assert f'ml_prediction_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'ml_inference_batch_size_bucket{le="2"}' in text
+    assert 'ml_requests_total{endpoint="/api/ml_predict/batch",status="200"}' in text
+    assert 'ml_model_info{backend="keras",version="abc123",source="bundle.npz"} 1' in text
+    assert server.errors_total.value('/api/ml_predict/batch', 'invalid_record') == before + 1
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def run_concurrently(batcher, items):
+    results = [None] * len(items)
+    errors = [None] * len(items)
+
+    def worker(index):
+        try:
+            results[index] = batcher.submit(items[index], timeout=5)
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_submissions_are_coalesced():
+    batch_sizes = []
+
+    def double(items):
+        batch_sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=200)
+    results, errors = run_concurrently(batcher, list(range(16)))
+    batcher.stop(timeout=5)
+
+    assert results == [item * 2 for item in range(16)]
+    assert errors == [None] * 16
+    assert max(batch_sizes) > 1
+    assert all(size <= 8 for size in batch_sizes)
+
+    stats = batcher.stats()
+    assert stats["items"] == 16
+    assert stats["batches"] == len(batch_sizes)
+    assert stats["flushes_by_size"] >= 1
+
+
+def test_lone_request_is_flushed_after_max_wait():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=64, max_wait_ms=10)
+
+    started = time.perf_counter()
+    assert batcher.submit("x", timeout=5) == "x"
+    assert time.perf_counter() - started < 2
+    assert batcher.stats()["flushes_by_timeout"] == 1
+    batcher.stop(timeout=5)
+
+
+def test_batch_errors_are_raised_in_every_waiting_request():
+    def fail(items):
+        raise RuntimeError("model exploded")
+
+    batcher = MicroBatcher(fail, max_batch_size=4, max_wait_ms=50)
+    results, errors = run_concurrently(batcher, [1, 2, 3])
+    batcher.stop(timeout=5)
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert batcher.stats()["errors"] >= 1
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        MicroBatcher(lambda items: items, max_batch_size=0)
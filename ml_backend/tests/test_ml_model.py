@@ -0,0 +1,162 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+import ml_model
+import plots
+
+
+@pytest.fixture
+def dataset_path(tmp_path):
+    rng = np.random.default_rng(3)
+    n = 200
+    start = (pd.Timestamp('2003-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+             + pd.to_timedelta(rng.integers(0, 80_000, n), unit='s'))
+    duration = rng.integers(60, 3000, n)
+    pd.DataFrame({
+        'start.date': start.strftime('%Y-%m-%d'),
+        'start.time': start.strftime('%H:%M:%S'),
+        'peak': (start + pd.to_timedelta(duration // 2, unit='s')).strftime('%H:%M:%S'),
+        'end': (start + pd.to_timedelta(duration, unit='s')).strftime('%H:%M:%S'),
+        'duration.s': duration,
+        'total.counts': rng.integers(1000, 10**6, n),
+        'x.pos.asec': rng.integers(-1000, 1000, n),
+        'y.pos.asec': rng.integers(-1000, 1000, n)
+    }).to_csv(tmp_path / 'flares.csv', index=False)
+    return str(tmp_path / 'flares.csv')
+
+
+def rendered_plots(plots_dir):
+    """Plot names in the manifest, after checking each one's hashed file and plain copy were written."""
+    with open(os.path.join(plots_dir, plots.MANIFEST_FILENAME)) as f:
+        entries = json.load(f)["plots"]
+    for name, entry in entries.items():
+        assert os.path.exists(os.path.join(plots_dir, entry["file"])) and os.path.exists(os.path.join(plots_dir, name))
+    return sorted(entries)
+
+
+def test_parse_args_stages_and_skip():
+    config = ml_model.parse_args(['--data-path', 'x.csv', '--epochs', '3', '--batch-size', '16',
+                                  '--output-dir', 'out', '--skip', 'plot', '--loader', 'memory'])
+    assert config.stages == ('data', 'train', 'evaluate')
+    assert (config.data_path, config.epochs, config.batch_size) == ('x.csv', 3, 16)
+    assert config.plots_dir == os.path.join('out', 'public', 'plots')
+
+    with pytest.raises(ValueError):
+        ml_model.TrainConfig(stages=('data', 'deploy'))
+
+
+def test_missing_dataset_raises(tmp_path):
+    config = ml_model.TrainConfig(data_path=str(tmp_path / 'missing.csv'), loader='memory', output_dir=str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        ml_model.train(config)
+
+
+@pytest.mark.parametrize('loader', ['memory', 'feature_store'])
+def test_train_then_rerun_skipped_stages(dataset_path, tmp_path, loader):
+    output_dir = str(tmp_path / 'run')
+    config = ml_model.TrainConfig(data_path=dataset_path, output_dir=output_dir, epochs=1, batch_size=32, loader=loader,
+                                  feature_store_dir=str(tmp_path / 'store'), stages=('data', 'train'))
+    summary = ml_model.train(config)
+
+    assert summary["epochs_trained"] == 1
+    for filename in (ml_model.MODEL_FILENAME, ml_model.SCALER_X_FILENAME, ml_model.SCALER_Y_FILENAME, ml_model.HISTORY_FILENAME):
+        assert os.path.exists(os.path.join(output_dir, filename))
+    assert not os.path.exists(os.path.join(output_dir, ml_model.EVALUATION_FILENAME))
+
+    config.stages = ('evaluate', 'plot')
+    summary = ml_model.train(config)
+
+    assert summary["metrics"]["mae_seconds"] >= 0
+    assert rendered_plots(config.plots_dir) == ['actual_vs_predicted_plot.png', 'residuals_plot.png', 'training_history_plot.png']
+
+
+def test_regressor_backend_records_model_info(dataset_path, tmp_path):
+    output_dir = str(tmp_path / 'run')
+    config = ml_model.TrainConfig(data_path=dataset_path, output_dir=output_dir, model='ridge', loader='memory')
+    summary = ml_model.train(config)
+
+    with open(os.path.join(output_dir, ml_model.MODEL_INFO_FILENAME)) as f:
+        info = json.load(f)
+    assert info["backend"] == 'ridge'
+    assert info["model_file"] == 'solar_flare_peak_time_predictor_ridge.joblib'
+    assert summary["metrics"]["mae_seconds"] >= 0
+    assert rendered_plots(config.plots_dir) == ['actual_vs_predicted_plot.png', 'residuals_plot.png']
+
+    model, _, _ = ml_model.load_trained_artifacts(config)
+    assert model.backend == 'ridge'
+
+    with pytest.raises(ValueError):
+        ml_model.TrainConfig(model='gbt', loader='streaming')
+
+    import model_bundle
+    bundle = model_bundle.load_bundle(os.path.join(output_dir, model_bundle.DEFAULT_BUNDLE_FILENAME))
+    assert bundle.version == info["bundle_version"]
+    X = np.random.default_rng(0).random((5, 1, 12))
+    np.testing.assert_allclose(bundle.model.predict(X), model.predict(X))
+
+
+def test_sequence_model_is_trained_on_windows_and_bundled(dataset_path, tmp_path):
+    output_dir = str(tmp_path / 'run')
+    config = ml_model.parse_args(['--data-path', dataset_path, '--output-dir', output_dir, '--epochs', '1', '--loader', 'memory',
+                                  '--sequence-length', '4', '--skip', 'plot'])
+    summary = ml_model.train(config)
+
+    assert summary["metrics"]["mae_seconds"] >= 0
+    import model_bundle
+    bundle = model_bundle.load_bundle(os.path.join(output_dir, model_bundle.DEFAULT_BUNDLE_FILENAME))
+    assert bundle.manifest["sequence"] == {"length": 4, "group_by": "none"}
+    assert bundle.model.input_shape[1] == 4
+
+    with pytest.raises(ValueError):
+        ml_model.TrainConfig(sequence_length=4, loader='streaming')
+
+
+def test_throughput_mode_trains_through_tf_data(dataset_path, tmp_path):
+    config = ml_model.parse_args(['--data-path', dataset_path, '--output-dir', str(tmp_path), '--epochs', '2', '--loader', 'memory',
+                                  '--throughput', '--batch-size', '128', '--scale-lr', '--skip', 'evaluate,plot'])
+    assert (config.pipeline, config.inter_op_threads) == ('tf.data', 2)
+    assert config.learning_rate == pytest.approx(2 * ml_model.BASE_LEARNING_RATE)
+
+    ml_model.train(config)
+
+    with open(os.path.join(str(tmp_path), ml_model.HISTORY_FILENAME)) as f:
+        history = json.load(f)
+    assert len(history["epoch_seconds"]) == len(history["val_loss"]) == 2
+
+    with pytest.raises(ValueError):
+        ml_model.TrainConfig(pipeline='generator')
+
+
+def test_data_stage_output_is_reused_and_checked(dataset_path, tmp_path):
+    output_dir = str(tmp_path / 'run')
+    config = ml_model.TrainConfig(data_path=dataset_path, output_dir=output_dir, model='ridge', loader='memory', stages=('train',))
+    with pytest.raises(ValueError, match='data stage'):
+        ml_model.train(config)
+
+    config.stages = ('data',)
+    ml_model.train(config)
+    assert os.path.exists(os.path.join(output_dir, ml_model.PREPARED_DATA_FILENAME))
+    assert not os.path.exists(os.path.join(output_dir, ml_model.SCALER_X_FILENAME))
+
+    config.stages = ('train', 'evaluate')
+    summary = ml_model.train(config)
+    assert summary["metrics"]["mae_seconds"] >= 0
+
+    # Rows with a longer flare change the catalog's min/max; the saved output no longer matches it.
+    catalog = pd.read_csv(dataset_path)
+    longer = catalog.head(5).assign(**{'end': '23:59:59', 'start.time': '00:00:01', 'peak': '12:00:00'})
+    pd.concat([catalog, longer]).to_csv(dataset_path, index=False)
+    with pytest.raises(ValueError, match='data stage'):
+        ml_model.train(config)
+
+    # Re-running the data stage without the train stage scales with the saved model's scalers.
+    config.stages = ('data', 'evaluate')
+    ml_model.train(config)
+    _, scaler_X, _ = ml_model.load_trained_artifacts(config)
+    prepared_X, _ = joblib.load(os.path.join(output_dir, ml_model.PREPARED_SCALERS_FILENAME))
+    np.testing.assert_array_equal(prepared_X.scale_, scaler_X.scale_)
@@ -0,0 +1,98 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import MinMaxScaler
+
+import model_bundle
+from features import X_COLUMNS
+from numpy_lstm import NumpyLSTMModel
+from regressors import RegressorModel
+
+
+ML_BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+MODEL_PATH = os.path.join(ML_BACKEND_DIR, 'solar_flare_peak_time_predictor_lstm_model.h5')
+
+
+@pytest.fixture
+def scalers():
+    rng = np.random.default_rng(0)
+    return MinMaxScaler().fit(rng.random((50, len(X_COLUMNS))) * 100), MinMaxScaler().fit(rng.random((50, 1)) * 3000)
+
+
+def test_lstm_bundle_matches_h5_model_and_scalers(tmp_path, scalers):
+    scaler_X, scaler_y = scalers
+    path = str(tmp_path / 'bundle.npz')
+    manifest = model_bundle.write_bundle(path, MODEL_PATH, scaler_X, scaler_y)
+
+    bundle = model_bundle.load_bundle(path)
+    assert bundle.version == manifest["version"]
+    assert bundle.backend == 'lstm'
+
+    X = np.random.default_rng(1).random((20, len(X_COLUMNS))) * 100
+    np.testing.assert_allclose(bundle.scaler_X.transform(X), scaler_X.transform(X))
+    np.testing.assert_allclose(bundle.scaler_y.inverse_transform(X[:, :1]), scaler_y.inverse_transform(X[:, :1]))
+
+    X_scaled = scaler_X.transform(X).reshape(-1, 1, len(X_COLUMNS))
+    np.testing.assert_array_equal(bundle.model.predict(X_scaled), NumpyLSTMModel.from_h5(MODEL_PATH).predict(X_scaled))
+
+
+def test_keras_runtime_rebuilds_shipped_and_freshly_saved_models(tmp_path, scalers):
+    pytest.importorskip('tensorflow')
+    from ml_model import build_lstm_model
+
+    shipped = os.path.join(ML_BACKEND_DIR, model_bundle.DEFAULT_BUNDLE_FILENAME)
+    X = np.random.default_rng(2).random((16, 1, len(X_COLUMNS))).astype(np.float32)
+    keras_model = model_bundle.load_bundle(shipped, runtime='keras').model
+    np.testing.assert_allclose(keras_model.predict(X, verbose=0), model_bundle.load_bundle(shipped).model.predict(X), rtol=1e-4, atol=1e-5)
+
+    # A model saved by the installed Keras round-trips as well.
+    model = build_lstm_model((3, len(X_COLUMNS)), lstm1_units=8, lstm2_units=4)
+    h5_path = str(tmp_path / 'model.h5')
+    model.save(h5_path)
+    path = str(tmp_path / 'bundle.npz')
+    model_bundle.write_bundle(path, h5_path, *scalers)
+    windows = np.random.default_rng(3).random((16, 3, len(X_COLUMNS))).astype(np.float32)
+    rebuilt = model_bundle.load_bundle(path, runtime='keras').model
+    np.testing.assert_allclose(rebuilt.predict(windows, verbose=0), model.predict(windows, verbose=0), rtol=1e-4, atol=1e-5)
+
+
+def test_modified_bundle_fails_verification(tmp_path, scalers):
+    path = str(tmp_path / 'bundle.npz')
+    model_bundle.write_bundle(path, MODEL_PATH, *scalers)
+
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    arrays['scaler_y/scale'] = arrays['scaler_y/scale'] * 2
+    np.savez(path, **arrays)
+
+    with pytest.raises(ValueError, match="Content hash mismatch"):
+        model_bundle.load_bundle(path)
+
+
+def test_ridge_bundle_matches_regressor(tmp_path, scalers):
+    rng = np.random.default_rng(2)
+    X, y = rng.random((100, 1, len(X_COLUMNS))), rng.random((100, 1))
+    regressor_path = str(tmp_path / 'ridge.joblib')
+    regressor = RegressorModel(Ridge(), 'ridge').fit(X, y)
+    regressor.save(regressor_path)
+
+    model_bundle.write_bundle(str(tmp_path / 'bundle.npz'), regressor_path, *scalers)
+    bundle = model_bundle.load_bundle(str(tmp_path / 'bundle.npz'))
+
+    assert bundle.backend == 'ridge'
+    np.testing.assert_allclose(bundle.model.predict(X), regressor.predict(X))
+
+
+def test_watcher_reports_replaced_bundle(tmp_path, scalers):
+    path = str(tmp_path / 'bundle.npz')
+    model_bundle.write_bundle(path, MODEL_PATH, *scalers)
+    changed = threading.Event()
+    watcher = model_bundle.BundleWatcher(path, changed.set, interval_seconds=0.01)
+    watcher.ensure_running()
+
+    assert not changed.wait(0.1)
+    model_bundle.write_bundle(path, MODEL_PATH, *scalers)
+    assert changed.wait(2)
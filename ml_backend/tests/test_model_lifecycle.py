@@ -0,0 +1,72 @@
+import threading
+
+from model_lifecycle import ModelLifecycle, FAILED, LOADING, NOT_LOADED, READY
+
+
+def test_eager_load_records_state_and_time():
+    calls = []
+    lifecycle = ModelLifecycle(lambda: calls.append(1), mode='eager')
+    lifecycle.start()
+
+    status = lifecycle.status()
+    assert calls == [1]
+    assert status["state"] == READY
+    assert status["ready"]
+    assert status["load_seconds"] is not None
+
+
+def test_lazy_mode_loads_once_on_first_use():
+    calls = []
+    lifecycle = ModelLifecycle(lambda: calls.append(1), mode='lazy')
+    lifecycle.start()
+
+    assert lifecycle.state == NOT_LOADED
+    assert lifecycle.ensure_loaded()
+    assert lifecycle.ensure_loaded()
+    assert calls == [1]
+
+
+def test_background_mode_reports_loading_until_done():
+    release = threading.Event()
+    lifecycle = ModelLifecycle(lambda: release.wait(5), mode='background')
+    lifecycle.start()
+
+    assert not lifecycle.ensure_loaded()
+    assert lifecycle.status()["state"] in (NOT_LOADED, LOADING)
+
+    release.set()
+    assert lifecycle.wait_until_ready(timeout=5)
+    assert lifecycle.ensure_loaded()
+
+
+def test_failed_load_is_reported():
+    def loader():
+        raise FileNotFoundError("model.h5")
+
+    lifecycle = ModelLifecycle(loader, mode='lazy')
+
+    assert not lifecycle.ensure_loaded()
+    status = lifecycle.status()
+    assert status["state"] == FAILED
+    assert "model.h5" in status["error"]
+
+
+def test_reload_keeps_serving_and_survives_a_failed_load():
+    results = iter([None, None, RuntimeError("corrupt bundle")])
+
+    def loader():
+        error = next(results)
+        if error:
+            raise error
+
+    lifecycle = ModelLifecycle(loader, mode='eager')
+    lifecycle.start()
+
+    assert lifecycle.load(reload=True)
+    assert lifecycle.status()["load_count"] == 2
+
+    assert not lifecycle.load(reload=True)
+    status = lifecycle.status()
+    assert status["state"] == READY
+    assert status["error"] == "corrupt bundle"
+    assert status["load_count"] == 2
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+from numpy_lstm import NumpyLSTMModel
+
+tf = pytest.importorskip("tensorflow")
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'solar_flare_peak_time_predictor_lstm_model.h5')
+
+
+def build_model(timesteps):
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(timesteps, 12)),
+        tf.keras.layers.LSTM(16, return_sequences=True),
+        tf.keras.layers.Dropout(0.3),
+        tf.keras.layers.LSTM(8),
+        tf.keras.layers.Dense(1)
+    ])
+    model.compile(optimizer='adam', loss='mse')
+    return model
+
+
+@pytest.mark.parametrize("timesteps", [1, 4])
+def test_parity_with_keras(tmp_path, timesteps):
+    model = build_model(timesteps)
+    path = str(tmp_path / "model.h5")
+    model.save(path)
+
+    X = np.random.default_rng(timesteps).uniform(0, 1, size=(64, timesteps, 12)).astype(np.float32)
+    numpy_model = NumpyLSTMModel.from_h5(path)
+
+    np.testing.assert_allclose(numpy_model.predict(X), model.predict(X, verbose=0), rtol=1e-4, atol=1e-5)
+
+
+def test_parity_with_shipped_model():
+    try:
+        keras_model = tf.keras.models.load_model(MODEL_PATH)
+    except Exception as e:
+        pytest.skip(f"Installed Keras cannot load the shipped model: {e}")
+
+    X = np.random.default_rng(0).uniform(0, 1, size=(256, 1, 12)).astype(np.float32)
+    numpy_model = NumpyLSTMModel.from_h5(MODEL_PATH)
+
+    np.testing.assert_allclose(numpy_model.predict(X), keras_model.predict(X, verbose=0), rtol=1e-4, atol=1e-5)
+
+
+def test_rejects_wrong_feature_count():
+    numpy_model = NumpyLSTMModel.from_h5(MODEL_PATH)
+
+    with pytest.raises(ValueError):
+        numpy_model.predict(np.zeros((1, 1, 3)))
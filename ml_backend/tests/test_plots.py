@@ -0,0 +1,70 @@
+import json
+import os
+
+import numpy as np
+
+import ml_backend_server as server
+import plots
+
+
+def write_run(tmp_path, n):
+    rng = np.random.default_rng(0)
+    y_true = rng.uniform(0, 3000, (n, 1))
+    np.savez(tmp_path / 'evaluation.npz', y_true=y_true, y_pred=y_true + rng.normal(0, 200, (n, 1)))
+    with open(tmp_path / 'training_history.json', 'w') as f:
+        json.dump({'loss': [0.3, 0.2], 'val_loss': [0.35, 0.25], 'mae': [0.4, 0.3], 'val_mae': [0.45, 0.35]}, f)
+    return str(tmp_path / 'training_history.json'), str(tmp_path / 'evaluation.npz')
+
+
+def test_plots_are_rendered_in_workers_as_hashed_files_and_old_versions_pruned(tmp_path):
+    history_path, evaluation_path = write_run(tmp_path, 500)
+    plots_dir = str(tmp_path / 'plots')
+
+    first = plots.render_plots(history_path, evaluation_path, plots_dir, workers=2)
+    assert sorted(first["plots"]) == sorted(plots.PLOT_NAMES)
+    # Rendering is deterministic: the same inputs give the same file names.
+    again = plots.render_plots(history_path, evaluation_path, plots_dir, workers=1)
+    assert {name: entry["file"] for name, entry in again["plots"].items()} == {name: entry["file"] for name, entry in first["plots"].items()}
+    for name, entry in first["plots"].items():
+        with open(os.path.join(plots_dir, entry["file"]), 'rb') as hashed, open(os.path.join(plots_dir, name), 'rb') as plain:
+            assert hashed.read() == plain.read()
+
+    # Above max_points the scatters become hexbins, which changes their files; the old versions are removed.
+    write_run(tmp_path, 5000)
+    second = plots.render_plots(history_path, evaluation_path, plots_dir, max_points=1000)
+    assert second["plots"][plots.ACTUAL_VS_PREDICTED_PLOT]["file"] != first["plots"][plots.ACTUAL_VS_PREDICTED_PLOT]["file"]
+    assert second["plots"][plots.TRAINING_HISTORY_PLOT]["file"] == first["plots"][plots.TRAINING_HISTORY_PLOT]["file"]
+    hashed_files = [filename for filename in os.listdir(plots_dir) if plots.HASHED_NAME.match(filename)]
+    assert sorted(hashed_files) == sorted(entry["file"] for entry in second["plots"].values())
+
+
+def test_plots_are_served_from_memory_with_etags(tmp_path, monkeypatch):
+    history_path, evaluation_path = write_run(tmp_path, 200)
+    plots_dir = str(tmp_path / 'plots')
+    manifest = plots.render_plots(history_path, evaluation_path, plots_dir)
+    store = plots.PlotStore(plots_dir)
+    monkeypatch.setattr(server, 'plot_store', store)
+    client = server.app.test_client()
+    entry = manifest["plots"][plots.RESIDUALS_PLOT]
+
+    response = client.get('/plots/residuals_plot.png')
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    assert response.headers['ETag'] == f'"{entry["etag"]}"'
+    assert 'no-cache' in response.headers['Cache-Control']
+    assert client.get('/plots/residuals_plot.png', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    hashed = client.get(f'/plots/{entry["file"]}')
+    assert hashed.data == response.data
+    assert 'immutable' in hashed.headers['Cache-Control'] and 'max-age=' in hashed.headers['Cache-Control']
+
+    assert client.get('/plots/missing.png').status_code == 404
+    assert client.get('/plots/..%2Fevaluation.npz').status_code == 404
+    assert store.stats()["misses"] == 1 and store.stats()["hits"] >= 2
+
+    # A file without a manifest entry is re-read when it changes.
+    with open(os.path.join(plots_dir, 'notes.txt'), 'w') as f:
+        f.write('first')
+    first_etag = client.get('/plots/notes.txt').headers['ETag']
+    with open(os.path.join(plots_dir, 'notes.txt'), 'w') as f:
+        f.write('second version')
+    assert client.get('/plots/notes.txt').headers['ETag'] != first_etag
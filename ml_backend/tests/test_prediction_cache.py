@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import MinMaxScaler
+
+from features import X_COLUMNS
+from prediction_cache import InProcessCacheBackend, PredictionCache, canonical_key
+from regressors import RegressorModel
+
+
+RECORD = {
+    'total_counts': 50000, 'x_pos_asec': 100, 'y_pos_asec': -200,
+    'start_hour': 21, 'start_minute': 29, 'start_second': 56,
+    'end_hour': 21, 'end_minute': 41, 'end_second': 48
+}
+
+
+def test_canonical_key_ignores_key_order_number_types_and_extra_fields():
+    reordered = dict(reversed(list(RECORD.items())))
+    as_floats = {**RECORD, 'total_counts': 50000.0, 'x_pos_asec': 100.0}
+    with_extra = {**RECORD, 'note': 'dashboard'}
+
+    assert canonical_key(reordered) == canonical_key(RECORD)
+    assert canonical_key(as_floats) == canonical_key(RECORD)
+    assert canonical_key(with_extra) == canonical_key(RECORD)
+    assert canonical_key({**RECORD, 'end_second': 49}) != canonical_key(RECORD)
+    assert canonical_key({'total_counts': 1}) is None
+
+
+def test_lru_eviction_and_ttl():
+    backend = InProcessCacheBackend(max_entries=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+    assert backend.evictions == 1
+
+    expiring = InProcessCacheBackend(max_entries=10, ttl_seconds=0.01)
+    expiring.set('a', 1)
+    time.sleep(0.02)
+    assert expiring.get('a') is None
+    assert expiring.expirations == 1
+
+
+def test_hit_miss_counters_and_get_or_compute():
+    cache = PredictionCache(InProcessCacheBackend())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"predicted_offset_seconds": 1.0}
+
+    assert cache.get_or_compute(RECORD, compute, 'v1') == {"predicted_offset_seconds": 1.0}
+    assert cache.get_or_compute({**RECORD, 'total_counts': 50000.0}, compute, 'v1') == {"predicted_offset_seconds": 1.0}
+
+    stats = cache.stats()
+    assert calls == [1]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_entries_are_keyed_on_the_model_version():
+    cache = PredictionCache(InProcessCacheBackend())
+
+    key, _ = cache.get(RECORD, 'v1')
+    cache.set(key, {"predicted_offset_seconds": 1.0})
+    assert cache.get(RECORD, 'v1')[1] is not None
+    assert cache.get(RECORD, 'v2')[1] is None
+    # A model without a version is never cached.
+    assert cache.get(RECORD, None) == (None, None)
+
+
+def test_replaced_bundle_never_serves_old_model_results(tmp_path, monkeypatch):
+    import ml_backend_server as server
+    from model_bundle import write_bundle
+
+    def write_constant_bundle(path, scaled_offset):
+        # A ridge model that predicts the same scaled offset for every flare.
+        X = np.random.default_rng(0).random((20, 1, len(X_COLUMNS)))
+        regressor_path = str(tmp_path / 'ridge.joblib')
+        RegressorModel(Ridge(), 'ridge').fit(X, np.full((20, 1), scaled_offset)).save(regressor_path)
+        return write_bundle(path, regressor_path, MinMaxScaler().fit(X[:, 0]), MinMaxScaler().fit([[0], [1000]]))["version"]
+
+    bundle_path = str(tmp_path / 'model_bundle.npz')
+    shared_backend = InProcessCacheBackend()
+    for name, value in (('MODEL_BUNDLE_PATH', bundle_path), ('WARMUP_ON_STARTUP', False), ('USE_EXPORTED_MODEL', False),
+                        ('SHARED_WEIGHTS', False), ('bundle_watcher', None), ('prediction_batcher', None),
+                        ('ml_components', None), ('prediction_cache', PredictionCache(shared_backend))):
+        monkeypatch.setattr(server, name, value)
+    client = server.app.test_client()
+
+    def predict(record):
+        return client.post('/api/ml_predict', json=record).get_json()["prediction"]
+
+    old_version = write_constant_bundle(bundle_path, 0.1)
+    server.load_ml_components()
+    assert predict(RECORD) == pytest.approx(100)
+
+    # The file is replaced but not yet reloaded: the served model answers, from the cache too.
+    write_constant_bundle(bundle_path, 0.9)
+    assert predict(RECORD) == pytest.approx(100)
+
+    server.load_ml_components()
+    assert predict(RECORD) == pytest.approx(900)
+
+    # Another worker still serving the old model writes into the shared cache after this one swapped.
+    other_record = {**RECORD, 'total_counts': 1234}
+    stale_worker = PredictionCache(shared_backend)
+    stale_worker.get_or_compute(other_record, lambda: {"predicted_offset_seconds": 100.0}, old_version)
+    assert predict(other_record) == pytest.approx(900)
@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from profiler import SamplingProfiler
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_other_threads_as_folded_stacks(tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name="spinner")
+    worker.start()
+
+    profiler = SamplingProfiler(interval_seconds=0.002)
+    profiler.start()
+    time.sleep(0.2)
+    folded = profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.sample_count > 10
+    spinner_lines = [line for line in folded.splitlines() if line.startswith("spinner;")]
+    assert spinner_lines
+    stack, count = spinner_lines[0].rsplit(' ', 1)
+    assert "spin (test_profiler.py:" in stack
+    assert int(count) > 0
+    assert "sampling-profiler" not in folded
+
+    path = profiler.dump(str(tmp_path))
+    assert open(path).read() == folded
+
+
+def test_profiler_stops_after_duration_and_rejects_double_start():
+    profiler = SamplingProfiler(interval_seconds=0.001)
+    profiler.start(duration_seconds=0.05)
+    with pytest.raises(RuntimeError, match="already running"):
+        profiler.start()
+    time.sleep(0.3)
+
+    assert not profiler.running
+    assert profiler.status()["stopped_at"] is not None
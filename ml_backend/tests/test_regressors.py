@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from features import X_COLUMNS
+from regressors import REGRESSOR_BACKENDS, RegressorModel, make_estimator
+
+
+@pytest.fixture
+def scaled_data():
+    rng = np.random.default_rng(0)
+    X = rng.random((400, 1, len(X_COLUMNS)))
+    y = (0.6 * X[:, 0, 0] + 0.2 * X[:, 0, 1]).reshape(-1, 1)
+    return X, y
+
+
+@pytest.mark.parametrize('backend', REGRESSOR_BACKENDS)
+def test_backends_fit_predict_and_round_trip(backend, scaled_data, tmp_path):
+    X, y = scaled_data
+    model = RegressorModel(make_estimator(backend), backend).fit(X, y)
+
+    predictions = model.predict(X[:5])
+    assert predictions.shape == (5, 1)
+    np.testing.assert_allclose(model.predict(X[:5, 0, :]), predictions)
+    mse, mae = model.evaluate(X, y)
+    assert mae < 0.1 and mse < mae
+
+    path = str(tmp_path / 'model.joblib')
+    model.save(path)
+    loaded = RegressorModel.load(path)
+    assert loaded.backend == backend
+    np.testing.assert_allclose(loaded.predict(X[:5]), predictions)
+    assert loaded.warmup() >= 0
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_estimator('svm')
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+import ml_backend_server as server
+from sequences import FlareWindows, SequenceHistory, group_starts_of
+from test_batch_prediction import make_record
+
+
+class WindowMeanModel:
+    """Stand-in for a sequence LSTM: predicts the mean scaled duration over the window."""
+
+    input_shape = (None, 3, 12)
+
+    def predict(self, X, batch_size=None, verbose=None):
+        return X[:, :, :1].mean(axis=1)
+
+
+def test_windows_are_views_padded_within_each_group():
+    rows = np.arange(14, dtype=np.float32).reshape(7, 2)
+    groups = np.array([4, 4, 4, 9, 9, 9, 9])
+
+    windows = FlareWindows(rows, 3, group_starts_of(groups))
+
+    assert np.shares_memory(windows.view, rows)
+    assert windows.shape == (7, 3, 2)
+    # Each group's first flares are padded with copies of its first flare; windows never reach into the previous group.
+    taken = windows.take([0, 2, 3, 4, 6])
+    np.testing.assert_array_equal(taken[0], rows[[0, 0, 0]])
+    np.testing.assert_array_equal(taken[1], rows[[0, 1, 2]])
+    np.testing.assert_array_equal(taken[2], rows[[3, 3, 3]])
+    np.testing.assert_array_equal(taken[3], rows[[3, 3, 4]])
+    np.testing.assert_array_equal(taken[4], rows[[4, 5, 6]])
+
+
+def test_history_matches_offline_windows_and_evicts_old_regions():
+    rows = np.random.default_rng(0).random((9, 4))
+    regions = np.array([1, 2, 1, 1, 2, 1, 2, 2, 1])
+    order = np.argsort(regions, kind='stable')
+    expected = np.empty((9, 3, 4))
+    expected[order] = FlareWindows(rows[order], 3, group_starts_of(regions[order])).take(np.arange(9))
+
+    history = SequenceHistory(3, 'region')
+    served = np.concatenate([history.windows(rows[:4], regions[:4]), history.windows(rows[4:5], regions[4:5]), history.windows(rows[5:], regions[5:])])
+
+    np.testing.assert_array_equal(served, expected)
+
+    small = SequenceHistory(2, 'region', max_keys=2)
+    for region in ('a', 'b', 'c'):
+        small.windows(rows[:1], [region])
+    assert small.stats()["regions"] == 2
+    # 'a' was dropped, so its next flare is padded with itself again.
+    np.testing.assert_array_equal(small.windows(rows[5:6], ['a'])[0], rows[[5, 5]])
+
+
+def test_server_scores_flares_against_their_region_history(monkeypatch):
+    X = np.zeros((2, 12))
+    X[:, 0] = (0, 7200)
+    components = server.ModelComponents(WindowMeanModel(), MinMaxScaler().fit(X), MinMaxScaler().fit(X[:, :1]), None,
+                                        sequence={"length": 3, "group_by": "region"})
+    monkeypatch.setattr(server, 'ml_components', components)
+    monkeypatch.setattr(server, 'sequence_history', None)
+    server.update_sequence_history(components.sequence)
+    client = server.app.test_client()
+
+    def predict(region, end_minute):
+        response = client.post('/api/ml_predict', json=make_record(active_region=region, start_minute=0, start_second=0,
+                                                                     end_hour=21, end_minute=end_minute, end_second=0))
+        assert response.status_code == 200
+        return response.get_json()["prediction"]
+
+    # Durations of 10 then 40 minutes in region 7: the second flare's window is [10, 10, 40] minutes.
+    assert predict(7, 10) == pytest.approx(600)
+    assert predict(7, 40) == pytest.approx(1200)
+    # Another region has its own history, and repeating a request does not hit the cache.
+    assert predict(8, 40) == pytest.approx(2400)
+    assert predict(8, 40) == pytest.approx(2400)
+    assert predict(7, 40) == pytest.approx((600 + 2400 + 2400) / 3)
+
+    results = client.post('/api/ml_predict/batch', json=[make_record(active_region=9, start_minute=0, start_second=0, end_minute=10, end_second=0),
+                                                         make_record(active_region=9, start_minute=0, start_second=0, end_minute=40, end_second=0)]).get_json()["results"]
+    assert [result["prediction"] for result in results] == pytest.approx([600, 1200])
+    assert client.post('/api/ml_predict', json=make_record(active_region=[1])).status_code == 400
+    assert client.get('/api/ml_predict/stats').get_json()["sequence_history"]["regions"] == 3
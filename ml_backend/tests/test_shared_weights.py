@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+import shared_weights
+from features import X_COLUMNS
+from model_bundle import load_bundle, read_bundle_manifest
+
+
+ML_BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+BUNDLE_PATH = os.path.join(ML_BACKEND_DIR, 'model_bundle.npz')
+
+
+def test_weight_file_round_trip_is_aligned_and_read_only(tmp_path):
+    arrays = {'a': np.arange(5, dtype=np.float32), 'b': np.ones((3, 7)), 'c': np.array([1, 2], dtype=np.int64)}
+    path = shared_weights.write_weight_file(str(tmp_path / 'w.bin'), {"content_hash": "x" * 64}, arrays)
+
+    manifest, mapped = shared_weights.map_weight_file(path)
+
+    assert manifest == {"content_hash": "x" * 64}
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(mapped[name], array)
+        assert mapped[name].dtype == array.dtype
+        assert not mapped[name].flags.writeable
+        assert mapped[name].__array_interface__['data'][0] % shared_weights.ALIGNMENT == 0
+
+
+def test_shared_bundle_predicts_like_private_bundle_from_mapped_weights(tmp_path):
+    bundle = shared_weights.load_shared_bundle(BUNDLE_PATH, str(tmp_path))
+    private = load_bundle(BUNDLE_PATH)
+
+    X = np.random.default_rng(0).uniform(0, 1, size=(32, 1, len(X_COLUMNS))).astype(np.float32)
+    np.testing.assert_array_equal(bundle.model.predict(X), private.model.predict(X))
+    assert bundle.version == private.version
+    assert bundle.weights_path == shared_weights.weight_file_path(str(tmp_path), read_bundle_manifest(BUNDLE_PATH))
+    # The layers compute on views of the mapping, not on private copies.
+    assert all(not layer.kernel.flags.owndata and not layer.kernel.flags.writeable for layer in bundle.model.layers)
+
+    modified = os.stat(bundle.weights_path).st_mtime_ns
+    shared_weights.load_shared_bundle(BUNDLE_PATH, str(tmp_path))
+    assert os.stat(bundle.weights_path).st_mtime_ns == modified
+
+
+@pytest.mark.parametrize('corruption', ['foreign_header', 'changed_bytes'])
+def test_mismatched_weight_file_is_rebuilt_from_the_bundle(tmp_path, corruption):
+    manifest = read_bundle_manifest(BUNDLE_PATH)
+    path = shared_weights.weight_file_path(str(tmp_path), manifest)
+    if corruption == 'foreign_header':
+        shared_weights.write_weight_file(path, {"content_hash": "0" * 64}, {})
+    else:
+        # The header is the bundle's own, but one weight was changed.
+        shared_weights.ensure_weight_file(BUNDLE_PATH, str(tmp_path))
+        os.chmod(path, 0o644)
+        with open(path, 'r+b') as f:
+            f.seek(-4, os.SEEK_END)
+            f.write(np.float32(1e6).tobytes())
+    assert shared_weights.map_verified_arrays(path, manifest) is None
+
+    bundle = shared_weights.load_shared_bundle(BUNDLE_PATH, str(tmp_path))
+
+    X = np.random.default_rng(0).uniform(0, 1, size=(8, 1, len(X_COLUMNS))).astype(np.float32)
+    np.testing.assert_array_equal(bundle.model.predict(X), load_bundle(BUNDLE_PATH).model.predict(X))
+    assert shared_weights.map_verified_arrays(path, manifest) is not None
+
+
+def test_process_memory_reports_rss_pss_and_uss():
+    memory = shared_weights.process_memory()
+    if memory is None:
+        pytest.skip("/proc/self/smaps_rollup is not available")
+    assert memory["rss"] >= memory["pss"] >= memory["uss"] > 0
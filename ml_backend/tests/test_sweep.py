@@ -0,0 +1,47 @@
+import csv
+import os
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+import sweep
+from features import X_COLUMNS
+
+
+SPACE = {'lstm1_units': [4, 8], 'lstm2_units': [4], 'dropout': [0.0, 0.2], 'optimizer': ['adam'], 'batch_size': [32]}
+
+
+def test_grid_and_random_trials():
+    grid = sweep.grid_trials(SPACE)
+    assert len(grid) == 4
+    assert {'lstm1_units': 8, 'lstm2_units': 4, 'dropout': 0.2, 'optimizer': 'adam', 'batch_size': 32} in grid
+
+    sampled = sweep.random_trials(SPACE, 3, seed=7)
+    assert sampled == sweep.random_trials(SPACE, 3, seed=7)
+    assert len({tuple(trial.values()) for trial in sampled}) == 3
+    assert len(sweep.random_trials(SPACE, 50)) == 4
+
+
+def test_cpu_slices_cover_workers():
+    slices = sweep.cpu_slices(3, threads_per_worker=2)
+    assert len(slices) == 3
+    assert all(len(cpus) == 2 for cpus in slices)
+
+
+def test_run_sweep_ranks_results(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.random((160, 1, len(X_COLUMNS)))
+    y = X[:, 0, :1] * 0.5
+    scaler_y = MinMaxScaler().fit(rng.random((10, 1)) * 1000)
+    data = {"X_train": X[:120], "y_train": y[:120], "X_test": X[120:], "y_test": y[120:], "scaler_y": scaler_y}
+
+    trials = sweep.grid_trials(dict(SPACE, lstm1_units=[4]))
+    ranked = sweep.run_sweep(data, trials, str(tmp_path), n_workers=2, epochs=1, patience=1)
+
+    assert [row['error'] for row in ranked] == ['', '']
+    assert ranked[0]['test_mae_seconds'] <= ranked[1]['test_mae_seconds']
+    assert isinstance(np.load(os.path.join(tmp_path, 'data', 'X_train.npy'), mmap_mode='r'), np.memmap)
+    with open(os.path.join(tmp_path, 'results.csv')) as f:
+        rows = list(csv.DictReader(f))
+    assert [row['rank'] for row in rows] == ['1', '2']
+    assert float(rows[0]['trial_seconds']) > 0